@@ -0,0 +1,111 @@
+import numpy as np
+import os
+
+# Runtimes for the garbage classifier.
+# Every backend takes a float32 batch of shape (N, 224, 224, 3) scaled to
+# [0, 1] and returns the N garbage scores. Only the Keras backend needs
+# TensorFlow; the TFLite and ONNX ones load a model exported by
+# ai_service/export.py with a small runtime, which starts faster and uses a
+# fraction of the memory per worker. Runtimes are imported on first use.
+
+# Threads per forward pass for TFLite / ONNX Runtime (0: runtime default)
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, path):
+        from tensorflow.keras.models import load_model
+        self.model = load_model(path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)[:, 0]
+
+def _tflite_interpreter(path, num_threads):
+    # Prefer the standalone runtimes; tf.lite pulls in all of TensorFlow
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path, num_threads=num_threads or None)
+
+class TFLiteBackend:
+    """
+    TFLite model, float or INT8-quantized. The interpreter is not
+    thread-safe; the micro-batcher only ever calls it from one thread.
+    """
+    name = "tflite"
+
+    def __init__(self, path, num_threads=INFERENCE_THREADS):
+        self.interpreter = _tflite_interpreter(path, num_threads)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_shape = None
+
+    def predict(self, batch):
+        if batch.shape != self._batch_shape:
+            # Exported with a dynamic batch dimension: resize to this batch
+            self.interpreter.resize_tensor_input(self.input["index"], batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_shape = batch.shape
+            self.input = self.interpreter.get_input_details()[0]
+            self.output = self.interpreter.get_output_details()[0]
+
+        scale, zero_point = self.input["quantization"]
+        if scale:
+            # Fully quantized input
+            info = np.iinfo(self.input["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        self.interpreter.set_tensor(self.input["index"], batch.astype(self.input["dtype"]))
+        self.interpreter.invoke()
+
+        output = self.interpreter.get_tensor(self.output["index"])
+        scale, zero_point = self.output["quantization"]
+        if scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output[:, 0]
+
+class ONNXBackend:
+    name = "onnx"
+
+    def __init__(self, path, num_threads=INFERENCE_THREADS):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch.astype(np.float32)})[0][:, 0]
+
+BACKENDS = {".h5": KerasBackend, ".keras": KerasBackend, ".tflite": TFLiteBackend, ".onnx": ONNXBackend}
+
+def load_backend(path):
+    """Backend for a model file, chosen by its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in BACKENDS:
+        raise ValueError(f"Unsupported model format: {path}")
+    return BACKENDS[extension](path)
+
+def _available(module):
+    import importlib.util
+    return importlib.util.find_spec(module) is not None
+
+def resolve_model_path(paths, preference="auto"):
+    """
+    The model file to serve. `paths` maps backend names to candidate files;
+    `preference` is a backend name or "auto": ONNX when onnxruntime is
+    installed, then TFLite, then the Keras model.
+    """
+    if preference != "auto":
+        return paths[preference]
+    order = (["onnx"] if _available("onnxruntime") else []) + ["tflite", "keras"]
+    for name in order:
+        if os.path.exists(paths[name]):
+            return paths[name]
+    return paths["keras"]
@@ -0,0 +1,197 @@
+import threading
+import time
+import queue
+from concurrent.futures import Future
+import numpy as np
+
+# Default histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+LATENCY_MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000, 2500)
+
+class Histogram:
+    """
+    Thread-safe fixed-bucket histogram.
+    Bucket bounds are inclusive upper limits; values above the last bound go to '+Inf'.
+    """
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.total = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def quantile(self, q):
+        """
+        Returns the upper bound of the bucket containing the q-th quantile
+        (None if no observations, or if it falls in the '+Inf' bucket).
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            target = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if seen >= target:
+                    return bound
+            return None
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+            buckets["+Inf"] = self.counts[-1]
+            count = self.count
+            total = self.total
+        return {
+            "buckets": buckets,
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+class MicroBatcher:
+    """
+    Coalesces single-item predictions into batched forward passes.
+
+    Callers submit one array at a time and get a Future back. A background
+    thread collects queued items until either `max_batch_size` items are
+    waiting or `max_wait_ms` has elapsed since the first item of the batch
+    arrived, stacks them and calls `predict_fn` once. `predict_fn` receives
+    an array of shape (batch, ...) and must return one result per row.
+    """
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10.0, name="micro-batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_latency_histogram = Histogram(LATENCY_MS_BUCKETS)
+        self.inference_latency_histogram = Histogram(LATENCY_MS_BUCKETS)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError(f"{self.name} has been shut down")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """Queues one item and returns a Future resolved with its prediction."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((np.asarray(item), future, time.perf_counter()))
+        return future
+
+    def predict(self, item, timeout=None):
+        """Blocking helper: submit an item and wait for its result."""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # Shutdown requested; flush what we have first
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        futures = []
+        items = []
+        for item, future, enqueued_at in batch:
+            # Skip callers that gave up (cancelled) before we got to them
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.queue_latency_histogram.observe((started - enqueued_at) * 1000.0)
+            futures.append(future)
+            items.append(item)
+
+        if not futures:
+            return
+
+        self.batch_size_histogram.observe(len(futures))
+        try:
+            results = self.predict_fn(np.stack(items))
+            if len(results) != len(futures):
+                raise RuntimeError(f"predict_fn returned {len(results)} results for a batch of {len(futures)}")
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+        else:
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        finally:
+            self.inference_latency_histogram.observe((time.perf_counter() - started) * 1000.0)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self.queue_depth(),
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_latency_ms": self.queue_latency_histogram.snapshot(),
+            "inference_latency_ms": self.inference_latency_histogram.snapshot(),
+        }
+
+    def reset_stats(self):
+        self.batch_size_histogram.reset()
+        self.queue_latency_histogram.reset()
+        self.inference_latency_histogram.reset()
+
+    def shutdown(self, timeout=None):
+        """Stops the worker thread after draining already queued items."""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
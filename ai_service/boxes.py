@@ -0,0 +1,69 @@
+import numpy as np
+
+# Box helpers for object detection.
+# Boxes are float arrays of shape (N, 4) in [x1, y1, x2, y2] pixel coordinates.
+
+def empty_boxes():
+    return np.zeros((0, 4), dtype=np.float32)
+
+def box_area(boxes):
+    boxes = np.asarray(boxes, dtype=np.float32)
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+def box_iou(box, boxes):
+    """
+    Intersection over Union between one box (4,) and many boxes (N, 4).
+    Returns an (N,) array.
+    """
+    box = np.asarray(box, dtype=np.float32)
+    boxes = np.asarray(boxes, dtype=np.float32)
+    if boxes.size == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area = max(box[2] - box[0], 0) * max(box[3] - box[1], 0)
+    union = area + box_area(boxes) - intersection
+
+    iou = np.zeros_like(intersection)
+    np.divide(intersection, union, out=iou, where=union > 0)
+    return iou
+
+def nms(boxes, scores, class_ids=None, iou_threshold=0.5):
+    """
+    Class-aware Non-Maximum Suppression.
+
+    A box is suppressed when it overlaps a higher scoring box of the same
+    class with IoU >= iou_threshold. Boxes of different classes never
+    suppress each other: they are shifted apart by a per-class offset so
+    a single vectorized IoU pass per kept box covers every class.
+
+    Returns the indices of kept boxes, ordered by descending score.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if class_ids is not None:
+        class_ids = np.asarray(class_ids).reshape(-1)
+        offset = float(boxes.max()) + 1.0
+        boxes = boxes + (class_ids.astype(np.float32) * offset)[:, None]
+
+    # Stable sort so equal scores keep their input order
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size > 0:
+        current = order[0]
+        keep.append(current)
+        rest = order[1:]
+        if rest.size == 0:
+            break
+        iou = box_iou(boxes[current], boxes[rest])
+        order = rest[iou < iou_threshold]
+
+    return np.asarray(keep, dtype=np.int64)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+def hash_pixels(pixels):
+    """
+    Content hash of a decoded image. Two files that decode to the same
+    pixels (e.g. re-encoded or re-uploaded copies) share the same hash.
+    """
+    pixels = np.ascontiguousarray(pixels)
+    digest = hashlib.sha256()
+    digest.update(str(pixels.shape).encode())
+    digest.update(str(pixels.dtype).encode())
+    digest.update(pixels.data)
+    return digest.hexdigest()
+
+class PredictionCache:
+    """
+    LRU cache for model predictions with TTL and an optional on-disk tier.
+
+    Entries are keyed by (namespace, model version, content hash), so
+    results from an older model are never returned after weights change.
+    Values must be JSON serializable when a disk directory is configured.
+    """
+    def __init__(self, max_entries=1024, ttl_seconds=86400, disk_dir=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(namespace, version, content_hash):
+        return f"{namespace}:{version}:{content_hash}"
+
+    def _is_fresh(self, created_at):
+        return self.ttl_seconds is None or self.clock() - created_at < self.ttl_seconds
+
+    def _disk_path(self, key):
+        # Shard by hash prefix so one directory never holds every entry
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.disk_dir, name[:2], f"{name}.json")
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if self._is_fresh(created_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                value, created_at = entry
+                with self._lock:
+                    self._store(key, value, created_at)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value):
+        created_at = self.clock()
+        with self._lock:
+            self._store(key, value, created_at)
+        if self.disk_dir:
+            self._write_disk(key, value, created_at)
+
+    def _store(self, key, value, created_at):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("key") != key or not self._is_fresh(data["created_at"]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return data["value"], data["created_at"]
+
+    def _write_disk(self, key, value, created_at):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so readers never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"key": key, "value": value, "created_at": created_at}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Prediction cache write failed: {e}")
+
+    def clear(self):
+        """Drops in-memory entries. Disk entries are left to expire, since
+        keys for a new model version will never match them."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_dir": self.disk_dir,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
@@ -0,0 +1,140 @@
+import argparse
+import glob
+import os
+import time
+import numpy as np
+from PIL import Image
+
+# Exports the trained Keras classifier for the lighter runtimes in
+# ai_service/backends.py and checks that the export still agrees with it.
+#
+#   python -m ai_service.export --format tflite            # float32
+#   python -m ai_service.export --format tflite --int8     # INT8, calibrated on the dataset
+#   python -m ai_service.export --format onnx              # needs tf2onnx
+#
+# INT8 models keep float inputs and outputs; weights and activations are
+# quantized with ranges measured on up to CALIBRATION_SAMPLES dataset images.
+
+KERAS_MODEL_PATH = 'ai_service/models/waste_model.h5'
+DATASET_DIR = 'ai_service/dataset'
+IMG_SIZE = (224, 224)
+CALIBRATION_SAMPLES = 100
+# Largest allowed score difference between the Keras model and an export
+PARITY_TOLERANCE = {"float": 1e-3, "int8": 0.05}
+
+def export_path(format, model_path=KERAS_MODEL_PATH):
+    return os.path.splitext(model_path)[0] + {"tflite": ".tflite", "onnx": ".onnx"}[format]
+
+def load_images(directory=DATASET_DIR, limit=CALIBRATION_SAMPLES, seed=0):
+    """Up to `limit` dataset images, preprocessed like at inference time: (N, 224, 224, 3) in [0, 1]."""
+    files = sorted(
+        path for path in glob.glob(os.path.join(directory, "**", "*"), recursive=True)
+        if path.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+    if not files:
+        raise ValueError(f"No images found in {directory}")
+    # Sample across every class directory, not just the first one
+    files = [files[i] for i in np.random.default_rng(seed).permutation(len(files))[:limit]]
+    images = []
+    for path in files:
+        with Image.open(path) as img:
+            images.append(np.asarray(img.convert("RGB").resize(IMG_SIZE, Image.NEAREST), dtype=np.float32) / 255.0)
+    return np.stack(images)
+
+def export_tflite(model, path, int8=False, calibration_images=None):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if int8:
+        if calibration_images is None:
+            calibration_images = load_images()
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis].astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Written next to the target and renamed, so a running server never loads half a file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(converter.convert())
+    os.replace(tmp_path, path)
+    return path
+
+def export_onnx(model, path):
+    try:
+        import tensorflow as tf
+        import tf2onnx
+    except ImportError:
+        raise RuntimeError("ONNX export requires the `tf2onnx` package")
+    spec = (tf.TensorSpec((None, *IMG_SIZE, 3), tf.float32, name="input"),)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def export_model(model, formats=("tflite",), int8=False, model_path=KERAS_MODEL_PATH, calibration_images=None):
+    """Exports a Keras model in each format; returns the written paths."""
+    paths = []
+    for format in formats:
+        path = export_path(format, model_path)
+        if format == "tflite":
+            export_tflite(model, path, int8=int8, calibration_images=calibration_images)
+        elif format == "onnx":
+            export_onnx(model, path)
+        else:
+            raise ValueError(f"Unknown export format: {format}")
+        print(f"Exported {format}{' (int8)' if int8 and format == 'tflite' else ''} model to {path}")
+        paths.append(path)
+    return paths
+
+def check_parity(reference, candidate, images, tolerance):
+    """
+    Compares two backends' scores on the same images. Returns the largest
+    absolute difference; raises AssertionError above `tolerance`.
+    """
+    expected = np.asarray(reference.predict(images), dtype=np.float32)
+    actual = np.asarray(candidate.predict(images), dtype=np.float32)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > tolerance:
+        raise AssertionError(f"{candidate.name} export differs from the Keras model by {max_diff:.4f} (tolerance {tolerance})")
+    return max_diff
+
+def benchmark(backend, images, runs=5):
+    """Median seconds per image for batches of `images`."""
+    backend.predict(images) # warm-up
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        backend.predict(images)
+        timings.append((time.perf_counter() - started) / len(images))
+    return float(np.median(timings))
+
+def main():
+    from ai_service.backends import KerasBackend, load_backend
+
+    parser = argparse.ArgumentParser(description="Export the garbage classifier for CPU inference")
+    parser.add_argument("--model", default=KERAS_MODEL_PATH)
+    parser.add_argument("--format", choices=["tflite", "onnx"], action="append")
+    parser.add_argument("--int8", action="store_true", help="INT8-quantize (TFLite), calibrated on --dataset")
+    parser.add_argument("--dataset", default=DATASET_DIR)
+    args = parser.parse_args()
+
+    reference = KerasBackend(args.model)
+    images = load_images(args.dataset)
+    paths = export_model(reference.model, args.format or ["tflite"], args.int8, args.model, images)
+
+    tolerance = PARITY_TOLERANCE["int8" if args.int8 else "float"]
+    for path in paths:
+        candidate = load_backend(path)
+        max_diff = check_parity(reference, candidate, images, tolerance)
+        print(f"{candidate.name}: max score difference {max_diff:.5f}, "
+              f"{benchmark(candidate, images[:16]) * 1000:.1f} ms/image "
+              f"(keras {benchmark(reference, images[:16]) * 1000:.1f} ms/image)")
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,253 @@
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
 import numpy as np
 import os
+import threading
+from PIL import Image
+from ai_service.batching import MicroBatcher
+from ai_service.backends import load_backend, resolve_model_path
+from ai_service.registry import model_registry
 
 MODEL_PATH = 'ai_service/models/waste_model.h5'
+# Exports of the same model for the lighter runtimes (see ai_service/export.py)
+TFLITE_MODEL_PATH = 'ai_service/models/waste_model.tflite'
+ONNX_MODEL_PATH = 'ai_service/models/waste_model.onnx'
+# auto, keras, tflite or onnx
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "auto")
 IMG_SIZE = (224, 224)
+# Increased threshold to 0.85 to reduce false positives.
+# Versions in the model registry can set their own.
+GARBAGE_THRESHOLD = 0.85
+
+# Micro-batching: concurrent requests are coalesced into one forward pass
+# of up to BATCH_MAX_SIZE images, waiting at most BATCH_MAX_WAIT_MS for a batch to fill.
+BATCH_MAX_SIZE = int(os.getenv("INFERENCE_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("INFERENCE_BATCH_MAX_WAIT_MS", "10"))
+
+def load_img(path, target_size=IMG_SIZE):
+    """RGB image resized with nearest neighbour, like keras' `image.load_img`."""
+    with Image.open(path) as img:
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        return img.resize(target_size, Image.NEAREST)
+
+def img_to_array(img):
+    return np.asarray(img, dtype=np.float32)
+
+class LoadedModel:
+    """
+    One model version as it is served. The service replaces the whole
+    object on a swap, so each batch runs on one backend with that
+    version's threshold.
+    """
+    def __init__(self, backend, version, threshold=None, metadata=None):
+        self.backend = backend
+        self.version = version
+        self.threshold = GARBAGE_THRESHOLD if threshold is None else threshold
+        self.metadata = metadata or {}
 
 class InferenceService:
-    def __init__(self):
-        self.model = None
-        self.load_model()
+    def __init__(self, registry=model_registry):
+        self.registry = registry
+        self.active = None
+        self.batcher = MicroBatcher(
+            self._predict_batch,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            name="inference-batcher"
+        )
+        # The model is loaded on first use or by warm_up(), not at import
+        self._load_lock = threading.Lock()
+        # Predictions per model version, kept across swaps
+        self.prediction_counts = {}
+        self._counts_lock = threading.Lock()
+
+    @property
+    def model(self):
+        active = self.active
+        return active.backend if active else None
+
+    @property
+    def model_version(self):
+        # Changes whenever different weights are loaded; used to key caches
+        active = self.active
+        return active.version if active else "none"
+
+    def _load(self, path, version, threshold=None, metadata=None):
+        backend = load_backend(path)
+        # One forward pass, so the first request doesn't pay for kernel
+        # setup and buffer allocation and a broken model is never swapped in
+        backend.predict(np.zeros((1, *IMG_SIZE, 3), dtype=np.float32))
+        return LoadedModel(backend, version, threshold, metadata)
+
+    def load_version(self, version):
+        """Loads and warms up a registry version without serving it yet."""
+        metadata = self.registry.get(version)
+        path = resolve_model_path(self.registry.model_paths(version), INFERENCE_BACKEND)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model version {version} has no {os.path.basename(path)}")
+        return self._load(path, version, metadata.get("threshold"), metadata)
 
     def load_model(self):
-        if os.path.exists(MODEL_PATH):
-            try:
-                self.model = load_model(MODEL_PATH)
-                print("Model loaded successfully.")
-            except Exception as e:
-                print(f"Failed to load model: {e}")
-        else:
-            print("Model file not found. Please train the model first.")
-
-    def reload_model(self):
-        print("Reloading model...")
-        self.load_model()
+        # The registry's active version, else the model file written by older trainings
+        version = self.registry.active_version()
+        try:
+            if version:
+                self.active = self.load_version(version)
+                print(f"Model loaded successfully ({self.model.name}: version {version}).")
+                return
+            path = resolve_model_path(
+                {"keras": MODEL_PATH, "tflite": TFLITE_MODEL_PATH, "onnx": ONNX_MODEL_PATH}, INFERENCE_BACKEND
+            )
+            if not os.path.exists(path):
+                print("Model file not found. Please train the model first.")
+                return
+            stat = os.stat(path)
+            loaded = self._load(path, None)
+            loaded.version = f"{loaded.backend.name}-{stat.st_mtime_ns}-{stat.st_size}"
+            self.active = loaded
+            print(f"Model loaded successfully ({self.model.name}: {path}).")
+        except Exception as e:
+            print(f"Failed to load model: {e}")
 
-    def predict(self, image_path):
+    def ensure_model(self):
+        """Loads the model if it isn't yet; returns whether one is loaded."""
         if not self.model:
-            self.load_model()
-            if not self.model:
-                print("Model not loaded. Returning True (Mock behavior).")
-                return True
+            with self._load_lock:
+                if not self.model:
+                    self.load_model()
+        return self.model is not None
+
+    def warm_up(self):
+        """Loads the model (including its warm-up inference) ahead of the first request."""
+        self.ensure_model()
+
+    def activate(self, version):
+        """
+        Serves a registry version. It is loaded and warmed up first while the
+        current model keeps serving, then swapped in by replacing one
+        reference; requests in flight finish on the model they started with.
+        """
+        with self._load_lock:
+            loaded = self.load_version(version)
+            self.registry.activate(version)
+            self.active = loaded
+        print(f"Activated model version {version}")
+        return loaded
+
+    def rollback(self):
+        """Goes back to the previously active version; returns it."""
+        with self._load_lock:
+            version = self.registry.previous_version()
+            if version is None:
+                raise ValueError("No previous model version to roll back to")
+            loaded = self.load_version(version)
+            self.registry.rollback(expected=version)
+            self.active = loaded
+        print(f"Rolled back to model version {version}")
+        return version
+
+    def sync_with_registry(self):
+        """
+        Picks up a version activated by another process (worker, replica).
+        Returns True if the model was swapped.
+        """
+        version = self.registry.active_version()
+        if not version or version == self.model_version:
+            return False
+        with self._load_lock:
+            if version == self.model_version:
+                return False
+            self.active = self.load_version(version)
+        print(f"Switched to model version {version}")
+        return True
+
+    def _count(self, version, is_garbage):
+        with self._counts_lock:
+            counts = self.prediction_counts.setdefault(version, {"predictions": 0, "garbage": 0})
+            counts["predictions"] += 1
+            counts["garbage"] += int(is_garbage)
+
+    def version_stats(self):
+        with self._counts_lock:
+            return {version: dict(counts) for version, counts in self.prediction_counts.items()}
+
+    def predict(self, image_path):
+        return self.classify(image_path)["is_garbage"]
+
+    def predict_bytes(self, image_bytes):
+        return self.classify_bytes(image_bytes)["is_garbage"]
+
+    def classify(self, image_path):
+        """
+        Returns {'is_garbage': bool, 'score': float}.
+        'score' is the raw model output, or None when the model did not run.
+        """
+        if not self.ensure_model():
+            print("Model not loaded. Returning True (Mock behavior).")
+            return {"is_garbage": True, "score": None}
 
         try:
-            img = image.load_img(image_path, target_size=IMG_SIZE)
-            img_array = image.img_to_array(img)
-            return self._predict_array(img_array)
+            img = load_img(image_path)
+            img_array = img_to_array(img)
+            return self._classify_array(img_array)
         except Exception as e:
             print(f"Prediction error: {e}")
-            return False
+            return {"is_garbage": False, "score": None}
 
-    def predict_bytes(self, image_bytes):
-        if not self.model:
-            self.load_model()
-            if not self.model:
-                return True
+    def classify_bytes(self, image_bytes):
+        if not self.ensure_model():
+            return {"is_garbage": True, "score": None}
 
         try:
             import io
-            from PIL import Image
             img = Image.open(io.BytesIO(image_bytes))
             img = img.resize(IMG_SIZE)
-            img_array = image.img_to_array(img)
-            return self._predict_array(img_array)
+            img_array = img_to_array(img)
+            return self._classify_array(img_array)
         except Exception as e:
             print(f"Prediction bytes error: {e}")
-            return False
+            return {"is_garbage": False, "score": None}
+
+    def classify_array(self, pixels):
+        """
+        Classifies an already decoded RGB uint8 image of any size,
+        so callers that hold the pixels don't pay for a second decode.
+        """
+        if not self.ensure_model():
+            return {"is_garbage": True, "score": None}
+
+        try:
+            # Nearest-neighbour resize, same as load_img
+            img = Image.fromarray(pixels).resize(IMG_SIZE, Image.NEAREST)
+            img_array = img_to_array(img)
+            return self._classify_array(img_array)
+        except Exception as e:
+            print(f"Prediction array error: {e}")
+            return {"is_garbage": False, "score": None}
 
-    def _predict_array(self, img_array):
+    def _classify_array(self, img_array):
         # Filter out dark images (noise/empty camera)
         brightness = np.mean(img_array)
         if brightness < 40: # Threshold for darkness (0-255)
             print(f"Image too dark (brightness: {brightness:.2f}). Ignoring.")
-            return False
+            return {"is_garbage": False, "score": None}
+
+        img_array = img_array.astype(np.float32) / 255.0
+
+        # Queued and run together with other in-flight requests
+        score, loaded = self.batcher.predict(img_array)
+        score = float(score)
+        is_garbage = score > loaded.threshold
+        self._count(loaded.version, is_garbage)
+        print(f"Prediction: {score} -> {'Garbage' if is_garbage else 'Clean'}")
+        return {"is_garbage": bool(is_garbage), "score": score}
 
-        img_array = np.expand_dims(img_array, axis=0)
-        img_array /= 255.0
+    def _predict_batch(self, batch):
+        # Runs on the batcher thread with a (N, 224, 224, 3) array.
+        # The whole batch uses one version, even if a swap happens meanwhile
+        active = self.active
+        return [(score, active) for score in active.backend.predict(batch)]
 
-        prediction = self.model.predict(img_array)
-        # Increased threshold to 0.85 to reduce false positives
-        is_garbage = prediction[0][0] > 0.85
-        print(f"Prediction: {prediction[0][0]} -> {'Garbage' if is_garbage else 'Clean'}")
-        return bool(is_garbage)
+    def batching_stats(self):
+        return self.batcher.stats()
 
 inference_service = InferenceService()
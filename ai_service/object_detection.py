@@ -1,185 +1,139 @@
-import cv2
 import numpy as np
-from ultralytics import YOLO
 import os
+import threading
+from ai_service.boxes import nms, empty_boxes
+from ai_service.tiling import plan_tiles
 
-# Load the YOLOv8 model (nano version for speed)
-# It will download 'yolov8n.pt' automatically if not present
-model = YOLO('yolov8n.pt')
+# The YOLOv8 model (nano version for speed), loaded on first use.
+# ultralytics is imported there and cv2 only when an image file has to be
+# read, so importing this module stays cheap.
+_model = None
+_model_lock = threading.Lock()
 
-def detect_objects(image_path, conf_threshold=0.25):
+# Class 0 is 'person' in COCO dataset. We ignore people.
+PERSON_CLASS_ID = 0
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from ultralytics import YOLO
+                # It will download 'yolov8n.pt' automatically if not present
+                _model = YOLO('yolov8n.pt')
+    return _model
+
+def detect_objects(image, conf_threshold=0.25, iou_threshold=0.5, early_exit=False, tiling=None):
     """
     Detects objects in an image using a coarse-to-fine tiling approach.
-    
-    1. Runs inference on the full image.
-    2. Splits the image into a 2x2 grid (with overlap) and runs inference on each tile.
-    3. Merges predictions using Non-Maximum Suppression (NMS).
+
+    1. Plans a tiling grid from the image resolution (none for small photos,
+       up to 3x3 with overlap for high-resolution phone shots).
+    2. Runs YOLO on the full image and the tiles.
+    3. Merges predictions using class-aware Non-Maximum Suppression (NMS).
     4. Filters out 'person' class (class_id=0) to ignore people.
-    
+
+    By default the full image and all tiles are run as one batch. With
+    `early_exit=True` the full image is run first and the tiles are only
+    run (as a second batch) if it found nothing; use this when the caller
+    only needs to know whether anything is there.
+
     Args:
-        image_path (str): Path to the image file.
+        image (str or np.ndarray): Path to the image file, or an already
+            decoded BGR image array (OpenCV channel order).
         conf_threshold (float): Confidence threshold for detections.
-        
+        iou_threshold (float): IoU above which same-class boxes are merged.
+        early_exit (bool): Stop after the full-image pass if it found objects.
+        tiling (list): Optional tiling levels, see ai_service.tiling.TILING_LEVELS.
+
     Returns:
         list: A list of dictionaries, each containing:
               {'label': str, 'confidence': float, 'box': [x1, y1, x2, y2]}
     """
-    
-    # Read the image
-    img = cv2.imread(image_path)
-    if img is None:
-        print(f"Error: Could not read image at {image_path}")
-        return []
 
+    # Read the image unless the caller already decoded it
+    if isinstance(image, np.ndarray):
+        img = image
+    else:
+        import cv2
+        img = cv2.imread(image)
+        if img is None:
+            print(f"Error: Could not read image at {image}")
+            return []
+
+    model = get_model()
     height, width = img.shape[:2]
-    
-    all_detections = []
-
-    # --- Stage 1: Coarse Inference (Full Image) ---
-    results_full = model(img, verbose=False)
-    for r in results_full:
-        boxes = r.boxes
-        for box in boxes:
-            cls_id = int(box.cls[0])
-            # Class 0 is 'person' in COCO dataset. We ignore people.
-            if cls_id == 0:
-                continue
-                
-            conf = float(box.conf[0])
-            if conf < conf_threshold:
-                continue
-            
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            label = model.names[cls_id]
-            
-            all_detections.append({
-                'label': label,
-                'confidence': conf,
-                'box': [x1, y1, x2, y2]
-            })
-
-    # --- Stage 2: Fine-grained Inference (Tiling) ---
-    # We'll use a 2x2 grid. 
-    # To ensure we catch objects on the boundaries, we can use overlap.
-    # Simple 2x2 split:
-    # Top-Left, Top-Right, Bottom-Left, Bottom-Right
-    
-    tile_h = height // 2
-    tile_w = width // 2
-    
-    # Define tiles: (x_start, y_start, x_end, y_end)
-    # We add a bit of overlap if we wanted, but for now let's do strict 2x2 
-    # plus a center crop could be added later if needed.
-    tiles = [
-        (0, 0, tile_w, tile_h),          # Top-Left
-        (tile_w, 0, width, tile_h),      # Top-Right
-        (0, tile_h, tile_w, height),     # Bottom-Left
-        (tile_w, tile_h, width, height)  # Bottom-Right
-    ]
-    
-    for tx1, ty1, tx2, ty2 in tiles:
-        tile_img = img[ty1:ty2, tx1:tx2]
-        
-        # Run inference on the tile
-        results_tile = model(tile_img, verbose=False)
-        
-        for r in results_tile:
-            boxes = r.boxes
-            for box in boxes:
-                cls_id = int(box.cls[0])
-                if cls_id == 0: # Ignore people
-                    continue
-                    
-                conf = float(box.conf[0])
-                if conf < conf_threshold:
-                    continue
-                
-                # Local coordinates in the tile
-                lx1, ly1, lx2, ly2 = box.xyxy[0].tolist()
-                
-                # Map back to global coordinates
-                gx1 = lx1 + tx1
-                gy1 = ly1 + ty1
-                gx2 = lx2 + tx1
-                gy2 = ly2 + ty1
-                
-                # Clamp to image boundaries (just in case)
-                gx1 = max(0, min(width, gx1))
-                gy1 = max(0, min(height, gy1))
-                gx2 = max(0, min(width, gx2))
-                gy2 = max(0, min(height, gy2))
-                
-                label = model.names[cls_id]
-                
-                all_detections.append({
-                    'label': label,
-                    'confidence': conf,
-                    'box': [gx1, gy1, gx2, gy2]
-                })
-
-    # --- Stage 3: Non-Maximum Suppression (NMS) ---
+
+    # Regions as (x_start, y_start, x_end, y_end): full image first, then tiles
+    full_frame = [(0, 0, width, height)]
+    tiles = plan_tiles(width, height, levels=tiling)
+
+    if early_exit:
+        passes = [full_frame, tiles]
+    else:
+        passes = [full_frame + tiles]
+
+    boxes, scores, class_ids = empty_boxes(), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    for regions in passes:
+        if not regions:
+            continue
+        crops = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+
+        # One batched forward pass per stage
+        results = model(crops, verbose=False)
+
+        pass_boxes, pass_scores, pass_classes = collect_detections(results, regions, width, height, conf_threshold)
+        boxes = np.concatenate([boxes, pass_boxes])
+        scores = np.concatenate([scores, pass_scores])
+        class_ids = np.concatenate([class_ids, pass_classes])
+
+        if early_exit and len(boxes) > 0:
+            break
+
     # Since we have detections from full image AND tiles, we will have duplicates.
-    # We need to merge them.
-    
-    final_detections = nms(all_detections, iou_threshold=0.5)
-    
-    return final_detections
+    keep = nms(boxes, scores, class_ids, iou_threshold=iou_threshold)
 
-def nms(detections, iou_threshold=0.5):
-    """
-    Applies Non-Maximum Suppression to a list of detections.
-    """
-    if not detections:
-        return []
-        
-    # Sort by confidence (descending)
-    detections = sorted(detections, key=lambda x: x['confidence'], reverse=True)
-    
-    keep = []
-    
-    while detections:
-        current = detections.pop(0)
-        keep.append(current)
-        
-        # Compare with remaining detections
-        remaining = []
-        for other in detections:
-            # If same class and high overlap, suppress it
-            if current['label'] == other['label']:
-                iou = calculate_iou(current['box'], other['box'])
-                if iou < iou_threshold:
-                    remaining.append(other)
-            else:
-                remaining.append(other)
-        
-        detections = remaining
-        
-    return keep
-
-def calculate_iou(box1, box2):
+    return [
+        {
+            'label': model.names[int(class_ids[i])],
+            'confidence': float(scores[i]),
+            'box': boxes[i].tolist()
+        }
+        for i in keep
+    ]
+
+def collect_detections(results, regions, width, height, conf_threshold):
     """
-    Calculates Intersection over Union (IoU) between two boxes.
-    Box format: [x1, y1, x2, y2]
+    Converts YOLO results for each region into global NumPy arrays.
+
+    Returns (boxes (N, 4), scores (N,), class_ids (N,)) with boxes mapped
+    back to full image coordinates and clamped to its boundaries.
     """
-    x1_a, y1_a, x2_a, y2_a = box1
-    x1_b, y1_b, x2_b, y2_b = box2
-    
-    # Intersection
-    x1_i = max(x1_a, x1_b)
-    y1_i = max(y1_a, y1_b)
-    x2_i = min(x2_a, x2_b)
-    y2_i = min(y2_a, y2_b)
-    
-    w_i = max(0, x2_i - x1_i)
-    h_i = max(0, y2_i - y1_i)
-    intersection = w_i * h_i
-    
-    # Union
-    area_a = (x2_a - x1_a) * (y2_a - y1_a)
-    area_b = (x2_b - x1_b) * (y2_b - y1_b)
-    union = area_a + area_b - intersection
-    
-    if union == 0:
-        return 0
-        
-    return intersection / union
+    all_boxes, all_scores, all_classes = [], [], []
+
+    for r, (tx1, ty1, _, _) in zip(results, regions):
+        if r.boxes is None or len(r.boxes) == 0:
+            continue
+
+        xyxy = r.boxes.xyxy.cpu().numpy().astype(np.float32)
+        conf = r.boxes.conf.cpu().numpy().astype(np.float32)
+        cls = r.boxes.cls.cpu().numpy().astype(np.int64)
+
+        mask = (cls != PERSON_CLASS_ID) & (conf >= conf_threshold)
+        if not mask.any():
+            continue
+
+        # Map local tile coordinates back to global coordinates
+        all_boxes.append(xyxy[mask] + np.array([tx1, ty1, tx1, ty1], dtype=np.float32))
+        all_scores.append(conf[mask])
+        all_classes.append(cls[mask])
+
+    if not all_boxes:
+        return empty_boxes(), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+    boxes = np.concatenate(all_boxes)
+    # Clamp to image boundaries (just in case)
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+
+    return boxes, np.concatenate(all_scores), np.concatenate(all_classes)
@@ -0,0 +1,173 @@
+import datetime
+import json
+import os
+import shutil
+import threading
+import uuid
+
+# Versioned model registry on disk.
+#
+#   <MODEL_REGISTRY_DIR>/
+#     v1/model.h5, v1/model.tflite, v1/metadata.json
+#     v2/...
+#     active.json      {"active": "v2", "history": ["v1"]}
+#
+# A version directory is written under a temporary name and renamed into
+# place, and active.json is replaced atomically, so readers (other workers,
+# the training process) never see a half-written version or pointer.
+# Versions are never modified after they are registered.
+
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "ai_service/models/registry")
+# Versions kept on disk; older ones are deleted unless active or in the rollback history
+MODEL_REGISTRY_KEEP = int(os.getenv("MODEL_REGISTRY_KEEP", "10"))
+
+METADATA_FILE = "metadata.json"
+ACTIVE_FILE = "active.json"
+# Canonical file name per backend, as keyed by ai_service.backends.resolve_model_path
+MODEL_FILES = {"keras": "model.h5", "tflite": "model.tflite", "onnx": "model.onnx"}
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _version_number(version):
+    try:
+        return int(version[1:]) if version.startswith("v") else -1
+    except ValueError:
+        return -1
+
+class ModelRegistry:
+    def __init__(self, root=MODEL_REGISTRY_DIR, keep=MODEL_REGISTRY_KEEP):
+        self.root = root
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _version_names(self):
+        if not os.path.isdir(self.root):
+            return []
+        names = [n for n in os.listdir(self.root) if _version_number(n) >= 0 and os.path.isdir(self._path(n))]
+        return sorted(names, key=_version_number)
+
+    def register(self, files, metrics=None, threshold=None, source=None):
+        """
+        Copies model files into a new version and returns its metadata.
+        `files` maps backend names ("keras", "tflite", "onnx") to paths.
+        """
+        unknown = set(files) - set(MODEL_FILES)
+        if unknown:
+            raise ValueError(f"Unknown model formats: {sorted(unknown)}")
+
+        os.makedirs(self.root, exist_ok=True)
+        staging = self._path(f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            for name, path in files.items():
+                shutil.copy2(path, os.path.join(staging, MODEL_FILES[name]))
+            metadata = {
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "metrics": metrics or {},
+                "threshold": threshold,
+                "formats": sorted(files),
+                "source": source,
+            }
+            while True:
+                names = self._version_names()
+                version = f"v{_version_number(names[-1]) + 1 if names else 1}"
+                _write_json(os.path.join(staging, METADATA_FILE), {"version": version, **metadata})
+                try:
+                    # Fails if another process took this number meanwhile
+                    os.rename(staging, self._path(version))
+                    break
+                except OSError:
+                    if not os.path.isdir(self._path(version)):
+                        raise
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        print(f"Registered model version {version}")
+        return self.get(version)
+
+    def get(self, version):
+        """Metadata of a version; KeyError if there is no such version."""
+        try:
+            with open(self._path(version, METADATA_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            raise KeyError(version)
+
+    def versions(self):
+        """Metadata of every version, newest first."""
+        result = []
+        for name in reversed(self._version_names()):
+            try:
+                result.append(self.get(name))
+            except KeyError:
+                continue
+        return result
+
+    def model_paths(self, version):
+        """Backend name -> file of that version, for resolve_model_path()."""
+        self.get(version)
+        return {name: self._path(version, file_name) for name, file_name in MODEL_FILES.items()}
+
+    def _state(self):
+        try:
+            with open(self._path(ACTIVE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"active": None, "history": []}
+
+    def active_version(self):
+        return self._state()["active"]
+
+    def previous_version(self):
+        """The version a rollback would go back to, or None."""
+        history = self._state()["history"]
+        return history[-1] if history else None
+
+    def activate(self, version):
+        """Makes `version` the active one; the current one is kept for rollback."""
+        self.get(version)
+        with self._lock:
+            state = self._state()
+            if state["active"] == version:
+                return state
+            history = [v for v in state["history"] if v != version]
+            if state["active"]:
+                history.append(state["active"])
+            state = {"active": version, "history": history}
+            _write_json(self._path(ACTIVE_FILE), state)
+        self.prune()
+        return state
+
+    def rollback(self, expected=None):
+        """
+        Re-activates the previously active version and returns it.
+        `expected` guards against the history changing since it was read.
+        """
+        with self._lock:
+            state = self._state()
+            if not state["history"]:
+                raise ValueError("No previous model version to roll back to")
+            version = state["history"][-1]
+            if expected is not None and version != expected:
+                raise ValueError(f"Previous model version is {version}, not {expected}")
+            state = {"active": version, "history": state["history"][:-1]}
+            _write_json(self._path(ACTIVE_FILE), state)
+        return version
+
+    def prune(self):
+        """Deletes old versions beyond `keep` that can't be rolled back to."""
+        state = self._state()
+        protected = {state["active"], *state["history"]}
+        names = self._version_names()
+        for name in names[:max(0, len(names) - self.keep)]:
+            if name not in protected:
+                shutil.rmtree(self._path(name), ignore_errors=True)
+
+model_registry = ModelRegistry()
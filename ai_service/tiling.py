@@ -0,0 +1,52 @@
+import math
+
+# Tiling levels as (max_megapixels, rows, cols, overlap), checked in order.
+# Small photos are only run as a full frame; larger ones get a denser grid
+# with overlapping tiles so objects on tile borders are not cut in half.
+TILING_LEVELS = [
+    (1.0, 1, 1, 0.0),
+    (6.0, 2, 2, 0.15),
+    (math.inf, 3, 3, 0.2),
+]
+
+def grid_tiles(width, height, rows=2, cols=2, overlap=0.0):
+    """
+    Splits an image into a rows x cols grid of (x1, y1, x2, y2) tiles.
+    `overlap` is the fraction of a tile shared with its neighbour (0 <= overlap < 1).
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in [0, 1)")
+
+    def spans(length, count):
+        size = length / (count - overlap * (count - 1))
+        stride = size * (1 - overlap)
+        result = []
+        for i in range(count):
+            start = int(round(i * stride))
+            end = length if i == count - 1 else min(length, int(round(i * stride + size)))
+            result.append((start, end))
+        return result
+
+    return [
+        (x1, y1, x2, y2)
+        for y1, y2 in spans(height, rows)
+        for x1, x2 in spans(width, cols)
+    ]
+
+def plan_tiles(width, height, levels=None):
+    """
+    Picks a tiling grid from the image resolution.
+
+    Returns the list of tiles to run in addition to the full frame
+    (empty when the image is small enough to skip tiling).
+    """
+    levels = TILING_LEVELS if levels is None else levels
+    megapixels = (width * height) / 1_000_000
+
+    for max_megapixels, rows, cols, overlap in levels:
+        if megapixels <= max_megapixels:
+            break
+
+    if rows * cols <= 1:
+        return []
+    return grid_tiles(width, height, rows=rows, cols=cols, overlap=overlap)
@@ -1,7 +1,13 @@
 import tensorflow as tf
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from ai_service.model import create_model
+from ai_service.export import export_model
+from ai_service.inference import GARBAGE_THRESHOLD
+from ai_service.registry import model_registry
+import argparse
+import json
 import os
+import sys
 
 # Configuration
 DATASET_DIR = 'ai_service/dataset'
@@ -9,8 +15,29 @@ MODEL_SAVE_PATH = 'ai_service/models/waste_model.h5'
 BATCH_SIZE = 32
 EPOCHS = 5 # Small number for demo/dummy data
 IMG_SIZE = (224, 224)
+# Lighter runtime exports written next to the Keras model (comma-separated; empty disables)
+EXPORT_FORMATS = [f for f in os.getenv("MODEL_EXPORT_FORMATS", "tflite").split(",") if f]
+# INT8-quantize the TFLite export, calibrated on the dataset
+EXPORT_INT8 = os.getenv("MODEL_EXPORT_INT8", "0") == "1"
 
-def train():
+# Prefix of the progress lines printed with --events, read by backend/services/training.py
+EVENT_PREFIX = "TRAINING_EVENT "
+
+def emit_event(event, **data):
+    print(EVENT_PREFIX + json.dumps({"event": event, **data}), flush=True)
+
+class ProgressEvents(tf.keras.callbacks.Callback):
+    """Prints an event with the metrics at the end of every epoch."""
+    def __init__(self, epochs):
+        super().__init__()
+        self.epochs = epochs
+
+    def on_epoch_end(self, epoch, logs=None):
+        metrics = {name: float(value) for name, value in (logs or {}).items()}
+        emit_event("epoch", epoch=epoch + 1, epochs=self.epochs, metrics=metrics)
+
+def train(callbacks=None, verbose="auto"):
+    """Trains the classifier and registers it as a new model version; returns its metadata."""
     if not os.path.exists(DATASET_DIR):
         print("Dataset directory not found!")
         return
@@ -46,10 +73,12 @@ def train():
     # Create and Train Model
     model = create_model()
     print("Starting training...")
-    model.fit(
+    history = model.fit(
         train_generator,
         epochs=EPOCHS,
-        validation_data=validation_generator
+        validation_data=validation_generator,
+        callbacks=callbacks,
+        verbose=verbose
     )
 
     # Save Model
@@ -57,5 +86,38 @@ def train():
     model.save(MODEL_SAVE_PATH)
     print(f"Model saved to {MODEL_SAVE_PATH}")
 
+    # Exports for the TFLite / ONNX inference backends
+    exported = export_model(model, EXPORT_FORMATS, EXPORT_INT8, MODEL_SAVE_PATH) if EXPORT_FORMATS else []
+
+    # New registry version with the last epoch's metrics; activating it is up to the caller
+    metrics = {name: float(values[-1]) for name, values in history.history.items()}
+    return model_registry.register(
+        {"keras": MODEL_SAVE_PATH, **dict(zip(EXPORT_FORMATS, exported))},
+        metrics=metrics,
+        threshold=GARBAGE_THRESHOLD,
+        source="train"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the garbage classifier")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads for TensorFlow (0: all)")
+    parser.add_argument("--events", action="store_true", help="Print progress events for the job runner")
+    args = parser.parse_args()
+
+    if args.threads:
+        # Must happen before TensorFlow runs its first op
+        tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+        tf.config.threading.set_inter_op_parallelism_threads(min(2, args.threads))
+
+    if not args.events:
+        train()
+        return
+    emit_event("started", epochs=EPOCHS)
+    # One line per epoch instead of progress bars
+    metadata = train(callbacks=[ProgressEvents(EPOCHS)], verbose=2)
+    if metadata is None:
+        sys.exit(1)
+    emit_event("registered", version=metadata["version"], metadata=metadata)
+
 if __name__ == "__main__":
-    train()
+    main()
@@ -1,22 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import datetime
 import uuid
 from .. import database, schemas
 from ..models import user as models
 from ..models import activity as activity_models
-from ..services.activity import log_activity
-from .auth import get_current_user, get_password_hash
+from ..services.activity import activity_logger, log_activity
+from ..services.pagination import PageParams, ReportFilters, ActivityLogFilters, paginate_reports, paginate_activity_logs
+from ..services.loading import reports_query
+from ..services.stats import dashboard_stats, publish_from_thread
+from ..services.principals import principal_cache
+from ..services.passwords import password_hasher
+from ..services.training import training_runner
+from .auth import get_current_user
 import sys
 import os
 
 # Add project root to path to allow importing ai_service
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-from ai_service.train import train as train_model
 from ai_service.inference import inference_service
+from ai_service.registry import model_registry
 
 from ..services.websocket import manager
+from ..services.ai import ai_service
+from ..services.executor import inference_executor
 
 router = APIRouter()
 
@@ -31,39 +41,105 @@ def get_dashboard_stats(
 ):
     check_admin(current_user)
     
-    active_complaints = db.query(models.Report).filter(
-        models.Report.status.in_([models.ReportStatus.PENDING, models.ReportStatus.ASSIGNED])
-    ).count()
-    
-    online_workers = manager.get_active_count()
-    
+    # Served from in-memory counters; deltas are pushed over /ws
+    dashboard_stats.ensure_loaded(db)
+    return {
+        **dashboard_stats.snapshot(),
+        "online_workers": manager.get_active_count()
+    }
+
+@router.post("/admin/retrain")
+async def retrain_model(current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    # Trains in a separate, lower-priority process; progress is pushed over /ws
+    job = training_runner.start(requested_by=current_user.id)
+    log_activity("RETRAIN_MODEL", f"Admin started training job {job.id}", current_user.id)
+    return {"message": "Model training started in background", "job_id": job.id}
+
+@router.get("/admin/training")
+def list_training_jobs(current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    return training_runner.recent()
+
+@router.get("/admin/training/{job_id}")
+def get_training_job(job_id: str, current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    job = training_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@router.post("/admin/training/{job_id}/cancel")
+async def cancel_training_job(job_id: str, current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    # Works from any worker: the one running the job sees the cancellation
+    job = training_runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    if job["state"] not in ("queued", "running"):
+        raise HTTPException(status_code=400, detail=f"Training job already {job['state']}")
+    return job
+
+@router.get("/admin/inference/stats")
+def get_inference_stats(current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
     return {
-        "active_complaints": active_complaints,
-        "online_workers": online_workers
+        "batching": inference_service.batching_stats(),
+        "prediction_cache": ai_service.cache_stats(),
+        "executor": inference_executor.stats(),
+        "models": ai_service.readiness(),
+        "predictions_by_version": inference_service.version_stats()
     }
 
-def run_training_task():
-    print("Starting background training task...")
+@router.get("/admin/models")
+def list_model_versions(current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    # Prediction counts are per process
+    counts = inference_service.version_stats()
+    return {
+        "active": model_registry.active_version(),
+        "serving": inference_service.model_version,
+        "previous": model_registry.previous_version(),
+        "versions": [
+            {**version, "predictions": counts.get(version["version"], {"predictions": 0, "garbage": 0})}
+            for version in model_registry.versions()
+        ]
+    }
+
+@router.post("/admin/models/{version}/activate")
+def activate_model_version(version: str, current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
     try:
-        train_model()
-        print("Training complete. Reloading model...")
-        inference_service.reload_model()
+        inference_service.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Model version not found")
     except Exception as e:
-        print(f"Training failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Could not load model version {version}: {e}")
+    log_activity("ACTIVATE_MODEL", f"Admin activated model version {version}", current_user.id)
+    return {"active": version}
 
-@router.post("/admin/retrain")
-def retrain_model(background_tasks: BackgroundTasks, current_user: models.User = Depends(get_current_user)):
+@router.post("/admin/models/rollback")
+def rollback_model_version(current_user: models.User = Depends(get_current_user)):
     check_admin(current_user)
-    background_tasks.add_task(run_training_task)
-    return {"message": "Model training started in background"}
+    try:
+        version = inference_service.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not roll back the model: {e}")
+    log_activity("ROLLBACK_MODEL", f"Admin rolled back to model version {version}", current_user.id)
+    return {"active": version}
 
 @router.get("/admin/reports", response_model=List[schemas.Report])
 def read_all_reports(
+    response: Response,
+    page: PageParams = Depends(),
+    filters: ReportFilters = Depends(),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
     check_admin(current_user)
-    return db.query(models.Report).all()
+    return paginate_reports(reports_query(db), filters.criteria(), page, response)
 
 import secrets
 import string
@@ -75,40 +151,50 @@ def generate_short_token(length=8):
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
 @router.post("/admin/workers", response_model=schemas.User)
-def create_worker(user: schemas.UserCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+async def create_worker(user: schemas.UserCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
     check_admin(current_user)
     
-    # Check email uniqueness
-    if db.query(models.User).filter(models.User.email == user.email).first():
-        raise HTTPException(status_code=400, detail="Email already registered")
+    def check_unique():
+        # Check email uniqueness
+        if db.query(models.User).filter(models.User.email == user.email).first():
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        # Handle phone number
+        phone_number = user.phone_number
+        if phone_number:
+            # Check phone number uniqueness if provided
+            if db.query(models.User).filter(models.User.phone_number == phone_number).first():
+                raise HTTPException(status_code=400, detail="Phone number already registered")
+        else:
+            # Convert empty string to None to avoid unique constraint violation
+            phone_number = None
+        return phone_number
     
-    # Handle phone number
-    phone_number = user.phone_number
-    if phone_number:
-        # Check phone number uniqueness if provided
-        if db.query(models.User).filter(models.User.phone_number == phone_number).first():
-            raise HTTPException(status_code=400, detail="Phone number already registered")
-    else:
-        # Convert empty string to None to avoid unique constraint violation
-        phone_number = None
-    
-    hashed_password = get_password_hash(user.password)
+    phone_number = await run_in_threadpool(check_unique)
+    # bcrypt runs on its own pool, not the event loop or the shared threadpool
+    hashed_password = await password_hasher.hash(user.password)
     # Generate QR token (Short, fixed length)
     qr_token = generate_short_token()
     
-    db_user = models.User(
-        email=user.email,
-        hashed_password=hashed_password,
-        full_name=user.full_name,
-        phone_number=phone_number,
-        role=models.UserRole.WORKER,
-        qr_login_token=qr_token
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    def create():
+        db_user = models.User(
+            email=user.email,
+            hashed_password=hashed_password,
+            full_name=user.full_name,
+            phone_number=phone_number,
+            role=models.UserRole.WORKER,
+            qr_login_token=qr_token
+        )
+        db.add(db_user)
+        db.commit()
+        db.refresh(db_user)
+        return schemas.User.model_validate(db_user)
     
-    log_activity(db, "CREATE_WORKER", f"Admin created worker {db_user.email}", current_user.id)
+    db_user = await run_in_threadpool(create)
+    # A deleted account with this email may still be cached
+    principal_cache.invalidate(db_user.email)
+    
+    log_activity("CREATE_WORKER", f"Admin created worker {db_user.email}", current_user.id)
     
     return db_user
 
@@ -130,8 +216,11 @@ def delete_worker(worker_id: int, current_user: models.User = Depends(get_curren
     email = worker.email
     db.delete(worker)
     db.commit()
+    # Its tokens stop working now rather than when the cache entry expires
+    principal_cache.invalidate(email)
+    publish_from_thread(dashboard_stats.worker_removed(worker_id))
     
-    log_activity(db, "DELETE_WORKER", f"Admin deleted worker {email}", current_user.id)
+    log_activity("DELETE_WORKER", f"Admin deleted worker {email}", current_user.id)
     
     return {"message": "Worker deleted successfully"}
 
@@ -145,6 +234,7 @@ def regenerate_qr(worker_id: int, current_user: models.User = Depends(get_curren
     worker.qr_login_token = generate_short_token()
     db.commit()
     db.refresh(worker)
+    principal_cache.invalidate(worker.email)
     return worker
 
 @router.get("/admin/users", response_model=List[schemas.User])
@@ -165,8 +255,49 @@ def read_all_users(
 
 @router.get("/admin/activity-logs", response_model=List[schemas.ActivityLog])
 def read_activity_logs(
+    response: Response,
+    page: PageParams = Depends(),
+    filters: ActivityLogFilters = Depends(),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
     check_admin(current_user)
-    return db.query(activity_models.ActivityLog).order_by(activity_models.ActivityLog.timestamp.desc()).all()
+    return paginate_activity_logs(db.query(activity_models.ActivityLog), filters.criteria(), page, response)
+
+@router.get("/admin/activity-logs/daily", response_model=List[schemas.ActivityLogDaily])
+def read_activity_log_daily(
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+    action: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Per-day counts for logs that retention has moved out of the activity log."""
+    check_admin(current_user)
+    Daily = activity_models.ActivityLogDaily
+    query = db.query(Daily)
+    if since is not None:
+        query = query.filter(Daily.day >= since)
+    if until is not None:
+        query = query.filter(Daily.day < until)
+    if action is not None:
+        query = query.filter(Daily.action == action)
+    return query.order_by(Daily.day.desc(), Daily.action).all()
+
+@router.get("/admin/activity-logs/stats")
+def get_activity_log_stats(current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    return activity_logger.stats()
+
+@router.get("/admin/auth/stats")
+def get_auth_stats(current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    return {
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats()
+    }
+
+@router.get("/admin/websocket/stats")
+def get_websocket_stats(current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    return manager.stats()
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
@@ -6,11 +7,13 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from .. import database, schemas
 from ..models import user as models
+from ..services import websocket
 from ..services.websocket import manager
 from ..services.activity import log_activity
+from ..services.principals import Principal, principal_cache
+from ..services.passwords import password_hasher, pwd_context
 
 router = APIRouter()
 
@@ -19,15 +22,19 @@ SECRET_KEY = "your-secret-key-keep-it-secret" # In production, use env var
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Blocking versions for scripts and tests; request handlers use `password_hasher`
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def token_claims(user: models.User) -> dict:
+    """Subject plus id and role, so requests can be authorized from the principal cache."""
+    return {"sub": user.email, "uid": user.id, "role": user.role}
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -39,39 +46,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 @router.post("/auth/signup", response_model=schemas.User)
-def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    if user.phone_number:
-        db_phone = db.query(models.User).filter(models.User.phone_number == user.phone_number).first()
-        if db_phone:
-            raise HTTPException(status_code=400, detail="Phone number already registered")
-    
-    hashed_password = get_password_hash(user.password)
-    new_user = models.User(
-        email=user.email,
-        phone_number=user.phone_number,
-        hashed_password=hashed_password,
-        full_name=user.full_name,
-        role=user.role
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+async def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    def check_unique():
+        if db.query(models.User).filter(models.User.email == user.email).first():
+            raise HTTPException(status_code=400, detail="Email already registered")
+        if user.phone_number:
+            if db.query(models.User).filter(models.User.phone_number == user.phone_number).first():
+                raise HTTPException(status_code=400, detail="Phone number already registered")
+
+    await run_in_threadpool(check_unique)
+    # bcrypt runs on its own pool, not the event loop or the shared threadpool
+    hashed_password = await password_hasher.hash(user.password)
+
+    def create():
+        new_user = models.User(
+            email=user.email,
+            phone_number=user.phone_number,
+            hashed_password=hashed_password,
+            full_name=user.full_name,
+            role=user.role
+        )
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+        return schemas.User.model_validate(new_user)
+
+    new_user = await run_in_threadpool(create)
     
-    log_activity(db, "SIGNUP", f"User {new_user.email} registered", new_user.id)
+    log_activity("SIGNUP", f"User {new_user.email} registered", new_user.id)
     
     return new_user
 
 @router.post("/auth/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(
-        or_(models.User.email == form_data.username, models.User.phone_number == form_data.username)
-    ).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(
+            or_(models.User.email == form_data.username, models.User.phone_number == form_data.username)
+        ).first()
+    )
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await password_hasher.verify(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email/phone or password",
@@ -80,10 +97,18 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
+    user_id, user_email = user.id, user.email
+
+    if new_hash is not None:
+        # Stored with old cost parameters: upgrade now that we have the password
+        def store_rehash():
+            user.hashed_password = new_hash
+            db.commit()
+        await run_in_threadpool(store_rehash)
     
-    log_activity(db, "LOGIN", f"User {user.email} logged in", user.id)
+    log_activity("LOGIN", f"User {user_email} logged in", user_id)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -92,7 +117,9 @@ class QRLoginRequest(BaseModel):
 
 @router.post("/auth/qr-login", response_model=schemas.Token)
 async def qr_login(request: QRLoginRequest, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.qr_login_token == request.token).first()
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.qr_login_token == request.token).first()
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -102,41 +129,69 @@ async def qr_login(request: QRLoginRequest, db: Session = Depends(database.get_d
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     
     # Notify admins
-    await manager.broadcast(f"Worker {user.full_name} logged in via QR code")
+    manager.publish([websocket.ADMINS], websocket.event(
+        "worker_login", worker_id=user.id, message=f"Worker {user.full_name} logged in via QR code"
+    ))
     
-    log_activity(db, "QR_LOGIN", f"Worker {user.full_name} logged in via QR", user.id)
+    log_activity("QR_LOGIN", f"Worker {user.full_name} logged in via QR", user.id)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+# Plain `def` so FastAPI runs the user lookup in the threadpool, not on the event loop
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = user_for_token(token, db)
     if user is None:
         raise credentials_exception
     return user
 
+def user_for_token(token: Optional[str], db: Session) -> Optional[Principal]:
+    """The user a valid access token belongs to, or None. Served from the principal cache when possible."""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    email: str = payload.get("sub")
+    if email is None:
+        return None
+
+    principal = principal_cache.get(email)
+    if principal is None or not principal.matches(payload):
+        # Newer tokens carry the id: a primary key lookup instead of one by email
+        uid = payload.get("uid")
+        if uid is not None:
+            user = db.get(models.User, uid)
+        else:
+            user = db.query(models.User).filter(models.User.email == email).first()
+        if user is None or user.email != email:
+            principal_cache.invalidate(email)
+            return None
+        principal = Principal.from_user(user)
+        principal_cache.set(email, principal)
+
+    # A token issued before a role change or for a since-recreated account is refused
+    if not principal.matches(payload):
+        return None
+    return principal
+
 @router.get("/auth/me", response_model=schemas.User)
 def read_users_me(current_user: models.User = Depends(get_current_user)):
     return current_user
 
 @router.post("/auth/logout")
 async def logout(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    await manager.broadcast(f"Worker {current_user.full_name} logged out")
-    log_activity(db, "LOGOUT", f"User {current_user.email} logged out", current_user.id)
+    manager.publish([websocket.ADMINS], websocket.event(
+        "user_logout", user_id=current_user.id, message=f"Worker {current_user.full_name} logged out"
+    ))
+    log_activity("LOGOUT", f"User {current_user.email} logged out", current_user.id)
     return {"message": "Logged out successfully"}
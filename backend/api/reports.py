@@ -1,30 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
-import shutil
-import os
-import uuid
+import contextlib
 import random
 import string
 from .. import database, schemas
 from ..models import user as models
 from ..services.ai import ai_service
+from ..services.executor import inference_executor
 from ..services.websocket import manager
 from ..services.activity import log_activity
+from ..services.pagination import PageParams, ReportFilters, paginate_reports
+from ..services.loading import reports_query
+from ..services.uploads import save_upload, get_media_type
+from ..services import media_store, stats, thumbnails, websocket
 from .auth import get_current_user
 
 router = APIRouter()
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @router.post("/reports/predict")
 async def predict_garbage(file: UploadFile = File(...)):
+    ai_service.require_ready()
     contents = await file.read()
-    is_garbage = ai_service.detect_garbage_bytes(contents)
+    is_garbage = await inference_executor.run(ai_service.detect_garbage_bytes, contents)
     return {"is_garbage": is_garbage}
 
-@router.post("/reports/", response_model=schemas.Report)
+@router.post("/reports/", response_model=schemas.ReportCreated)
 async def create_report(
     description: str = Form(...),
     latitude: float = Form(...),
@@ -34,102 +36,101 @@ async def create_report(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    saved_files = []
-    garbage_detected = False
-    
-    try:
+    admission = contextlib.nullcontext()
+    if any(get_media_type(file) == "image" for file in files):
+        # Checked before the uploads are stored
+        ai_service.require_ready()
+        # The whole report takes one inference slot, so a busy server answers 503 before the upload is saved
+        admission = inference_executor.admit()
+
+    async with admission:
+        saved_files = []
+
         for file in files:
-            # Save the file with a unique name
-            file_ext = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_ext}"
-            file_location = f"{UPLOAD_DIR}/{unique_filename}"
-            
-            with open(file_location, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            media_type = "video" if file.content_type.startswith("video") else "image"
-            saved_files.append({"url": file_location, "type": media_type})
-
-            # AI Verification (only for images)
-            if media_type == "image" and not garbage_detected:
-                if ai_service.detect_garbage(file_location):
-                    garbage_detected = True
-        
-        # If images were uploaded, ensure at least one has garbage
-        has_images = any(f["type"] == "image" for f in saved_files)
-        if has_images and not garbage_detected:
-            # Cleanup
-            for f in saved_files:
-                if os.path.exists(f["url"]):
-                    os.remove(f["url"])
-            raise HTTPException(status_code=400, detail="No garbage detected in the uploaded images.")
-        
-        # Generate Complaint ID
-        # Extract first 3 chars of first word, uppercase
-        prefix = description.split()[0][:3].upper() if description else "CMP"
-        # Ensure alphanumeric
-        prefix = "".join(c for c in prefix if c.isalnum())
-        # Pad if too short
-        if len(prefix) < 3:
-            prefix = (prefix + "XXX")[:3]
-            
-        suffix = ''.join(random.choices(string.digits, k=5))
-        complaint_id = f"{prefix}-{suffix}"
-
-        # Use the first file as the main image_url for backward compatibility
-        main_image_url = saved_files[0]["url"] if saved_files else ""
-
-        db_report = models.Report(
-            description=description,
-            latitude=latitude,
-            longitude=longitude,
-            address=address,
-            image_url=main_image_url,
-            owner_id=current_user.id,
-            complaint_id=complaint_id
-        )
-        db.add(db_report)
-        db.commit()
-        db.refresh(db_report)
-        
-        # Save media entries
-        for f in saved_files:
-            db_media = models.ReportMedia(
-                report_id=db_report.id,
-                file_url=f["url"],
-                media_type=f["type"]
-            )
-            db.add(db_media)
-        
-        db.commit()
-        db.refresh(db_report)
-        
-        await manager.broadcast(f"New Task Available: {description}")
-        log_activity(db, "CREATE_REPORT", f"User {current_user.email} created report {db_report.id}", current_user.id)
-        
-        return db_report
-    except Exception as e:
-        # Cleanup if something fails and file exists
-        for f in saved_files:
-             if os.path.exists(f["url"]):
-                 os.remove(f["url"])
-        raise e
+            # Stream the file into the content-addressed store (size-limited, hashed)
+            saved_files.append(await save_upload(file))
+
+        # AI Verification (only for images): all images are screened concurrently,
+        # decoded from the bytes we already have in memory
+        images = [f for f in saved_files if f["type"] == "image"]
+        screening = await ai_service.screen_images([f["url"] for f in images], [f["content"] for f in images])
+    garbage_detected = any(s["is_garbage"] for s in screening)
+
+    # If images were uploaded, ensure at least one has garbage
+    has_images = len(images) > 0
+    if has_images and not garbage_detected:
+        # Rejected files are left to the media store sweep: identical bytes
+        # may already be referenced by another report
+        raise HTTPException(status_code=400, detail="No garbage detected in the uploaded images.")
+
+    # Database work runs in the threadpool so it never blocks the event loop.
+    # Read user fields first: the commit expires them and reloading would hit the DB here.
+    user_id, user_email = current_user.id, current_user.email
+    response, delta = await run_in_threadpool(_save_report, db, user_id, description, latitude, longitude, address, saved_files)
+
+    # Thumbnails and mid-size variants are made in the background
+    for f in images:
+        thumbnails.schedule(f["url"], f["content"])
+
+    manager.publish([websocket.ADMINS, *websocket.location_topics(latitude, longitude)], websocket.event(
+        "task_created", report_id=response.id, latitude=latitude, longitude=longitude,
+        message=f"New Task Available: {description}"
+    ))
+    stats.publish(delta)
+    log_activity("CREATE_REPORT", f"User {user_email} created report {response.id}", user_id)
+
+    response.screening = [schemas.ImageScreening(**s) for s in screening]
+    return response
+
+def _save_report(db: Session, owner_id: int, description: str, latitude: float, longitude: float, address: str, saved_files: list):
+    # Generate Complaint ID
+    # Extract first 3 chars of first word, uppercase
+    prefix = description.split()[0][:3].upper() if description else "CMP"
+    # Ensure alphanumeric
+    prefix = "".join(c for c in prefix if c.isalnum())
+    # Pad if too short
+    if len(prefix) < 3:
+        prefix = (prefix + "XXX")[:3]
+
+    suffix = ''.join(random.choices(string.digits, k=5))
+    complaint_id = f"{prefix}-{suffix}"
+
+    # Use the first file as the main image_url for backward compatibility
+    main_image_url = saved_files[0]["url"] if saved_files else ""
+
+    db_report = models.Report(
+        description=description,
+        latitude=latitude,
+        longitude=longitude,
+        address=address,
+        image_url=main_image_url,
+        owner_id=owner_id,
+        complaint_id=complaint_id
+    )
+    # Report and media entries are written in one transaction
+    db_report.media = [models.ReportMedia(file_url=f["url"], media_type=f["type"]) for f in saved_files]
+    db.add(db_report)
+    db.commit()
+    db.refresh(db_report)
+
+    # Serialize here as well, so lazy loads stay off the event loop
+    return schemas.ReportCreated.model_validate(db_report), stats.dashboard_stats.report_created(db_report)
 
 @router.get("/reports/", response_model=List[schemas.Report])
 def read_reports(
-    skip: int = 0, 
-    limit: int = 100, 
+    response: Response,
+    page: PageParams = Depends(),
+    filters: ReportFilters = Depends(),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     if current_user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
-    reports = db.query(models.Report).offset(skip).limit(limit).all()
-    return reports
+    return paginate_reports(reports_query(db), filters.criteria(), page, response)
 
 @router.get("/reports/my", response_model=List[schemas.Report])
 def read_my_reports(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    return current_user.reports
+    return reports_query(db).filter(models.Report.owner_id == current_user.id).order_by(models.Report.id).all()
 
 @router.put("/reports/{report_id}/review", response_model=schemas.Report)
 def review_report(
@@ -145,9 +146,16 @@ def review_report(
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
         
+    old_status = report.status
     report.status = status
     db.commit()
     db.refresh(report)
+    stats.publish_from_thread(stats.dashboard_stats.status_changed(report, old_status, report.worker_id, report.cleanup_time))
+    if report.worker_id is not None:
+        websocket.publish_from_thread([websocket.worker_topic(report.worker_id)], websocket.event(
+            "task_reviewed", report_id=report.id, status=status.value,
+            message=f"Task #{report.id} marked {status.value}"
+        ))
     return report
 
 @router.delete("/reports/{report_id}")
@@ -163,13 +171,15 @@ def delete_report(
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
-    # Optional: Delete the image file associated with the report
-    if report.image_url and os.path.exists(report.image_url):
-        try:
-            os.remove(report.image_url)
-        except Exception as e:
-            print(f"Error deleting file {report.image_url}: {e}")
+    urls = {report.image_url, report.cleanup_image_url}
+    urls.update(media.file_url for media in report.media)
 
+    delta = stats.dashboard_stats.report_deleted(report)
     db.delete(report)
     db.commit()
+    stats.publish_from_thread(delta)
+
+    # Delete the files unless another report shares the same content
+    for url in urls:
+        media_store.release(db, url)
     return {"message": "Report deleted successfully"}
@@ -1,17 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
-import shutil
-import os
-import uuid
+from typing import List, Optional
 import datetime
 from .. import database, schemas
 from ..models import user as models
 from ..services.ai import ai_service
+from ..services.executor import inference_executor
 from ..services.websocket import manager
 from ..services.activity import log_activity
+from ..services.pagination import PageParams, ReportFilters, paginate_reports
+from ..services.loading import reports_query
+from ..services.uploads import save_upload
+from ..services import geo, stats, thumbnails, websocket
 from .auth import get_current_user
-import math
 
 router = APIRouter()
 
@@ -19,13 +21,51 @@ router = APIRouter()
 def read_my_tasks(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
     if current_user.role != models.UserRole.WORKER:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return current_user.tasks
+    return reports_query(db).filter(models.Report.worker_id == current_user.id).order_by(models.Report.id).all()
 
 @router.get("/tasks/available", response_model=List[schemas.Report])
-def read_available_tasks(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def read_available_tasks(
+    response: Response,
+    page: PageParams = Depends(),
+    filters: ReportFilters = Depends(),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    if current_user.role != models.UserRole.WORKER:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    # Only pending tasks are available, whatever status filter was passed
+    filters.status = [models.ReportStatus.PENDING]
+    return paginate_reports(reports_query(db), filters.criteria(), page, response)
+
+@router.get("/tasks/nearby", response_model=List[schemas.NearbyTask])
+def read_nearby_tasks(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_m: Optional[float] = Query(None, gt=0, le=geo.MAX_RADIUS_M),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Pending tasks closest to the given location, nearest first: the
+    `limit` nearest, or only those within `radius_m` if it is given.
+    """
     if current_user.role != models.UserRole.WORKER:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return db.query(models.Report).filter(models.Report.status == models.ReportStatus.PENDING).all()
+
+    def pending_points(ranges):
+        return db.query(models.Report.id, models.Report.latitude, models.Report.longitude).filter(
+            geo.cell_filter(models.Report.geo_cell, ranges, models.Report.status == models.ReportStatus.PENDING)
+        ).all()
+
+    nearest = geo.nearest(pending_points, latitude, longitude, radius_m, limit)
+    reports = {r.id: r for r in reports_query(db).filter(models.Report.id.in_([id for id, _ in nearest]))}
+    tasks = []
+    for id, distance in nearest:
+        task = reports[id]
+        task.distance_m = round(distance, 1)
+        tasks.append(task)
+    return tasks
 
 @router.post("/tasks/{report_id}/claim", response_model=schemas.Report)
 async def claim_task(
@@ -36,6 +76,22 @@ async def claim_task(
     if current_user.role != models.UserRole.WORKER:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    # Read user fields before the commit expires them
+    worker_id, worker_name, worker_email = current_user.id, current_user.full_name, current_user.email
+    report, delta = await run_in_threadpool(_claim_task, db, report_id, worker_id)
+    
+    # Other workers drop it from their available list
+    manager.publish(
+        [websocket.ADMINS, websocket.worker_topic(worker_id), *websocket.location_topics(report.latitude, report.longitude)],
+        websocket.event("task_claimed", report_id=report.id, worker_id=worker_id,
+                        message=f"Task #{report.id} claimed by {worker_name}")
+    )
+    stats.publish(delta)
+    log_activity("CLAIM_TASK", f"Worker {worker_email} claimed task {report.id}", worker_id)
+    
+    return report
+
+def _claim_task(db: Session, report_id: int, worker_id: int):
     report = db.query(models.Report).filter(models.Report.id == report_id).first()
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -43,29 +99,15 @@ async def claim_task(
     if report.status != models.ReportStatus.PENDING:
         raise HTTPException(status_code=400, detail="Task is not available")
     
-    report.worker_id = current_user.id
+    old_status, old_worker_id = report.status, report.worker_id
+    report.worker_id = worker_id
     report.status = models.ReportStatus.ASSIGNED
     db.commit()
     db.refresh(report)
-    
-    await manager.broadcast(f"Task #{report.id} claimed by {current_user.full_name}")
-    log_activity(db, "CLAIM_TASK", f"Worker {current_user.email} claimed task {report.id}", current_user.id)
-    
-    return report
+    return schemas.Report.model_validate(report), stats.dashboard_stats.status_changed(report, old_status, old_worker_id)
 
 def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371e3 # Earth radius in meters
-    phi1 = lat1 * math.pi / 180
-    phi2 = lat2 * math.pi / 180
-    delta_phi = (lat2 - lat1) * math.pi / 180
-    delta_lambda = (lon2 - lon1) * math.pi / 180
-
-    a = math.sin(delta_phi / 2) * math.sin(delta_phi / 2) + \
-        math.cos(phi1) * math.cos(phi2) * \
-        math.sin(delta_lambda / 2) * math.sin(delta_lambda / 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    return R * c
+    return float(geo.haversine(lat1, lon1, lat2, lon2))
 
 @router.post("/tasks/{report_id}/complete", response_model=schemas.Report)
 async def complete_task(
@@ -78,12 +120,17 @@ async def complete_task(
 ):
     if current_user.role != models.UserRole.WORKER:
         raise HTTPException(status_code=403, detail="Not authorized")
+    ai_service.require_ready()
     
-    report = db.query(models.Report).filter(models.Report.id == report_id).first()
+    # Database work runs in the threadpool; read user fields before the commit expires them
+    worker_id, worker_name, worker_email = current_user.id, current_user.full_name, current_user.email
+    report = await run_in_threadpool(
+        lambda: db.query(models.Report).filter(models.Report.id == report_id).first()
+    )
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
-    if report.worker_id != current_user.id:
+    if report.worker_id != worker_id:
         raise HTTPException(status_code=403, detail="Not assigned to this task")
 
     # GPS Verification
@@ -91,32 +138,36 @@ async def complete_task(
     if distance > 200: # 200 meters radius
         raise HTTPException(status_code=400, detail=f"Location mismatch. You are {int(distance)}m away from the task location.")
 
-    # Save the file with a unique name
-    file_ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"cleanup_{uuid.uuid4()}{file_ext}"
-    file_location = f"uploads/{unique_filename}"
-    
-    try:
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # AI Verification
-        if not ai_service.verify_cleanup(report.image_url, file_location):
-            os.remove(file_location)
-            raise HTTPException(status_code=400, detail="Cleanup verification failed. Garbage still detected.")
-        
-        report.cleanup_image_url = file_location
-        report.cleanup_time = datetime.datetime.utcnow()
-        report.status = models.ReportStatus.CLEANED
-        
-        db.commit()
-        db.refresh(report)
-        
-        await manager.broadcast(f"Task #{report.id} completed by {current_user.full_name}")
-        log_activity(db, "COMPLETE_TASK", f"Worker {current_user.email} completed task {report.id}", current_user.id)
-        
-        return report
-    except Exception as e:
-        if os.path.exists(file_location) and report.status != models.ReportStatus.CLEANED:
-             os.remove(file_location)
-        raise e
+    # Stream the file into the content-addressed store (size-limited, hashed)
+    upload = await save_upload(file)
+    file_location = upload["url"]
+
+    # AI Verification, run off the event loop on the bytes already in memory
+    if not await inference_executor.run(ai_service.verify_cleanup, report.image_url, file_location, upload["content"]):
+        # The rejected file is left to the media store sweep
+        raise HTTPException(status_code=400, detail="Cleanup verification failed. Garbage still detected.")
+
+    response, delta = await run_in_threadpool(_mark_cleaned, db, report, file_location)
+
+    if upload["type"] == "image":
+        thumbnails.schedule(file_location, upload["content"])
+
+    manager.publish([websocket.ADMINS, websocket.worker_topic(worker_id)], websocket.event(
+        "task_completed", report_id=report_id, worker_id=worker_id,
+        message=f"Task #{report_id} completed by {worker_name}"
+    ))
+    stats.publish(delta)
+    log_activity("COMPLETE_TASK", f"Worker {worker_email} completed task {report_id}", worker_id)
+
+    return response
+
+def _mark_cleaned(db: Session, report: models.Report, cleanup_url: str):
+    old_status, old_cleanup_time = report.status, report.cleanup_time
+    report.cleanup_image_url = cleanup_url
+    report.cleanup_time = datetime.datetime.utcnow()
+    report.status = models.ReportStatus.CLEANED
+
+    db.commit()
+    db.refresh(report)
+    delta = stats.dashboard_stats.status_changed(report, old_status, report.worker_id, old_cleanup_time)
+    return schemas.Report.model_validate(report), delta
@@ -1,10 +1,22 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Depends, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from .database import engine, Base
+from . import database
+from .models import user as models
 from fastapi.staticfiles import StaticFiles
 from .api import auth, reports, tasks, admin
 from .services.websocket import manager
+from .services import media_store, geo, log_retention, stats, broadcast, thumbnails
+from .services.training import training_runner
+from .services import websocket as ws
+from .services.activity import activity_logger
+from .services.ai import ai_service, run_model_sync_loop, MODEL_WARMUP
+from contextlib import asynccontextmanager
+from sqlalchemy.orm import Session
+from typing import Optional
+import asyncio
 import os
 from sqlalchemy import text
 
@@ -31,11 +43,121 @@ except Exception as e:
     # Column likely exists
     pass
 
-app = FastAPI(title="Smart Waste Management System")
+# Migration: Indexes for report and activity log listings on databases created before they existed
+try:
+    with engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_created_at ON reports (created_at)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_owner_id ON reports (owner_id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_worker_id ON reports (worker_id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_status_created_at_id ON reports (status, created_at, id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_activity_logs_timestamp_id ON activity_logs (timestamp, id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_activity_logs_user_id_timestamp ON activity_logs (user_id, timestamp)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_activity_logs_action_timestamp ON activity_logs (action, timestamp)"))
+        conn.commit()
+except Exception as e:
+    print(f"Index migration failed: {e}")
+
+# Migration: Add geo_cell column (spatial index) to reports and backfill it
+try:
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE reports ADD COLUMN geo_cell INTEGER"))
+        conn.commit()
+        print("Migrated: Added geo_cell column")
+except Exception as e:
+    # Column likely exists
+    pass
+
+try:
+    with engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_status_geo_cell ON reports (status, geo_cell, latitude, longitude)"))
+        rows = conn.execute(text(
+            "SELECT id, latitude, longitude FROM reports WHERE geo_cell IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL"
+        )).all()
+        if rows:
+            conn.execute(
+                text("UPDATE reports SET geo_cell = :cell WHERE id = :id"),
+                [{"id": id, "cell": geo.cell_for(lat, lng)} for id, lat, lng in rows]
+            )
+            print(f"Migrated: Backfilled geo_cell for {len(rows)} reports")
+        conn.commit()
+except Exception as e:
+    print(f"geo_cell migration failed: {e}")
+
+# Migration: Add thumbnail flags, backfilled once from the variant files on disk
+flags_added = False
+for table, column in (("reports", "variants_ready"), ("reports", "cleanup_variants_ready"), ("report_media", "variants_ready")):
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} BOOLEAN NOT NULL DEFAULT FALSE"))
+            conn.commit()
+            print(f"Migrated: Added {table}.{column} column")
+            flags_added = True
+    except Exception as e:
+        # Column likely exists
+        pass
+
+if flags_added:
+    try:
+        with engine.connect() as conn:
+            urls = {url for (url,) in conn.execute(text(
+                "SELECT image_url FROM reports UNION SELECT cleanup_image_url FROM reports "
+                "UNION SELECT file_url FROM report_media WHERE media_type = 'image'"
+            )) if url}
+        db = database.SessionLocal()
+        try:
+            for url in urls:
+                if thumbnails.has_variants(url):
+                    thumbnails.record_variants(db, url)
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Thumbnail flag backfill failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the AI models off the startup path (see backend/services/ai.py)
+    model_warmup = None
+    if MODEL_WARMUP == "blocking":
+        await ai_service.warm_up()
+    elif MODEL_WARMUP == "background":
+        model_warmup = asyncio.create_task(ai_service.warm_up())
+    # Follow model versions activated by other workers/replicas
+    model_sync = asyncio.create_task(run_model_sync_loop())
+    # Background sweep removing media no report references any more
+    media_gc = asyncio.create_task(media_store.run_gc_loop())
+    # Daily job moving old activity logs to archives and summaries
+    log_retention_job = asyncio.create_task(log_retention.run_retention_loop())
+    # Websocket events and presence shared with other workers/replicas
+    backend = broadcast.create_backend()
+    bus = broadcast.BroadcastBus(backend) if backend is not None else None
+    if bus is not None:
+        await bus.start(manager)
+    yield
+    # Stop a training job still running in its child process
+    await training_runner.shutdown()
+    if bus is not None:
+        await bus.stop()
+    media_gc.cancel()
+    log_retention_job.cancel()
+    if model_warmup is not None:
+        model_warmup.cancel()
+    model_sync.cancel()
+    # Write out activity events still queued in memory
+    await asyncio.to_thread(activity_logger.close)
+
+app = FastAPI(title="Smart Waste Management System", lifespan=lifespan)
+
+class MediaFiles(StaticFiles):
+    """Uploads are content-addressed, so a URL's bytes never change."""
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
 # Mount uploads directory
-os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+os.makedirs(media_store.UPLOAD_DIR, exist_ok=True)
+app.mount("/uploads", MediaFiles(directory=media_store.UPLOAD_DIR), name="uploads")
 
 # Mount frontend static files if they exist (Production mode)
 if os.path.exists("frontend/dist/assets"):
@@ -52,6 +174,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination metadata for list endpoints
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 app.include_router(auth.router, tags=["Authentication"])
@@ -59,16 +183,48 @@ app.include_router(reports.router, tags=["Reports"])
 app.include_router(tasks.router, tags=["Tasks"])
 app.include_router(admin.router, tags=["Admin"])
 
+@app.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def readiness():
+    # 503 while the AI models are still warming up, for load balancer checks
+    models_status = ai_service.readiness()
+    return JSONResponse(models_status, status_code=200 if models_status["ready"] else 503)
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
-    await manager.broadcast("STATS_UPDATE")
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = None, db: Session = Depends(database.get_db)):
+    # Browsers cannot set headers on websockets, so the access token comes as ?token=
+    def lookup():
+        try:
+            user = auth.user_for_token(token, db)
+            return (user.id, models.UserRole(user.role).value) if user else None
+        finally:
+            # Don't hold a pooled connection for the lifetime of the socket
+            db.close()
+
+    principal = await run_in_threadpool(lookup)
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id, role = principal
+    topics = [ws.role_topic(role)]
+    if role == models.UserRole.WORKER.value:
+        topics += [ws.worker_topic(user_id), ws.TASKS]
+
+    connection = await manager.connect(websocket, user_id=user_id, role=role, topics=topics)
+    if role == models.UserRole.WORKER.value:
+        stats.publish({"online_workers": 1})
     try:
         while True:
-            await websocket.receive_text()
+            manager.handle_message(connection, await websocket.receive_text())
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
-        await manager.broadcast("STATS_UPDATE")
+        if role == models.UserRole.WORKER.value:
+            stats.publish({"online_workers": -1})
 
 @app.get("/{full_path:path}")
 async def serve_spa(full_path: str):
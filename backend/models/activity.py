@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from ..database import Base
 import datetime
@@ -13,3 +13,24 @@ class ActivityLog(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
 
     user = relationship("User")
+
+    # Newest-first keyset pagination, optionally narrowed to one user or action
+    __table_args__ = (
+        Index("ix_activity_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_activity_logs_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_activity_logs_action_timestamp", "action", "timestamp"),
+    )
+
+class ActivityLogDaily(Base):
+    """Per-day, per-action counts of activity logs moved out of the hot table."""
+    __tablename__ = "activity_log_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    action = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    users = Column(Integer, nullable=False, default=0) # distinct users that day
+
+    __table_args__ = (
+        UniqueConstraint("day", "action", name="uq_activity_log_daily_day_action"),
+    )
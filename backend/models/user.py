@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Boolean, Column, Integer, String, Float, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from ..database import Base
+from ..services.geo import cell_for
 import datetime
 import enum
 
@@ -37,9 +38,14 @@ class ReportMedia(Base):
     report_id = Column(Integer, ForeignKey("reports.id"))
     file_url = Column(String)
     media_type = Column(String) # "image" or "video"
+    variants_ready = Column(Boolean, default=False, nullable=False) # Thumbnails generated, see services/thumbnails.py
     
     report = relationship("Report", back_populates="media")
 
+def _report_geo_cell(context):
+    params = context.get_current_parameters()
+    return cell_for(params.get("latitude"), params.get("longitude"))
+
 class Report(Base):
     __tablename__ = "reports"
 
@@ -48,15 +54,19 @@ class Report(Base):
     image_url = Column(String) # Path to the uploaded image (kept for backward compatibility, or primary image)
     latitude = Column(Float)
     longitude = Column(Float)
+    geo_cell = Column(Integer, default=_report_geo_cell, nullable=True) # Spatial index cell, see services/geo.py
     address = Column(String, nullable=True)
     complaint_id = Column(String, unique=True, index=True, nullable=True)
     status = Column(String, default=ReportStatus.PENDING)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
     cleanup_image_url = Column(String, nullable=True)
     cleanup_time = Column(DateTime, nullable=True)
+    # Thumbnails generated for image_url / cleanup_image_url, see services/thumbnails.py
+    variants_ready = Column(Boolean, default=False, nullable=False)
+    cleanup_variants_ready = Column(Boolean, default=False, nullable=False)
     
-    owner_id = Column(Integer, ForeignKey("users.id"))
-    worker_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    worker_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     
     owner = relationship("User", back_populates="reports", foreign_keys=[owner_id])
     worker = relationship("User", back_populates="tasks", foreign_keys=[worker_id])
@@ -64,3 +74,10 @@ class Report(Base):
     
     cleanup_image_url = Column(String, nullable=True)
     cleanup_time = Column(DateTime, nullable=True)
+
+    # Keyset pagination order for status-filtered listings (e.g. available tasks)
+    __table_args__ = (
+        Index("ix_reports_status_created_at_id", "status", "created_at", "id"),
+        # Nearby pending tasks
+        Index("ix_reports_status_geo_cell", "status", "geo_cell", "latitude", "longitude"),
+    )
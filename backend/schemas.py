@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 from .models.user import UserRole, ReportStatus
+from .services.thumbnails import variant_url
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -40,10 +41,20 @@ class ReportMedia(BaseModel):
     id: int
     file_url: str
     media_type: str
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
+    variants_ready: bool = Field(False, exclude=True)
     
     class Config:
         from_attributes = True
 
+    @model_validator(mode="after")
+    def add_variant_urls(self):
+        if self.media_type == "image" and self.variants_ready:
+            self.thumbnail_url = self.thumbnail_url or variant_url(self.file_url, "thumb")
+            self.medium_url = self.medium_url or variant_url(self.file_url, "medium")
+        return self
+
 class Report(ReportBase):
     id: int
     complaint_id: Optional[str] = None
@@ -55,10 +66,38 @@ class Report(ReportBase):
     cleanup_image_url: Optional[str] = None
     cleanup_time: Optional[datetime] = None
     media: list[ReportMedia] = []
+    # Downscaled WebP variants, set once background generation has finished
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
+    cleanup_thumbnail_url: Optional[str] = None
+    variants_ready: bool = Field(False, exclude=True)
+    cleanup_variants_ready: bool = Field(False, exclude=True)
 
     class Config:
         from_attributes = True
 
+    @model_validator(mode="after")
+    def add_variant_urls(self):
+        if self.variants_ready:
+            self.thumbnail_url = self.thumbnail_url or variant_url(self.image_url, "thumb")
+            self.medium_url = self.medium_url or variant_url(self.image_url, "medium")
+        if self.cleanup_variants_ready and self.cleanup_image_url:
+            self.cleanup_thumbnail_url = self.cleanup_thumbnail_url or variant_url(self.cleanup_image_url, "thumb")
+        return self
+
+class ImageScreening(BaseModel):
+    file_url: str
+    is_garbage: Optional[bool] = None
+    score: Optional[float] = None
+    detections: Optional[int] = None
+    stage: str # "classifier", "object_detection" or "skipped"
+
+class ReportCreated(Report):
+    screening: list[ImageScreening] = []
+
+class NearbyTask(Report):
+    distance_m: float
+
 class ActivityLogBase(BaseModel):
     action: str
     details: Optional[str] = None
@@ -73,3 +112,12 @@ class ActivityLog(ActivityLogBase):
     
     class Config:
         from_attributes = True
+
+class ActivityLogDaily(BaseModel):
+    day: date
+    action: str
+    count: int
+    users: int
+
+    class Config:
+        from_attributes = True
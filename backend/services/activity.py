@@ -1,9 +1,178 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+import datetime
+import os
+import queue
+import threading
+import time
+from .. import database
 from ..models import activity as models
 
-def log_activity(db: Session, action: str, details: str = None, user_id: int = None):
-    db_log = models.ActivityLog(action=action, details=details, user_id=user_id)
-    db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
-    return db_log
\ No newline at end of file
+# Write-behind activity log.
+# `log_activity` only puts the event on a bounded in-memory queue; a
+# background thread writes queued events with one bulk INSERT per batch,
+# when `batch_size` events are waiting or `flush_interval` has passed since
+# the first one, instead of one commit (and fsync) per request.
+ACTIVITY_LOG_QUEUE_SIZE = int(os.getenv("ACTIVITY_LOG_QUEUE_SIZE", "10000"))
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "500"))
+ACTIVITY_LOG_FLUSH_MS = float(os.getenv("ACTIVITY_LOG_FLUSH_MS", "1000"))
+# What to do when the queue is full: "drop" the event right away, or
+# "block" the caller for up to ACTIVITY_LOG_BLOCK_MS before dropping it
+ACTIVITY_LOG_OVERFLOW = os.getenv("ACTIVITY_LOG_OVERFLOW", "drop")
+ACTIVITY_LOG_BLOCK_MS = float(os.getenv("ACTIVITY_LOG_BLOCK_MS", "100"))
+
+_STOP = object()
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+class ActivityLogger:
+    def __init__(
+        self,
+        session_factory=None,
+        max_queue=ACTIVITY_LOG_QUEUE_SIZE,
+        batch_size=ACTIVITY_LOG_BATCH_SIZE,
+        flush_interval_ms=ACTIVITY_LOG_FLUSH_MS,
+        overflow=ACTIVITY_LOG_OVERFLOW,
+        block_ms=ACTIVITY_LOG_BLOCK_MS
+    ):
+        self.session_factory = session_factory or database.SessionLocal
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.overflow = overflow
+        self.block_timeout = block_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self._flush_ms_total = 0.0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="activity-logger", daemon=True)
+                self._thread.start()
+
+    def log(self, action: str, details: str = None, user_id: int = None) -> bool:
+        """Queues an event. Returns False if it was dropped because the queue is full."""
+        self._ensure_started()
+        event = {
+            "action": action,
+            "details": details,
+            "user_id": user_id,
+            # Stamped now, not when the batch is written
+            "timestamp": datetime.datetime.utcnow()
+        }
+        try:
+            if self.overflow == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _run(self):
+        while True:
+            batch, markers, stop = [], [], False
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, _Flush):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        db = self.session_factory()
+        try:
+            db.execute(insert(models.ActivityLog), batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            with self._lock:
+                self.failed += len(batch)
+            print(f"Activity log flush failed, {len(batch)} events lost: {e}")
+            return
+        finally:
+            db.close()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.written += len(batch)
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._flush_ms_total += elapsed_ms
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Blocks until every event queued before the call is written."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        marker = _Flush()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Writes what is queued and stops the writer thread (app shutdown)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP, timeout=timeout)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "overflow_policy": self.overflow,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "last_flush_ms": self.last_flush_ms,
+                "avg_flush_ms": self._flush_ms_total / self.flushes if self.flushes else None,
+                "max_flush_ms": self.max_flush_ms,
+            }
+
+activity_logger = ActivityLogger()
+
+def log_activity(action: str, details: str = None, user_id: int = None) -> bool:
+    return activity_logger.log(action, details, user_id)
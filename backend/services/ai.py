@@ -1,52 +1,333 @@
 import sys
 import os
+import io
+import asyncio
+import importlib.util
+import threading
+import time
+from typing import List
+import numpy as np
+from fastapi import HTTPException
+from PIL import Image
 
 # Add project root to path to allow importing ai_service
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from ai_service.inference import inference_service
-try:
-    from ai_service.object_detection import detect_objects
-except ImportError:
-    print("Warning: Could not import object_detection. Make sure ultralytics is installed.")
-    detect_objects = None
+from ai_service.cache import PredictionCache, hash_pixels
+
+from .executor import inference_executor
+
+# Models are not loaded at import: the app's lifespan warms them up in the
+# background (MODEL_WARMUP=background), so a replica answers /auth/login
+# right away and AI endpoints return 503 until the models are ready.
+# `blocking` finishes the warm-up before the server accepts requests; `off`
+# loads each model on first use, which is also what scripts and tests get.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background")
+
+# The YOLO fallback needs OpenCV and ultralytics (which imports torch);
+# object_detection is imported when the models are loaded
+OBJECT_DETECTION_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ("cv2", "ultralytics"))
+detect_objects = None
+# A YOLO load that failed (e.g. no network to fetch the weights) is retried
+# on a later use, at most this often
+OBJECT_DETECTION_RETRY_SECONDS = int(os.getenv("OBJECT_DETECTION_RETRY_SECONDS", "60"))
+
+# How often each process checks the model registry for a version activated
+# by another worker or replica (see ai_service/registry.py)
+MODEL_REGISTRY_SYNC_SECONDS = int(os.getenv("MODEL_REGISTRY_SYNC_SECONDS", "30"))
+
+# Prediction cache: re-uploads of the same photo skip inference.
+# Set PREDICTION_CACHE_DIR to also persist results on disk across restarts.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", "86400"))
+PREDICTION_CACHE_DIR = os.getenv("PREDICTION_CACHE_DIR")
+
+# Keys of each screen_images() entry returned to callers
+SCREENING_FIELDS = ("file_url", "is_garbage", "score", "detections", "stage")
+
+class ModelsWarmingUpError(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="AI models are warming up. Please try again shortly.",
+            headers={"Retry-After": "10"}
+        )
 
 class AIService:
-    def detect_garbage(self, image_path: str) -> bool:
+    def __init__(self, cache: PredictionCache = None):
+        self.cache = cache or PredictionCache(
+            max_entries=PREDICTION_CACHE_SIZE,
+            ttl_seconds=PREDICTION_CACHE_TTL,
+            disk_dir=PREDICTION_CACHE_DIR
+        )
+        self._cache_model_version = None
+        # cold (nothing loaded yet) -> warming -> ready
+        self.state = "cold"
+        self.warmup_seconds = None
+        self.warmup_error = None
+        self._models_loaded = False
+        self._detector_retry_at = 0.0
+        self._load_lock = threading.Lock()
+
+    def load_models(self):
+        """
+        Loads the classifier and the YOLO fallback and runs one inference
+        with each. Blocking; does nothing once both are loaded. A failed
+        YOLO load is retried by a call OBJECT_DETECTION_RETRY_SECONDS later.
+        """
+        global detect_objects
+        with self._load_lock:
+            if self._models_loaded:
+                return
+            inference_service.warm_up()
+            if detect_objects is None:
+                if OBJECT_DETECTION_AVAILABLE:
+                    if time.monotonic() < self._detector_retry_at:
+                        return
+                    try:
+                        from ai_service import object_detection
+                        object_detection.detect_objects(np.zeros((64, 64, 3), dtype=np.uint8))
+                        detect_objects = object_detection.detect_objects
+                    except Exception as e:
+                        self._detector_retry_at = time.monotonic() + OBJECT_DETECTION_RETRY_SECONDS
+                        print(f"Warning: Could not load object detection model: {e}")
+                        return
+                else:
+                    print("Warning: Could not import object_detection. Make sure ultralytics is installed.")
+            self._models_loaded = True
+
+    async def warm_up(self):
+        """Loads the models on a worker thread; see require_ready()."""
+        if self._models_loaded:
+            self.state = "ready"
+            return
+        self.state = "warming"
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.load_models)
+        except Exception as e:
+            # Serve anyway: models that failed to load are retried on a later use (see load_models)
+            self.warmup_error = str(e)
+            print(f"Model warm-up failed: {e}")
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        self.state = "ready"
+        print(f"AI models ready in {self.warmup_seconds}s")
+
+    def require_ready(self):
+        """Raises ModelsWarmingUpError while a warm-up is in progress."""
+        if self.state == "warming":
+            raise ModelsWarmingUpError()
+
+    def readiness(self) -> dict:
+        model = inference_service.model
+        return {
+            "ready": self.state != "warming",
+            "state": self.state,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.warmup_error,
+            "classifier": model.name if model else None,
+            "model_version": inference_service.model_version,
+            "object_detection": detect_objects is not None,
+        }
+
+    def decode_image(self, image_path: str = None, image_bytes: bytes = None):
+        """
+        Decodes an image once into an RGB uint8 array that every model
+        stage reuses. Returns None if the image can't be decoded.
+        """
+        try:
+            source = io.BytesIO(image_bytes) if image_bytes is not None else image_path
+            with Image.open(source) as img:
+                return np.asarray(img.convert("RGB"))
+        except Exception as e:
+            print(f"Could not decode image: {e}")
+            return None
+
+    def _cached(self, namespace: str, content_hash, compute):
+        if content_hash is None:
+            return compute()
+
+        version = inference_service.model_version
+        if version != self._cache_model_version:
+            # Weights were swapped (e.g. a new version activated after /admin/retrain): drop stale entries
+            self.cache.clear()
+            self._cache_model_version = version
+
+        key = PredictionCache.make_key(namespace, version, content_hash)
+        result = self.cache.get(key)
+        if result is None:
+            result = compute()
+            self.cache.set(key, result)
+        return result
+
+    def classify_pixels(self, pixels: np.ndarray, content_hash: str = None) -> dict:
+        """
+        Runs the MobileNetV2 classifier on a decoded RGB image (cached).
+        Returns {'is_garbage': bool, 'score': float or None}.
+        """
+        if content_hash is None:
+            content_hash = hash_pixels(pixels)
+        return self._cached("classifier", content_hash, lambda: inference_service.classify_array(pixels))
+
+    def count_objects(self, pixels: np.ndarray, content_hash: str = None) -> int:
+        """
+        Runs the YOLO fallback on a decoded RGB image (cached) and returns
+        the number of non-person objects found.
+        """
+        if not self._models_loaded:
+            self.load_models()
+        if not detect_objects:
+            return 0
+        if content_hash is None:
+            content_hash = hash_pixels(pixels)
+        # YOLO expects OpenCV's BGR channel order.
+        # Early exit: we only need one detection, so tiles are skipped
+        # whenever the full-image pass already finds something
+        return self._cached("object_detection", content_hash,
+                            lambda: len(detect_objects(np.ascontiguousarray(pixels[:, :, ::-1]), conf_threshold=0.25, early_exit=True)))
+
+    def classify_image(self, image_path: str = None, image_bytes: bytes = None) -> dict:
+        """
+        Classifier verdict for an image file or its already read bytes.
+        """
+        pixels = self.decode_image(image_path=image_path, image_bytes=image_bytes)
+        if pixels is None:
+            # Let the classifier report the failure (or mock result without a model)
+            if image_bytes is not None:
+                return inference_service.classify_bytes(image_bytes)
+            return inference_service.classify(image_path)
+        return self.classify_pixels(pixels)
+
+    def detect_garbage(self, image_path: str, image_bytes: bytes = None) -> bool:
         """
         Uses a hybrid pipeline to detect garbage.
         1. MobileNetV2 Binary Classifier (Fast, good for piles).
         2. YOLOv8 Object Detection (Slower, good for small scattered items).
+        The image is decoded once (from image_bytes if given) and results
+        are cached by image content and model version.
         """
+        pixels = self.decode_image(image_path=image_path, image_bytes=image_bytes)
+        if pixels is None:
+            return self.classify_image(image_path=image_path, image_bytes=image_bytes)["is_garbage"]
+        content_hash = hash_pixels(pixels)
+
         # Step 1: Binary Classification
-        is_garbage_binary = inference_service.predict(image_path)
-        
-        if is_garbage_binary:
+        if self.classify_pixels(pixels, content_hash)["is_garbage"]:
             return True
-            
+
         # Step 2: Object Detection (Fallback for small items)
-        if detect_objects:
-            detections = detect_objects(image_path, conf_threshold=0.25)
-            # If we found any objects (people are already filtered out by detect_objects)
-            if len(detections) > 0:
-                print(f"Hybrid Pipeline: Binary missed it, but YOLO found {len(detections)} objects.")
-                return True
-                
+        # People are already filtered out by detect_objects
+        detections = self.count_objects(pixels, content_hash)
+        if detections > 0:
+            print(f"Hybrid Pipeline: Binary missed it, but YOLO found {detections} objects.")
+            return True
+
         return False
 
+    async def screen_images(self, image_paths: List[str], image_contents: List[bytes] = None) -> List[dict]:
+        """
+        Screens all images of one report concurrently until one shows garbage.
+
+        1. All images go through the classifier at once (batched together by the micro-batcher).
+        2. Only if none is positive, the rejected ones go through YOLO, again concurrently.
+        Outstanding work is cancelled as soon as one image is confirmed.
+
+        `image_contents` optionally holds the bytes already read for each
+        path, so images are decoded from memory instead of re-read from disk.
+
+        Returns one entry per image with 'is_garbage', 'score', 'detections'
+        and 'stage' ('classifier', 'object_detection', or 'skipped' if it was
+        not needed).
+
+        Callers admit the whole report once with `inference_executor.admit()`;
+        the images then share at most `max_workers` inference threads.
+        """
+        contents = image_contents or [None] * len(image_paths)
+        results = [
+            {"file_url": path, "is_garbage": None, "score": None, "detections": None, "stage": "skipped", "content": content}
+            for path, content in zip(image_paths, contents)
+        ]
+
+        slots = asyncio.Semaphore(inference_executor.max_workers)
+        found = await self._run_stage(self._screen_classifier, results, range(len(results)), slots)
+        if not found and not self._models_loaded:
+            await inference_executor.submit(self.load_models)
+        if not found and detect_objects:
+            rejected = [i for i, r in enumerate(results) if r["is_garbage"] is False and r.get("pixels") is not None]
+            await self._run_stage(self._screen_objects, results, rejected, slots)
+
+        return [{key: r[key] for key in SCREENING_FIELDS} for r in results]
+
+    async def _run_stage(self, stage, results, indices, slots) -> bool:
+        # Runs `stage` for the given images in parallel, stops at the first positive
+        async def run(result):
+            async with slots:
+                return await inference_executor.submit(stage, result)
+
+        tasks = {asyncio.ensure_future(run(results[i])): i for i in indices}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                found = False
+                for task in done:
+                    result = results[tasks[task]]
+                    result.update(task.result())
+                    found = found or result["is_garbage"]
+                if found:
+                    return True
+            return False
+        finally:
+            for task in pending:
+                task.cancel()
+            # Collect the cancelled (or failed) siblings so their errors aren't left unretrieved
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _screen_classifier(self, result: dict) -> dict:
+        pixels = self.decode_image(image_path=result["file_url"], image_bytes=result["content"])
+        if pixels is None:
+            prediction = self.classify_image(image_path=result["file_url"], image_bytes=result["content"])
+            return {"pixels": None, "is_garbage": prediction["is_garbage"], "score": prediction["score"], "stage": "classifier"}
+
+        content_hash = hash_pixels(pixels)
+        prediction = self.classify_pixels(pixels, content_hash)
+        return {
+            "pixels": pixels,
+            "content_hash": content_hash,
+            "is_garbage": prediction["is_garbage"],
+            "score": prediction["score"],
+            "stage": "classifier"
+        }
+
+    def _screen_objects(self, result: dict) -> dict:
+        detections = self.count_objects(result["pixels"], result["content_hash"])
+        return {"is_garbage": detections > 0, "detections": detections, "stage": "object_detection"}
+
     def detect_garbage_bytes(self, image_bytes: bytes) -> bool:
-        # For bytes, we currently only support the binary model 
-        # because YOLO expects a file path or numpy array.
-        # We could save to temp file if needed, but for now let's stick to binary.
-        return inference_service.predict_bytes(image_bytes)
+        # For bytes, we currently only support the binary model
+        # (the YOLO fallback is too slow for live camera previews).
+        return self.classify_image(image_bytes=image_bytes)["is_garbage"]
 
-    def verify_cleanup(self, original_image_path: str, cleanup_image_path: str) -> bool:
+    def verify_cleanup(self, original_image_path: str, cleanup_image_path: str, cleanup_image_bytes: bytes = None) -> bool:
         """
         Verifies cleanup.
         Logic: The cleanup image should NOT be detected as garbage (i.e., it should be 'clean').
         """
-        is_garbage = inference_service.predict(cleanup_image_path)
+        is_garbage = self.classify_image(image_path=cleanup_image_path, image_bytes=cleanup_image_bytes)["is_garbage"]
         # If it's NOT garbage, then it's clean -> Verification Passed
         return not is_garbage
 
+    def cache_stats(self):
+        return self.cache.stats()
+
 ai_service = AIService()
+
+async def run_model_sync_loop(interval: int = MODEL_REGISTRY_SYNC_SECONDS):
+    """Background check, started from the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(inference_service.sync_with_registry)
+        except Exception as e:
+            print(f"Model registry sync failed: {e}")
@@ -0,0 +1,235 @@
+from typing import Callable, Dict, Optional
+import asyncio
+import glob
+import json
+import os
+import socket
+import time
+import uuid
+
+# Cross-process fan-out for the websocket hub.
+# With several uvicorn workers or replicas, each process only holds its own
+# sockets. Every event published on one process is also sent through a
+# broadcast backend, and every other process delivers it to its local
+# subscribers. Processes also send their connection counts per presence
+# topic every BROADCAST_PRESENCE_SECONDS, so "online workers" is the total
+# over all live processes.
+#
+# BROADCAST_URL selects the backend:
+#   memory://              single process, nothing is forwarded (default)
+#   unix:///run/aiwaste    Unix datagram sockets in a shared directory; for
+#                          workers on one host or containers sharing a volume
+#   redis://host:6379/0    Redis pub/sub (needs the `redis` package)
+
+BROADCAST_URL = os.getenv("BROADCAST_URL", "memory://")
+BROADCAST_CHANNEL = os.getenv("BROADCAST_CHANNEL", "aiwaste:ws")
+BROADCAST_PRESENCE_SECONDS = float(os.getenv("BROADCAST_PRESENCE_SECONDS", "5"))
+# Outgoing messages waiting for the backend; beyond this they are dropped
+BROADCAST_OUTBOX_SIZE = int(os.getenv("BROADCAST_OUTBOX_SIZE", "1000"))
+
+class LocalSocketBackend:
+    """
+    One Unix datagram socket per process in `directory`; a send goes to every
+    other socket there. Sockets of processes that died are removed on the
+    first failed send.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = None
+        self.sock = None
+
+    async def start(self, receive: Callable[[bytes], None]):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+
+        def on_readable():
+            while True:
+                try:
+                    receive(self.sock.recv(65536))
+                except BlockingIOError:
+                    return
+
+        asyncio.get_running_loop().add_reader(self.sock.fileno(), on_readable)
+
+    async def send(self, payload: bytes):
+        for peer in glob.glob(os.path.join(self.directory, "*.sock")):
+            if peer == self.path:
+                continue
+            try:
+                self.sock.sendto(payload, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody listening any more
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                # The peer is not keeping up; it will catch up from the next presence round
+                pass
+
+    async def stop(self):
+        if self.sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self.sock.fileno())
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.sock = None
+
+class RedisBackend:
+    def __init__(self, url: str, channel: str = BROADCAST_CHANNEL):
+        self.url = url
+        self.channel = channel
+        self.client = None
+        self.pubsub = None
+        self.reader = None
+
+    async def start(self, receive: Callable[[bytes], None]):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("BROADCAST_URL=redis://... requires the `redis` package")
+        self.client = redis.from_url(self.url)
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.subscribe(self.channel)
+
+        async def read():
+            async for message in self.pubsub.listen():
+                if message["type"] == "message":
+                    receive(message["data"])
+
+        self.reader = asyncio.create_task(read())
+
+    async def send(self, payload: bytes):
+        await self.client.publish(self.channel, payload)
+
+    async def stop(self):
+        if self.reader is not None:
+            self.reader.cancel()
+        if self.pubsub is not None:
+            await self.pubsub.close()
+        if self.client is not None:
+            await self.client.close()
+
+def create_backend(url: str = BROADCAST_URL):
+    """The backend for a BROADCAST_URL, or None when everything stays in this process."""
+    if url.startswith("memory://"):
+        return None
+    if url.startswith("unix://"):
+        return LocalSocketBackend(url[len("unix://"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported BROADCAST_URL: {url}")
+
+class BroadcastBus:
+    """
+    Forwards a ConnectionManager's events to other processes and delivers
+    theirs locally. Messages are JSON:
+      {"node": .., "kind": "event", "topics": [..], "event": {..}}
+      {"node": .., "kind": "presence", "counts": {"role:worker": 3, ..}}
+      {"node": .., "kind": "leave"}
+    """
+    def __init__(self, backend, presence_seconds: float = BROADCAST_PRESENCE_SECONDS,
+                 outbox_size: int = BROADCAST_OUTBOX_SIZE, clock=time.monotonic):
+        self.backend = backend
+        self.node = uuid.uuid4().hex
+        self.presence_seconds = presence_seconds
+        self.outbox_size = outbox_size
+        self.clock = clock
+        self.manager = None
+        self.outbox: Optional[asyncio.Queue] = None
+        # node -> (expires_at, {topic: count})
+        self.presence: Dict[str, tuple] = {}
+        self._tasks = []
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.failed = 0
+
+    async def start(self, manager):
+        self.manager = manager
+        self.outbox = asyncio.Queue(maxsize=self.outbox_size)
+        await self.backend.start(self._receive)
+        self._tasks = [asyncio.create_task(self._send_loop()), asyncio.create_task(self._presence_loop())]
+        manager.bus = self
+
+    async def stop(self):
+        if self.manager is not None:
+            self.manager.bus = None
+        for task in self._tasks:
+            task.cancel()
+        try:
+            await self.backend.send(self._encode("leave"))
+        except Exception:
+            pass
+        await self.backend.stop()
+
+    def _encode(self, kind: str, **data) -> bytes:
+        return json.dumps({"node": self.node, "kind": kind, **data}).encode("utf-8")
+
+    def _queue(self, payload: bytes):
+        try:
+            self.outbox.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def forward(self, topics, event: dict):
+        """Called by the manager for every event it publishes locally."""
+        self._queue(self._encode("event", topics=list(topics), event=event))
+
+    def _receive(self, payload: bytes):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        node = message.get("node")
+        if node == self.node:
+            # Pub/sub backends echo our own messages
+            return
+        self.received += 1
+        kind = message.get("kind")
+        if kind == "event":
+            self.manager.deliver(message["topics"], message["event"])
+        elif kind == "presence":
+            self.presence[node] = (self.clock() + 3 * self.presence_seconds, message["counts"])
+        elif kind == "leave":
+            self.presence.pop(node, None)
+
+    async def _send_loop(self):
+        while True:
+            payload = await self.outbox.get()
+            try:
+                await self.backend.send(payload)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Broadcast send failed: {e}")
+
+    async def _presence_loop(self):
+        while True:
+            self._queue(self._encode("presence", counts=self.manager.local_counts()))
+            await asyncio.sleep(self.presence_seconds)
+
+    def remote_count(self, topic: str) -> int:
+        """Connections on other live processes; nodes missing three rounds are dropped."""
+        now = self.clock()
+        for node in [n for n, (expires_at, _) in self.presence.items() if expires_at < now]:
+            del self.presence[node]
+        return sum(counts.get(topic, 0) for _, counts in self.presence.values())
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "node": self.node,
+            "peers": len(self.presence),
+            "outbox": self.outbox.qsize() if self.outbox else 0,
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
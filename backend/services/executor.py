@@ -0,0 +1,98 @@
+from fastapi import HTTPException
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextlib
+import functools
+import threading
+import os
+
+# Workers that run AI inference off the event loop. Threads (not processes)
+# so every job shares the loaded models and the classifier's micro-batcher.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+# Jobs allowed in flight (running + queued) before new ones are rejected
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", str(INFERENCE_WORKERS * 4)))
+
+class InferenceBusyError(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="AI verification is busy. Please try again shortly.",
+            headers={"Retry-After": "5"}
+        )
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for blocking inference calls.
+
+    `run` awaits the result without blocking the event loop. When
+    `max_pending` jobs are already in flight, new jobs are rejected with a
+    503 instead of queueing without limit.
+    """
+    def __init__(self, max_workers=INFERENCE_WORKERS, max_pending=INFERENCE_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        if not self._acquire():
+            raise InferenceBusyError()
+        try:
+            future = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        except RuntimeError:
+            self._release()
+            raise
+        # Release the slot when the job itself finishes, even if the
+        # awaiting request was cancelled in the meantime
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    @contextlib.asynccontextmanager
+    async def admit(self):
+        """
+        Admits a request that runs several jobs (e.g. every image of a
+        report) as one pending slot, rejecting it with a 503 up front
+        instead of part-way through. Jobs inside use `submit`.
+        """
+        if not self._acquire():
+            raise InferenceBusyError()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def submit(self, fn, *args, **kwargs):
+        """Runs a job of a request admitted with `admit`, without a slot of its own."""
+        future = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+inference_executor = InferenceExecutor()
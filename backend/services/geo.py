@@ -0,0 +1,103 @@
+from sqlalchemy import and_, or_
+import math
+import numpy as np
+
+# Grid-cell spatial index for report locations.
+# The globe is cut into CELL_SIZE_DEG x CELL_SIZE_DEG cells numbered row by
+# row (row = latitude band, col = longitude band), and each report stores its
+# cell id in an indexed column. Cells of one latitude band are consecutive
+# ids, so the cells covering a search circle become one BETWEEN range per
+# band, which the database answers from the index. Exact distances are then
+# computed with a vectorized haversine over the candidates only.
+
+EARTH_RADIUS_M = 6371e3
+CELL_SIZE_DEG = 0.01 # ~1.1 km of latitude
+ROWS = int(round(180 / CELL_SIZE_DEG))
+COLS = int(round(360 / CELL_SIZE_DEG))
+
+MAX_RADIUS_M = 50_000
+# First ring tried by k-nearest searches without an explicit radius
+INITIAL_SEARCH_RADIUS_M = 1_000
+
+def _row(latitude: float) -> int:
+    return min(max(int(math.floor((latitude + 90) / CELL_SIZE_DEG)), 0), ROWS - 1)
+
+def _col(longitude: float) -> int:
+    return int(math.floor((longitude + 180) / CELL_SIZE_DEG)) % COLS
+
+def cell_for(latitude: float, longitude: float):
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude) * COLS + _col(longitude)
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters; any argument may be a NumPy array."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.subtract(lng2, lng1))
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def cell_ranges(latitude: float, longitude: float, radius_m: float) -> list:
+    """
+    Inclusive (low, high) cell id ranges covering every point within
+    `radius_m` of the given location.
+    """
+    delta_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    lat_min, lat_max = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    row_min, row_max = _row(lat_min), _row(lat_max)
+
+    # Longitude degrees shrink towards the poles: size for the widest band
+    cos_lat = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    delta_lng = math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)) if cos_lat > 1e-9 else 180.0
+
+    if delta_lng >= 180:
+        # Whole latitude bands, which are consecutive ids
+        return [(row_min * COLS, row_max * COLS + COLS - 1)]
+
+    col_min = int(math.floor((longitude - delta_lng + 180) / CELL_SIZE_DEG))
+    col_max = int(math.floor((longitude + delta_lng + 180) / CELL_SIZE_DEG))
+    if col_min < 0:
+        col_spans = [(0, col_max), (col_min + COLS, COLS - 1)]
+    elif col_max >= COLS:
+        col_spans = [(col_min, COLS - 1), (0, col_max - COLS)]
+    else:
+        col_spans = [(col_min, col_max)]
+
+    return [
+        (row * COLS + low, row * COLS + high)
+        for row in range(row_min, row_max + 1)
+        for low, high in col_spans
+    ]
+
+def cell_filter(column, ranges: list, *criteria):
+    """
+    OR of one BETWEEN per range. Equality `criteria` (e.g. on status) are
+    repeated inside each term so every term is a seek on a composite
+    (criteria..., cell) index rather than a scan of all matching rows.
+    """
+    return or_(*[and_(*criteria, column.between(low, high)) for low, high in ranges])
+
+def nearest(fetch_points, latitude: float, longitude: float, radius_m: float = None, limit: int = 20) -> list:
+    """
+    Finds the `limit` points closest to a location, sorted by distance.
+
+    `fetch_points(ranges)` must return (id, latitude, longitude) rows for
+    the cells in `ranges`. With `radius_m` only points within it are
+    returned; without it the search ring grows from INITIAL_SEARCH_RADIUS_M
+    until `limit` points are found or MAX_RADIUS_M is reached.
+
+    Returns a list of (id, distance in meters).
+    """
+    search = radius_m if radius_m is not None else INITIAL_SEARCH_RADIUS_M
+    while True:
+        points = np.array(fetch_points(cell_ranges(latitude, longitude, search)), dtype=float).reshape(-1, 3)
+        distances = haversine(latitude, longitude, points[:, 1], points[:, 2])
+        # Cells over-cover the circle; anything outside it may not be the nearest
+        inside = np.flatnonzero(distances <= search)
+        if radius_m is not None or len(inside) >= limit or search >= MAX_RADIUS_M:
+            break
+        search = min(search * 4, MAX_RADIUS_M)
+
+    order = inside[np.argsort(distances[inside], kind="stable")][:limit]
+    return [(int(points[i, 0]), float(distances[i])) for i in order]
@@ -0,0 +1,17 @@
+from sqlalchemy.orm import Session, selectinload
+from ..models import user as models
+
+# Relationship loading strategies, per response shape.
+# `schemas.Report` serializes `media`, so a list of N reports loaded lazily
+# costs 1 + N queries. Loading the collection with selectinload costs one
+# extra `... WHERE report_id IN (...)` query per page instead. selectin (not
+# joined) is used for collections because it stays correct with LIMIT and
+# does not multiply report rows by their media.
+
+REPORT_LIST_OPTIONS = (
+    selectinload(models.Report.media),
+)
+
+def reports_query(db: Session):
+    """Report query ready to be serialized as a list of `schemas.Report`."""
+    return db.query(models.Report).options(*REPORT_LIST_OPTIONS)
@@ -0,0 +1,51 @@
+import fcntl
+import os
+
+class FileLock:
+    """
+    Exclusive advisory lock (flock) on a file, shared by every process on
+    the host, e.g. all uvicorn workers. The kernel releases it when the
+    holder closes it or dies, so a crashed worker never leaves it stuck.
+    Each instance is a separate lock holder, also within one process.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        """Takes the lock; without `blocking`, returns False if another holder has it."""
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def write(self, text: str):
+        """Replaces the lock file's content (e.g. what the holder is doing)."""
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(text)
+        self._file.flush()
+
+    def read(self) -> str:
+        try:
+            with open(self.path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,137 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import asyncio
+import datetime
+import gzip
+import json
+import os
+from .. import database
+from ..models import activity as models
+from .locks import FileLock
+
+# Retention for the activity log.
+# Logs older than ACTIVITY_LOG_RETENTION_DAYS are moved out of the hot
+# `activity_logs` table one whole day at a time: the rows are appended to a
+# gzipped JSON-lines file per day, per-action counts are added to the
+# `activity_log_daily` summary table, and only then are the rows deleted.
+# A crash between writing the file and deleting the rows can repeat a day's
+# rows in its archive file on the next run, but never loses them.
+# Every worker runs the job; a lock file in the archive directory makes sure
+# only one of them archives at a time, so a day is never written twice.
+
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv("ACTIVITY_LOG_RETENTION_DAYS", "90"))
+ACTIVITY_LOG_ARCHIVE_DIR = os.getenv("ACTIVITY_LOG_ARCHIVE_DIR", "archive/activity_logs")
+ACTIVITY_LOG_RETENTION_INTERVAL_SECONDS = int(os.getenv("ACTIVITY_LOG_RETENTION_INTERVAL_SECONDS", "86400"))
+
+LOCK_FILE = ".retention.lock"
+
+def archive_path(day: datetime.date, archive_dir: str = None) -> str:
+    archive_dir = archive_dir or ACTIVITY_LOG_ARCHIVE_DIR
+    return os.path.join(archive_dir, f"{day:%Y}", f"activity-{day.isoformat()}.jsonl.gz")
+
+def read_archive(day: datetime.date, archive_dir: str = None) -> list:
+    path = archive_path(day, archive_dir)
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def archive_day(db: Session, day: datetime.date, archive_dir: str = None) -> int:
+    """Moves one day of logs to its archive file and the summary table. Returns the row count."""
+    ActivityLog = models.ActivityLog
+    start = datetime.datetime.combine(day, datetime.time.min)
+    in_day = (ActivityLog.timestamp >= start, ActivityLog.timestamp < start + datetime.timedelta(days=1))
+
+    path = archive_path(day, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    archived, max_id = 0, None
+    # Appending adds a new gzip member; readers see one continuous stream
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="ab") as f:
+            for log in db.query(ActivityLog).filter(*in_day).order_by(ActivityLog.id).yield_per(1000):
+                f.write((json.dumps({
+                    "id": log.id,
+                    "timestamp": log.timestamp.isoformat(),
+                    "action": log.action,
+                    "details": log.details,
+                    "user_id": log.user_id
+                }) + "\n").encode("utf-8"))
+                archived += 1
+                max_id = log.id
+        # The archive must be on disk before the rows are deleted
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not archived:
+        return 0
+
+    # Only touch rows we have written out, even if more arrive meanwhile
+    archived_rows = (*in_day, ActivityLog.id <= max_id)
+    totals = db.query(
+        ActivityLog.action, func.count(ActivityLog.id), func.count(func.distinct(ActivityLog.user_id))
+    ).filter(*archived_rows).group_by(ActivityLog.action).all()
+
+    for action, count, users in totals:
+        summary = db.query(models.ActivityLogDaily).filter(
+            models.ActivityLogDaily.day == day,
+            models.ActivityLogDaily.action == action
+        ).first()
+        if summary is None:
+            db.add(models.ActivityLogDaily(day=day, action=action, count=count, users=users))
+        else:
+            summary.count += count
+            summary.users = max(summary.users, users)
+
+    db.query(ActivityLog).filter(*archived_rows).delete(synchronize_session=False)
+    db.commit()
+    return archived
+
+def apply_retention(db: Session, retention_days: int = None, now: datetime.datetime = None, archive_dir: str = None) -> dict:
+    """
+    Archives every whole day older than the retention window, oldest first.
+    Returns {'days': int, 'archived': int}; nothing is done while another
+    process holds the archive lock.
+    """
+    retention_days = ACTIVITY_LOG_RETENTION_DAYS if retention_days is None else retention_days
+    today = (now or datetime.datetime.utcnow()).date()
+    cutoff = datetime.datetime.combine(today - datetime.timedelta(days=retention_days), datetime.time.min)
+
+    days = archived = 0
+    lock = FileLock(os.path.join(archive_dir or ACTIVITY_LOG_ARCHIVE_DIR, LOCK_FILE))
+    if not lock.acquire():
+        return {"days": days, "archived": archived}
+    try:
+        while True:
+            # Oldest remaining day; jumps over gaps instead of walking empty days
+            oldest = db.query(func.min(models.ActivityLog.timestamp)).filter(
+                models.ActivityLog.timestamp < cutoff
+            ).scalar()
+            if oldest is None:
+                break
+            moved = archive_day(db, oldest.date(), archive_dir)
+            if not moved:
+                break
+            archived += moved
+            days += 1
+    finally:
+        lock.release()
+    return {"days": days, "archived": archived}
+
+def _run():
+    db = database.SessionLocal()
+    try:
+        result = apply_retention(db)
+        if result["archived"]:
+            print(f"Activity log retention: archived {result['archived']} logs from {result['days']} days")
+    finally:
+        db.close()
+
+async def run_retention_loop(interval: int = ACTIVITY_LOG_RETENTION_INTERVAL_SECONDS):
+    """Background job, started from the app lifespan: runs at startup, then every `interval` seconds."""
+    while True:
+        try:
+            await asyncio.to_thread(_run)
+        except Exception as e:
+            print(f"Activity log retention failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,149 @@
+from sqlalchemy.orm import Session
+import asyncio
+import os
+import time
+from .. import database
+from ..models import user as models
+from .thumbnails import variant_urls
+
+# Content-addressed storage for uploaded media.
+# Blobs live at uploads/<h[0:2]>/<h[2:4]>/<sha256><ext>, so identical uploads
+# share one file and no directory grows past a few hundred entries.
+# A blob is referenced while any Report or ReportMedia row points at its URL;
+# unreferenced blobs are removed by a periodic sweep.
+
+UPLOAD_DIR = "uploads"
+INCOMING_DIR = os.path.join(UPLOAD_DIR, ".incoming")
+os.makedirs(INCOMING_DIR, exist_ok=True)
+
+# Unreferenced blobs younger than this are kept, so uploads that are still
+# being processed (or were just deduplicated against an old blob) are safe
+MEDIA_GC_GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE_SECONDS", "3600"))
+MEDIA_GC_INTERVAL_SECONDS = int(os.getenv("MEDIA_GC_INTERVAL_SECONDS", "3600"))
+
+def blob_url(sha256: str, ext: str) -> str:
+    return f"{UPLOAD_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext.lower()}"
+
+def incoming_path(name: str) -> str:
+    return os.path.join(INCOMING_DIR, name)
+
+def commit_blob(tmp_path: str, sha256: str, ext: str) -> dict:
+    """
+    Moves a fully written temp file to its content address.
+    If the blob already exists the temp file is dropped instead.
+
+    Returns {'url': str, 'deduplicated': bool}.
+    """
+    url = blob_url(sha256, ext)
+    if os.path.exists(url):
+        os.remove(tmp_path)
+        try:
+            # Refresh mtime so the sweep treats the blob as recently used
+            os.utime(url)
+            return {"url": url, "deduplicated": True}
+        except FileNotFoundError:
+            # Swept in the meantime: fall through and store our copy
+            pass
+
+    try:
+        os.makedirs(os.path.dirname(url), exist_ok=True)
+        os.replace(tmp_path, url)
+    except FileNotFoundError:
+        # The sweep removed the (empty) shard directory under us; retry once
+        os.makedirs(os.path.dirname(url), exist_ok=True)
+        os.replace(tmp_path, url)
+    return {"url": url, "deduplicated": False}
+
+def referenced_urls(db: Session) -> set:
+    urls = set()
+    urls.update(url for (url,) in db.query(models.ReportMedia.file_url))
+    urls.update(url for (url,) in db.query(models.Report.image_url))
+    urls.update(url for (url,) in db.query(models.Report.cleanup_image_url))
+    urls.discard(None)
+    # Derivatives (thumbnails) live as long as their original
+    urls.update(variant for url in list(urls) for variant in variant_urls(url))
+    return urls
+
+def is_referenced(db: Session, url: str) -> bool:
+    return (
+        db.query(models.ReportMedia.id).filter(models.ReportMedia.file_url == url).first() is not None
+        or db.query(models.Report.id).filter(
+            (models.Report.image_url == url) | (models.Report.cleanup_image_url == url)
+        ).first() is not None
+    )
+
+def _is_expired(path: str, now: float) -> bool:
+    try:
+        return now - os.path.getmtime(path) > MEDIA_GC_GRACE_SECONDS
+    except OSError:
+        return False
+
+def release(db: Session, url: str) -> bool:
+    """
+    Deletes a blob right away if nothing references it any more and it is
+    past the grace period; otherwise the sweep will pick it up later.
+    Returns True if the file was removed.
+    """
+    if not url or not url.startswith(f"{UPLOAD_DIR}/") or not os.path.exists(url):
+        return False
+    if is_referenced(db, url) or not _is_expired(url, time.time()):
+        return False
+    try:
+        os.remove(url)
+        for variant in variant_urls(url):
+            if os.path.exists(variant):
+                os.remove(variant)
+        return True
+    except OSError as e:
+        print(f"Error deleting file {url}: {e}")
+        return False
+
+def collect_garbage(db: Session) -> int:
+    """
+    Removes unreferenced files under UPLOAD_DIR (including legacy flat
+    uploads and abandoned temp files) older than the grace period.
+    Returns the number of files removed.
+    """
+    referenced = referenced_urls(db)
+    now = time.time()
+    removed = 0
+
+    for root, dirs, files in os.walk(UPLOAD_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            url = path.replace(os.sep, "/")
+            if url in referenced or not _is_expired(path, now):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                print(f"Error deleting file {url}: {e}")
+
+    # Drop now-empty shard directories
+    for root, dirs, files in os.walk(UPLOAD_DIR, topdown=False):
+        if root not in (UPLOAD_DIR, INCOMING_DIR) and not os.listdir(root):
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+
+    return removed
+
+def _sweep():
+    db = database.SessionLocal()
+    try:
+        removed = collect_garbage(db)
+        if removed:
+            print(f"Media GC: removed {removed} unreferenced files")
+    finally:
+        db.close()
+
+async def run_gc_loop(interval: int = MEDIA_GC_INTERVAL_SECONDS):
+    """Background sweep, started from the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_sweep)
+        except Exception as e:
+            print(f"Media GC failed: {e}")
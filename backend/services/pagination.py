@@ -0,0 +1,148 @@
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Query as OrmQuery
+from typing import List, Optional
+from datetime import datetime
+import base64
+from ..models import user as models
+from ..models import activity as activity_models
+
+# Keyset pagination for list endpoints (reports, activity logs).
+# Rows are returned newest first, ordered by (timestamp, id). The cursor
+# encodes the last row of a page, so the next page is a range scan on the
+# index instead of an OFFSET that re-reads every skipped row.
+# Page metadata goes in headers so list responses keep their shape:
+#   X-Next-Cursor: pass as ?cursor= to get the next page (absent on the last page)
+#   X-Total-Count: number of matching rows (only with ?include_total=true)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+class PageParams:
+    def __init__(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        include_total: bool = False
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.include_total = include_total
+
+class ReportFilters:
+    def __init__(
+        self,
+        status: Optional[List[models.ReportStatus]] = Query(None),
+        worker_id: Optional[int] = None,
+        owner_id: Optional[int] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        min_lat: Optional[float] = Query(None, ge=-90, le=90),
+        max_lat: Optional[float] = Query(None, ge=-90, le=90),
+        min_lng: Optional[float] = Query(None, ge=-180, le=180),
+        max_lng: Optional[float] = Query(None, ge=-180, le=180)
+    ):
+        self.status = status
+        self.worker_id = worker_id
+        self.owner_id = owner_id
+        self.created_after = created_after
+        self.created_before = created_before
+        self.min_lat = min_lat
+        self.max_lat = max_lat
+        self.min_lng = min_lng
+        self.max_lng = max_lng
+
+    def criteria(self) -> list:
+        Report = models.Report
+        criteria = []
+        if self.status:
+            criteria.append(Report.status.in_([s.value for s in self.status]))
+        if self.worker_id is not None:
+            criteria.append(Report.worker_id == self.worker_id)
+        if self.owner_id is not None:
+            criteria.append(Report.owner_id == self.owner_id)
+        if self.created_after is not None:
+            criteria.append(Report.created_at >= self.created_after)
+        if self.created_before is not None:
+            criteria.append(Report.created_at < self.created_before)
+        # Bounding box
+        if self.min_lat is not None:
+            criteria.append(Report.latitude >= self.min_lat)
+        if self.max_lat is not None:
+            criteria.append(Report.latitude <= self.max_lat)
+        if self.min_lng is not None:
+            criteria.append(Report.longitude >= self.min_lng)
+        if self.max_lng is not None:
+            criteria.append(Report.longitude <= self.max_lng)
+        return criteria
+
+class ActivityLogFilters:
+    def __init__(
+        self,
+        action: Optional[List[str]] = Query(None),
+        user_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ):
+        self.action = action
+        self.user_id = user_id
+        self.since = since
+        self.until = until
+
+    def criteria(self) -> list:
+        ActivityLog = activity_models.ActivityLog
+        criteria = []
+        if self.action:
+            criteria.append(ActivityLog.action.in_(self.action))
+        if self.user_id is not None:
+            criteria.append(ActivityLog.user_id == self.user_id)
+        if self.since is not None:
+            criteria.append(ActivityLog.timestamp >= self.since)
+        if self.until is not None:
+            criteria.append(ActivityLog.timestamp < self.until)
+        return criteria
+
+def encode_cursor(position: datetime, id: int) -> str:
+    raw = f"{position.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(position), int(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(query: OrmQuery, criteria: list, page: PageParams, response: Response, order_column, id_column) -> list:
+    """
+    Applies filters, keyset position and limit to a query ordered newest
+    first by (order_column, id_column) and sets the pagination headers on
+    `response`.
+    """
+    if page.include_total:
+        total = query.session.query(func.count(id_column)).filter(*criteria).scalar()
+        response.headers["X-Total-Count"] = str(total)
+
+    query = query.filter(*criteria)
+    if page.cursor:
+        position, id = decode_cursor(page.cursor)
+        query = query.filter(or_(
+            order_column < position,
+            and_(order_column == position, id_column < id)
+        ))
+
+    # Fetch one extra row to know whether there is a next page
+    rows = query.order_by(order_column.desc(), id_column.desc()).limit(page.limit + 1).all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(getattr(last, order_column.key), getattr(last, id_column.key))
+    return rows
+
+def paginate_reports(query: OrmQuery, criteria: list, page: PageParams, response: Response) -> list:
+    return paginate(query, criteria, page, response, models.Report.created_at, models.Report.id)
+
+def paginate_activity_logs(query: OrmQuery, criteria: list, page: PageParams, response: Response) -> list:
+    ActivityLog = activity_models.ActivityLog
+    return paginate(query, criteria, page, response, ActivityLog.timestamp, ActivityLog.id)
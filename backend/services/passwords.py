@@ -0,0 +1,129 @@
+from fastapi import HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+import asyncio
+import math
+import os
+import threading
+import time
+
+# Password hashing off the request threads.
+# bcrypt is deliberately slow (hundreds of ms of CPU per call). Hashes and
+# verifications run on a small dedicated pool instead of the event loop or
+# the threadpool shared with every sync handler and DB call. Threads are
+# enough: bcrypt releases the GIL while it works, so they run in parallel.
+#
+# Admission is rate-aware: the expected wait for a new job is the work
+# already queued divided by the workers, using a moving average of recent
+# hash times. Jobs that would wait longer than PASSWORD_HASH_MAX_WAIT_MS are
+# rejected with 503 and a Retry-After, so a login wave sheds load instead of
+# every login timing out.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_WAIT_MS = int(os.getenv("PASSWORD_HASH_MAX_WAIT_MS", "3000"))
+# Hard cap on jobs in flight, whatever the estimate says
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 16)))
+
+# Hashes with other rounds are flagged by verify_and_update and rehashed on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+class PasswordHasherBusyError(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail="Too many sign-ins right now. Please try again shortly.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class PasswordHasher:
+    def __init__(self, context: CryptContext = pwd_context, max_workers: int = PASSWORD_HASH_WORKERS,
+                 max_wait_ms: int = PASSWORD_HASH_MAX_WAIT_MS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_wait_ms = max_wait_ms
+        self.max_pending = max(max_pending, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        # Moving average of one hash/verify; None until the first one finishes
+        self.avg_ms = None
+
+    def estimated_wait_ms(self) -> float:
+        """Expected time a new job waits for a worker."""
+        with self._lock:
+            return self._estimated_wait_ms()
+
+    def _estimated_wait_ms(self) -> float:
+        if self.avg_ms is None or self.pending < self.max_workers:
+            return 0.0
+        return (self.pending - self.max_workers + 1) / self.max_workers * self.avg_ms
+
+    def _acquire(self):
+        with self._lock:
+            wait_ms = self._estimated_wait_ms()
+            if self.pending >= self.max_pending or wait_ms > self.max_wait_ms:
+                self.rejected += 1
+                raise PasswordHasherBusyError(max(1, math.ceil(wait_ms / 1000)))
+            self.pending += 1
+
+    def _timed(self, fn, *args):
+        with self._lock:
+            self.running += 1
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.running -= 1
+                self.pending -= 1
+                self.completed += 1
+                self.avg_ms = elapsed_ms if self.avg_ms is None else 0.8 * self.avg_ms + 0.2 * elapsed_ms
+
+    async def _run(self, fn, *args):
+        self._acquire()
+        try:
+            future = self._pool.submit(self._timed, fn, *args)
+        except RuntimeError:
+            with self._lock:
+                self.pending -= 1
+            raise
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str):
+        """
+        Returns (valid, new_hash). `new_hash` is set when the password is
+        right but the stored hash uses outdated parameters; store it.
+        """
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if new_hash is not None:
+            with self._lock:
+                self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "pending": self.pending,
+                "queue_depth": self.pending - self.running,
+                "running": self.running,
+                "avg_ms": round(self.avg_ms, 1) if self.avg_ms is not None else None,
+                "estimated_wait_ms": round(self._estimated_wait_ms(), 1),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+password_hasher = PasswordHasher()
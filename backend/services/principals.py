@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+# Cache of authenticated users for `get_current_user`.
+# Every authenticated request used to look its user up by email. The
+# fields handlers need are kept here per token subject for a short TTL, so
+# polling endpoints mostly authorize without touching the database. Admin
+# changes to a user (deletion, new QR token) invalidate its entry; changes
+# made by another process are seen once the entry expires.
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+
+class Principal:
+    """Detached, read-only copy of a `User` row with the fields handlers read."""
+    __slots__ = ("id", "email", "full_name", "phone_number", "role", "qr_login_token")
+
+    def __init__(self, id, email, full_name, phone_number, role, qr_login_token):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self.phone_number = phone_number
+        self.role = role
+        self.qr_login_token = qr_login_token
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(user.id, user.email, user.full_name, user.phone_number, user.role, user.qr_login_token)
+
+    def matches(self, claims: dict) -> bool:
+        """Whether the token's id/role claims (absent in older tokens) still hold."""
+        uid, role = claims.get("uid"), claims.get("role")
+        return (uid is None or uid == self.id) and (role is None or role == self.role)
+
+class PrincipalCache:
+    """Size-bounded LRU with TTL, keyed by token subject (the user's email)."""
+    def __init__(self, max_entries=PRINCIPAL_CACHE_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, subject: str):
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is not None:
+                principal, expires_at = entry
+                if self.clock() < expires_at:
+                    self._entries.move_to_end(subject)
+                    self.hits += 1
+                    return principal
+                del self._entries[subject]
+            self.misses += 1
+            return None
+
+    def set(self, subject: str, principal: Principal):
+        with self._lock:
+            self._entries[subject] = (principal, self.clock() + self.ttl_seconds)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            if self._entries.pop(subject, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+principal_cache = PrincipalCache()
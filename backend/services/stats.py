@@ -0,0 +1,181 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from collections import Counter, defaultdict
+import datetime
+import os
+import threading
+import time
+from ..models import user as models
+from . import websocket
+
+# Admin dashboard statistics, kept in memory.
+# Counters are loaded from the database once, then updated from the
+# report lifecycle hooks (created, claimed, completed, reviewed, deleted),
+# so `/admin/stats` never runs a COUNT. Every change is pushed to connected
+# admin dashboards as a delta:
+#   {"type": "stats", "delta": {"by_status": {"pending": -1, "assigned": 1}, ...}}
+# Writes made by other processes are not seen, so counters are reloaded
+# from the database every STATS_RESYNC_SECONDS.
+
+STATS_RESYNC_SECONDS = int(os.getenv("STATS_RESYNC_SECONDS", "300"))
+# Days of per-day history kept
+STATS_DAYS = int(os.getenv("STATS_DAYS", "30"))
+
+ACTIVE_STATUSES = (models.ReportStatus.PENDING.value, models.ReportStatus.ASSIGNED.value)
+
+def _status(value) -> str:
+    return models.ReportStatus(value).value
+
+def _day(value) -> str:
+    return value.date().isoformat() if value else None
+
+def _add(delta: dict, path: tuple, amount: int):
+    for key in path[:-1]:
+        delta = delta.setdefault(key, {})
+    delta[path[-1]] = delta.get(path[-1], 0) + amount
+
+def _prune(delta: dict) -> dict:
+    """Drops zero entries (e.g. a status changed and changed back)."""
+    pruned = {}
+    for key, value in delta.items():
+        value = _prune(value) if isinstance(value, dict) else value
+        if value:
+            pruned[key] = value
+    return pruned
+
+class DashboardStats:
+    def __init__(self, resync_seconds=STATS_RESYNC_SECONDS, days=STATS_DAYS, clock=time.monotonic):
+        self.resync_seconds = resync_seconds
+        self.days = days
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._reset()
+
+    def _reset(self):
+        self.by_status = Counter()
+        self.per_worker = defaultdict(Counter)
+        self.per_day = defaultdict(Counter)
+
+    def load(self, db: Session):
+        """Recounts everything from the database."""
+        Report = models.Report
+        since = datetime.datetime.utcnow() - datetime.timedelta(days=self.days)
+        by_status = db.query(Report.status, func.count(Report.id)).group_by(Report.status).all()
+        per_worker = db.query(Report.worker_id, Report.status, func.count(Report.id)).filter(
+            Report.worker_id.isnot(None)
+        ).group_by(Report.worker_id, Report.status).all()
+        created = db.query(Report.created_at).filter(Report.created_at >= since).all()
+        cleaned = db.query(Report.cleanup_time).filter(Report.cleanup_time >= since).all()
+
+        with self._lock:
+            self._reset()
+            for status, count in by_status:
+                self.by_status[_status(status)] = count
+            for worker_id, status, count in per_worker:
+                self.per_worker[worker_id][_status(status)] = count
+            for (created_at,) in created:
+                self.per_day[_day(created_at)]["created"] += 1
+            for (cleanup_time,) in cleaned:
+                self.per_day[_day(cleanup_time)]["cleaned"] += 1
+            self._loaded_at = self.clock()
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded_at is None or self.clock() - self._loaded_at > self.resync_seconds:
+            self.load(db)
+
+    def _apply(self, by_status=(), per_worker=(), per_day=()) -> dict:
+        """
+        Applies counter changes and returns them as a delta:
+        `by_status` holds (status, amount), `per_worker` (worker_id, status, amount)
+        and `per_day` (day, "created" | "cleaned", amount). Before the first
+        load there is nothing to update (the load will count it), but the
+        delta is still returned for connected dashboards.
+        """
+        delta = {}
+        with self._lock:
+            loaded = self._loaded_at is not None
+            for status, amount in by_status:
+                if loaded:
+                    self.by_status[status] += amount
+                _add(delta, ("by_status", status), amount)
+            for worker_id, status, amount in per_worker:
+                if worker_id is None:
+                    continue
+                if loaded:
+                    self.per_worker[worker_id][status] += amount
+                _add(delta, ("per_worker", str(worker_id), status), amount)
+            for day, field, amount in per_day:
+                if day is None:
+                    continue
+                if loaded:
+                    self.per_day[day][field] += amount
+                _add(delta, ("per_day", day, field), amount)
+
+        active = sum(amount for status, amount in by_status if status in ACTIVE_STATUSES)
+        if active:
+            delta["active_complaints"] = active
+        return _prune(delta)
+
+    def report_created(self, report: models.Report) -> dict:
+        return self._apply(
+            by_status=[(_status(report.status), 1)],
+            per_day=[(_day(report.created_at), "created", 1)]
+        )
+
+    def status_changed(self, report: models.Report, old_status, old_worker_id=None, old_cleanup_time=None) -> dict:
+        """Call after a report's status, worker or cleanup time changed."""
+        new_status, old_status = _status(report.status), _status(old_status)
+        by_status, per_worker, per_day = [], [], []
+        if new_status != old_status:
+            by_status = [(old_status, -1), (new_status, 1)]
+        if new_status != old_status or report.worker_id != old_worker_id:
+            per_worker = [(old_worker_id, old_status, -1), (report.worker_id, new_status, 1)]
+        if report.cleanup_time != old_cleanup_time:
+            per_day = [(_day(old_cleanup_time), "cleaned", -1), (_day(report.cleanup_time), "cleaned", 1)]
+        return self._apply(by_status, per_worker, per_day)
+
+    def report_deleted(self, report: models.Report) -> dict:
+        status = _status(report.status)
+        return self._apply(
+            by_status=[(status, -1)],
+            per_worker=[(report.worker_id, status, -1)],
+            per_day=[(_day(report.created_at), "created", -1), (_day(report.cleanup_time), "cleaned", -1)]
+        )
+
+    def worker_removed(self, worker_id: int) -> dict:
+        """A deleted worker's reports lose their worker_id; their status counts stay."""
+        with self._lock:
+            counts = dict(self.per_worker.get(worker_id, {}))
+        return self._apply(per_worker=[(worker_id, status, -count) for status, count in counts.items()])
+
+    def snapshot(self) -> dict:
+        cutoff = (datetime.datetime.utcnow() - datetime.timedelta(days=self.days)).date().isoformat()
+        with self._lock:
+            by_status = {status.value: self.by_status.get(status.value, 0) for status in models.ReportStatus}
+            return {
+                "active_complaints": sum(by_status[status] for status in ACTIVE_STATUSES),
+                "by_status": by_status,
+                "per_worker": {
+                    str(worker_id): {status: count for status, count in counts.items() if count}
+                    for worker_id, counts in self.per_worker.items() if any(counts.values())
+                },
+                "per_day": {
+                    day: dict(counts) for day, counts in sorted(self.per_day.items())
+                    if day >= cutoff and any(counts.values())
+                },
+            }
+
+dashboard_stats = DashboardStats()
+
+def stats_event(delta: dict) -> dict:
+    return websocket.event("stats", delta=delta)
+
+def publish(delta: dict):
+    if delta:
+        websocket.manager.publish([websocket.ADMINS], stats_event(delta))
+
+def publish_from_thread(delta: dict):
+    """`publish` for sync handlers, which FastAPI runs in worker threads."""
+    if delta:
+        websocket.publish_from_thread([websocket.ADMINS], stats_event(delta))
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from sqlalchemy.orm import Session
+import io
+import os
+import threading
+from .. import database
+from ..models import user as models
+
+# Downscaled WebP copies of uploaded images for list views and mobile clients.
+# Derivatives sit next to their original: uploads/ab/cd/<sha256>.jpg gets
+# uploads/ab/cd/<sha256>.medium.webp and uploads/ab/cd/<sha256>.thumb.webp.
+# Once they exist, the report and media rows using the original are flagged
+# (`variants_ready`), so responses build variant URLs without touching the disk.
+# Variants as (name, max edge in px), largest first so each is made from the previous one.
+VARIANTS = [("medium", 1024), ("thumb", 320)]
+WEBP_QUALITY = int(os.getenv("THUMBNAIL_WEBP_QUALITY", "75"))
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("THUMBNAIL_WORKERS", "1")), thread_name_prefix="thumbnails")
+
+def variant_url(url: str, variant: str) -> str:
+    return f"{os.path.splitext(url)[0]}.{variant}.webp"
+
+def variant_urls(url: str) -> list:
+    return [variant_url(url, name) for name, _ in VARIANTS]
+
+def has_variants(url: str) -> bool:
+    return all(os.path.exists(path) for path in variant_urls(url))
+
+def record_variants(db: Session, url: str):
+    """Flags every report and media row using `url` as having its variants."""
+    db.query(models.Report).filter(models.Report.image_url == url).update(
+        {models.Report.variants_ready: True}, synchronize_session=False)
+    db.query(models.Report).filter(models.Report.cleanup_image_url == url).update(
+        {models.Report.cleanup_variants_ready: True}, synchronize_session=False)
+    db.query(models.ReportMedia).filter(models.ReportMedia.file_url == url).update(
+        {models.ReportMedia.variants_ready: True}, synchronize_session=False)
+    db.commit()
+
+def generate_variants(url: str, content: bytes = None) -> list:
+    """
+    Writes every missing variant of an image and returns the created URLs.
+    `content` can hold the original bytes to avoid reading the file again.
+    """
+    missing = [(name, size) for name, size in VARIANTS if not os.path.exists(variant_url(url, name))]
+    if not missing:
+        return []
+
+    created = []
+    try:
+        with Image.open(io.BytesIO(content) if content is not None else url) as original:
+            # Let the JPEG decoder downscale while decoding
+            largest = missing[0][1]
+            original.draft("RGB", (largest, largest))
+            img = ImageOps.exif_transpose(original).convert("RGB")
+
+        for name, size in missing:
+            img.thumbnail((size, size))
+            path = variant_url(url, name)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            img.save(tmp_path, "WEBP", quality=WEBP_QUALITY)
+            os.replace(tmp_path, path)
+            created.append(path)
+    except Exception as e:
+        print(f"Thumbnail generation failed for {url}: {e}")
+    return created
+
+def generate_and_record(url: str, content: bytes = None, session_factory=None):
+    generate_variants(url, content)
+    if not has_variants(url):
+        return
+    db = (session_factory or database.SessionLocal)()
+    try:
+        record_variants(db, url)
+    except Exception as e:
+        print(f"Recording thumbnails failed for {url}: {e}")
+    finally:
+        db.close()
+
+def schedule(url: str, content: bytes = None):
+    """
+    Generates variants in the background, off the request path. Call after
+    the rows using `url` are committed, so they get flagged.
+    """
+    return _pool.submit(generate_and_record, url, content)
@@ -0,0 +1,386 @@
+from fastapi import HTTPException
+from collections import deque
+from typing import List, Optional
+import asyncio
+import datetime
+import json
+import os
+import re
+import shutil
+import signal
+import sys
+import uuid
+
+from ai_service.inference import inference_service
+from ai_service.registry import MODEL_REGISTRY_DIR
+from . import websocket
+from .locks import FileLock
+
+# Model training out of the API process.
+# /admin/retrain starts `python -m ai_service.train --events` as a child
+# process with a lower CPU priority and a capped number of threads, so
+# serving requests keeps priority over model.fit. One job runs at a time.
+# The child prints one event line per epoch; each is stored on the job and
+# pushed to admins over /ws. When it finishes, the model version it
+# registered is activated (see ai_service/registry.py).
+#
+# Every uvicorn worker has a runner. A lock file lets only one of them run
+# a job at a time, and job state is kept as JSON files in TRAINING_JOB_DIR,
+# so any worker can show or cancel a job another one is running.
+
+# Added to the child's nice value (0 keeps the server's priority)
+TRAINING_NICENESS = int(os.getenv("TRAINING_NICENESS", "10"))
+# CPU threads TensorFlow may use for training
+TRAINING_THREADS = int(os.getenv("TRAINING_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Finished jobs kept for GET /admin/training
+TRAINING_JOB_HISTORY = int(os.getenv("TRAINING_JOB_HISTORY", "20"))
+# Seconds a cancelled job gets to exit before it is killed
+TRAINING_CANCEL_GRACE_SECONDS = 10
+# Job state shared by the workers (same host)
+TRAINING_JOB_DIR = os.getenv("TRAINING_JOB_DIR", os.path.join(MODEL_REGISTRY_DIR, "training"))
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+# Same as ai_service.train.EVENT_PREFIX (not imported: that module loads TensorFlow)
+EVENT_PREFIX = "TRAINING_EVENT "
+# Lines of other output kept per job, for the error message of failed jobs
+OUTPUT_TAIL_LINES = 20
+
+class TrainingJobConflictError(HTTPException):
+    def __init__(self, job_id: str):
+        super().__init__(status_code=409, detail=f"Training job {job_id} is already running")
+
+ACTIVE_STATES = ("queued", "running")
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{12}")
+
+def _now():
+    return datetime.datetime.utcnow().isoformat()
+
+class TrainingJob:
+    def __init__(self, id: str, requested_by: Optional[int] = None):
+        self.id = id
+        self.requested_by = requested_by
+        # queued -> running -> succeeded / failed / cancelled
+        self.state = "queued"
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.pid = None
+        self.epoch = 0
+        self.epochs = None
+        # Metrics of each finished epoch
+        self.history: List[dict] = []
+        self.version = None
+        self.error = None
+        self.output = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.process = None
+        self.task = None
+        self.cancel_requested = False
+
+    @property
+    def finished(self) -> bool:
+        return self.state not in ACTIVE_STATES
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "requested_by": self.requested_by,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "pid": self.pid,
+            "epoch": self.epoch,
+            "epochs": self.epochs,
+            "metrics": self.history[-1] if self.history else {},
+            "history": self.history,
+            "version": self.version,
+            "error": self.error,
+        }
+
+def _format_metrics(metrics: dict) -> str:
+    return ", ".join(f"{name} {value:.3f}" for name, value in metrics.items())
+
+class TrainingJobRunner:
+    def __init__(self, command: Optional[List[str]] = None, niceness: int = TRAINING_NICENESS,
+                 threads: int = TRAINING_THREADS, history: int = TRAINING_JOB_HISTORY, activate=None,
+                 job_dir: str = TRAINING_JOB_DIR):
+        self.command = command or [sys.executable, "-m", "ai_service.train", "--events", "--threads", str(threads)]
+        self.niceness = niceness
+        self.threads = threads
+        self.history = history
+        # Serves the version a job registered
+        self.activate = activate or inference_service.activate
+        self.job_dir = job_dir
+        # Held by the process running a job; contains the job id
+        self.lock = FileLock(os.path.join(job_dir, "running.lock"))
+        # The job this process runs, if any
+        self.current: Optional[TrainingJob] = None
+
+    def _path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.job_dir, job_id + suffix)
+
+    def _write(self, job_id: str, data: dict):
+        path = self._path(job_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _save(self, job: TrainingJob):
+        self._write(job.id, job.to_dict())
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _read(self, job_id: str) -> Optional[dict]:
+        job = self._load(job_id)
+        if job is not None and job["state"] in ACTIVE_STATES and not (self.current is not None and self.current.id == job_id):
+            # Nobody holds the lock: the worker running it died
+            probe = FileLock(self.lock.path)
+            if probe.acquire():
+                try:
+                    # The owner may have saved the final state and released the lock since the first read
+                    job = self._load(job_id)
+                    if job is not None and job["state"] in ACTIVE_STATES:
+                        job.update(state="failed", error="The worker running this job stopped")
+                        self._write(job_id, job)
+                finally:
+                    probe.release()
+        return job
+
+    def start(self, requested_by: Optional[int] = None) -> TrainingJob:
+        """Starts a job on the running event loop; 409 while one runs in any worker."""
+        if self.current is not None:
+            raise TrainingJobConflictError(self.current.id)
+        if not self.lock.acquire():
+            raise TrainingJobConflictError(self.lock.read().strip() or "in another worker")
+        job = TrainingJob(uuid.uuid4().hex[:12], requested_by)
+        self.lock.write(job.id)
+        self.current = job
+        self._save(job)
+        self._prune()
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        if self.current is not None and self.current.id == job_id:
+            return self.current.to_dict()
+        return self._read(job_id)
+
+    def _job_ids(self) -> List[str]:
+        if not os.path.isdir(self.job_dir):
+            return []
+        return [name[:-5] for name in os.listdir(self.job_dir)
+                if name.endswith(".json") and JOB_ID_PATTERN.fullmatch(name[:-5])]
+
+    def _all_jobs(self) -> List[dict]:
+        jobs = [job for job in map(self.get, self._job_ids()) if job is not None]
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    def recent(self) -> List[dict]:
+        """Jobs newest first."""
+        return self._all_jobs()[:self.history]
+
+    def _prune(self):
+        """Deletes the files of finished jobs beyond the history limit."""
+        for job in self._all_jobs()[self.history:]:
+            if job["state"] not in ACTIVE_STATES:
+                for suffix in (".json", ".cancel"):
+                    try:
+                        os.remove(self._path(job["id"], suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Stops a job (SIGTERM, then SIGKILL after a grace period); None if unknown."""
+        job = self.get(job_id)
+        if job is None or job["state"] not in ACTIVE_STATES:
+            return job
+
+        local = self.current
+        if local is not None and local.id == job_id:
+            local.cancel_requested = True
+            process = local.process
+            if process is not None and process.returncode is None:
+                process.terminate()
+                asyncio.get_running_loop().call_later(TRAINING_CANCEL_GRACE_SECONDS, self._kill, process)
+            # Otherwise it is still being spawned and _run stops it right after
+            return local.to_dict()
+
+        # Run by another worker: leave a marker for it and signal its child
+        open(self._path(job_id, ".cancel"), "w").close()
+        if job["pid"]:
+            self._signal(job["pid"], signal.SIGTERM)
+            asyncio.get_running_loop().call_later(
+                TRAINING_CANCEL_GRACE_SECONDS, self._kill_remote, job_id, job["pid"]
+            )
+        return job
+
+    def _signal(self, pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _kill_remote(self, job_id: str, pid: int):
+        job = self._read(job_id)
+        if job is not None and job["state"] == "running" and job["pid"] == pid:
+            self._signal(pid, signal.SIGKILL)
+
+    def _kill(self, process):
+        if process.returncode is None:
+            process.kill()
+
+    def _environment(self) -> dict:
+        # Thread pools of the numeric libraries are sized before TensorFlow starts
+        threads = str(self.threads)
+        return {
+            **os.environ,
+            "OMP_NUM_THREADS": threads,
+            "OPENBLAS_NUM_THREADS": threads,
+            "MKL_NUM_THREADS": threads,
+            "TF_NUM_INTRAOP_THREADS": threads,
+            "TF_NUM_INTEROP_THREADS": str(min(2, self.threads)),
+            "PYTHONUNBUFFERED": "1",
+        }
+
+    def _spawn_command(self) -> List[str]:
+        # `nice` lowers the priority from the first instruction, before
+        # TensorFlow starts its threads; no preexec_fn in a threaded server
+        nice = shutil.which("nice") if self.niceness else None
+        return [nice, "-n", str(self.niceness), *self.command] if nice else self.command
+
+    def _lower_priority(self, pid: int):
+        # Without `nice`: threads the child starts later inherit this
+        try:
+            os.setpriority(os.PRIO_PROCESS, pid, min(19, os.getpriority(os.PRIO_PROCESS, 0) + self.niceness))
+        except OSError as e:
+            print(f"Could not lower the training priority: {e}")
+
+    def _cancel_requested(self, job: TrainingJob) -> bool:
+        # Cancelled here, or by another worker through the marker file
+        return job.cancel_requested or os.path.exists(self._path(job.id, ".cancel"))
+
+    async def _run(self, job: TrainingJob):
+        try:
+            job.process = await asyncio.create_subprocess_exec(
+                *self._spawn_command(),
+                cwd=PROJECT_ROOT,
+                env=self._environment(),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=2 ** 20
+            )
+            if self.niceness and not shutil.which("nice"):
+                self._lower_priority(job.process.pid)
+            job.state, job.pid, job.started_at = "running", job.process.pid, _now()
+            self._save(job)
+            if self._cancel_requested(job):
+                job.process.terminate()
+            self._publish(job, "training_started", f"Training job {job.id} started")
+
+            while True:
+                try:
+                    line = await job.process.stdout.readline()
+                except ValueError:
+                    # Overlong line without a newline: skip it
+                    continue
+                if not line:
+                    break
+                self._handle_line(job, line.decode(errors="replace").rstrip())
+            returncode = await job.process.wait()
+
+            if self._cancel_requested(job):
+                job.state = "cancelled"
+            elif returncode != 0 or job.version is None:
+                job.state = "failed"
+                job.error = f"Training exited with code {returncode}" + (f": {job.output[-1]}" if job.output else "")
+            else:
+                try:
+                    await asyncio.to_thread(self.activate, job.version)
+                    job.state = "succeeded"
+                except Exception as e:
+                    job.state, job.error = "failed", f"Could not activate model version {job.version}: {e}"
+        except asyncio.CancelledError:
+            if job.process is not None and job.process.returncode is None:
+                job.process.kill()
+            job.state = "cancelled"
+            raise
+        except Exception as e:
+            job.state, job.error = "failed", str(e)
+        finally:
+            job.finished_at = _now()
+            job.process = None
+            # Final state first, so no worker sees a finished job as still running
+            self._save(job)
+            try:
+                os.remove(self._path(job.id, ".cancel"))
+            except FileNotFoundError:
+                pass
+            if self.current is job:
+                self.current = None
+                self.lock.release()
+            print(f"Training job {job.id} {job.state}" + (f": {job.error}" if job.error else ""))
+            self._publish(job, f"training_{job.state}", self._summary(job))
+
+    def _handle_line(self, job: TrainingJob, text: str):
+        if not text.startswith(EVENT_PREFIX):
+            if text:
+                job.output.append(text)
+                print(f"[training {job.id}] {text}")
+            return
+        try:
+            event = json.loads(text[len(EVENT_PREFIX):])
+        except ValueError:
+            return
+
+        if event.get("event") == "started":
+            job.epochs = event.get("epochs")
+            self._save(job)
+        elif event.get("event") == "epoch":
+            job.epoch, job.epochs = event["epoch"], event.get("epochs", job.epochs)
+            job.history.append(event.get("metrics", {}))
+            self._save(job)
+            self._publish(job, "training_progress",
+                          f"Training job {job.id}: epoch {job.epoch}/{job.epochs} ({_format_metrics(job.history[-1])})")
+        elif event.get("event") == "registered":
+            job.version = event["version"]
+            self._save(job)
+
+    def _summary(self, job: TrainingJob) -> str:
+        if job.state == "succeeded":
+            return f"Training job {job.id} finished: model version {job.version} is active"
+        if job.state == "cancelled":
+            return f"Training job {job.id} was cancelled"
+        return f"Training job {job.id} failed: {job.error}"
+
+    def _publish(self, job: TrainingJob, type: str, message: str):
+        websocket.manager.publish([websocket.ADMINS], websocket.event(
+            type,
+            job_id=job.id,
+            state=job.state,
+            epoch=job.epoch,
+            epochs=job.epochs,
+            metrics=job.history[-1] if job.history else {},
+            version=job.version,
+            message=message
+        ))
+
+    async def shutdown(self):
+        """Cancels the running job and waits for it, on app shutdown."""
+        job = self.current
+        if job is None:
+            return
+        self.cancel(job.id)
+        try:
+            await asyncio.wait_for(asyncio.shield(job.task), TRAINING_CANCEL_GRACE_SECONDS + 1)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+
+training_runner = TrainingJobRunner()
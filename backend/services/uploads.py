@@ -0,0 +1,74 @@
+from fastapi import HTTPException, UploadFile
+import asyncio
+import hashlib
+import os
+import uuid
+from . import media_store
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024 # 1 MiB
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_MB", "20")) * 1024 * 1024
+MAX_VIDEO_BYTES = int(os.getenv("MAX_VIDEO_UPLOAD_MB", "200")) * 1024 * 1024
+
+def get_media_type(file: UploadFile) -> str:
+    return "video" if (file.content_type or "").startswith("video") else "image"
+
+def _too_large(file: UploadFile, max_bytes: int):
+    return HTTPException(
+        status_code=413,
+        detail=f"File {file.filename} is too large (max {max_bytes // (1024 * 1024)} MB)."
+    )
+
+async def save_upload(file: UploadFile) -> dict:
+    """
+    Streams an upload into the content-addressed media store in chunks.
+
+    The size limit is enforced and the SHA-256 computed while streaming,
+    and disk writes run off the event loop. Once complete the file is
+    moved to its content address, or dropped if the same bytes are already
+    stored. Images are small enough to also be kept in memory ('content')
+    so the AI can decode them without reading the file back from disk.
+
+    Returns {'url', 'type', 'size', 'sha256', 'deduplicated', 'content'}.
+    """
+    media_type = get_media_type(file)
+    max_bytes = MAX_IMAGE_BYTES if media_type == "image" else MAX_VIDEO_BYTES
+
+    # Reject early when the client told us the size up front
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(file, max_bytes)
+
+    file_ext = os.path.splitext(file.filename or "")[1]
+    tmp_location = media_store.incoming_path(f"{uuid.uuid4()}{file_ext}")
+
+    digest = hashlib.sha256()
+    size = 0
+    chunks = [] if media_type == "image" else None
+
+    try:
+        with open(tmp_location, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(file, max_bytes)
+                digest.update(chunk)
+                if chunks is not None:
+                    chunks.append(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+        sha256 = digest.hexdigest()
+        blob = await asyncio.to_thread(media_store.commit_blob, tmp_location, sha256, file_ext)
+    except BaseException:
+        if os.path.exists(tmp_location):
+            os.remove(tmp_location)
+        raise
+
+    return {
+        "url": blob["url"],
+        "type": media_type,
+        "size": size,
+        "sha256": sha256,
+        "deduplicated": blob["deduplicated"],
+        "content": b"".join(chunks) if chunks is not None else None
+    }
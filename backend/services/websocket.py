@@ -1,25 +1,251 @@
 from fastapi import WebSocket
-from typing import List
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+import anyio
+import asyncio
+import datetime
+import json
+import math
+import os
+from . import geo
+
+# Topic-based pub/sub for `/ws`.
+# Every connection subscribes to topics: its role (`role:admin`), its own
+# worker id (`worker:7`), new-task alerts (`tasks`) or the grid cells around
+# a worker (`cell:<geo cell>`, see geo.py). Events are JSON objects with a
+# `type` and are serialized once per publish. Each connection has its own
+# bounded send queue drained by its own sender task, so publishing never
+# waits on a socket: a client whose queue fills up (or whose send takes
+# longer than WS_SEND_TIMEOUT_SECONDS) is evicted instead of delaying
+# everyone else, and sockets that fail a send are dropped.
+# With several processes, a BroadcastBus (broadcast.py) attached as
+# `manager.bus` carries events and connection counts between them.
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+# Radius of the cells a worker watches for new tasks after sending its location
+WS_TASK_RADIUS_M = int(os.getenv("WS_TASK_RADIUS_M", "5000"))
+WS_MAX_TASK_RADIUS_M = 20_000
+# Cap on topics a client may add with "subscribe" messages
+WS_MAX_TOPICS = 2000
+
+# "Try Again Later": the client may reconnect and refetch
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+ADMINS = "role:admin"
+WORKERS = "role:worker"
+TASKS = "tasks"
+# Topics whose connection counts are shared between processes
+PRESENCE_TOPICS = (ADMINS, WORKERS)
+
+def role_topic(role: str) -> str:
+    return f"role:{role}"
+
+def worker_topic(worker_id: int) -> str:
+    return f"worker:{worker_id}"
+
+def cell_topic(cell: int) -> str:
+    return f"cell:{cell}"
+
+def location_topics(latitude: float, longitude: float) -> list:
+    """Topics of a task at this location: global alerts plus its grid cell."""
+    cell = geo.cell_for(latitude, longitude)
+    return [TASKS] if cell is None else [TASKS, cell_topic(cell)]
+
+def event(type: str, **data) -> dict:
+    return {"type": type, "ts": datetime.datetime.utcnow().isoformat(), **data}
+
+class Connection:
+    def __init__(self, websocket: WebSocket, user_id: Optional[int], role: Optional[str], queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.role = role
+        self.topics: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender: Optional[asyncio.Task] = None
+
+    def may_subscribe(self, topic: str) -> bool:
+        if self.role == "admin":
+            return True
+        if self.role == "worker":
+            return topic in (TASKS, WORKERS, worker_topic(self.user_id)) or topic.startswith("cell:")
+        return False
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT_SECONDS):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.connections: Dict[WebSocket, Connection] = {}
+        self.subscribers: Dict[str, Set[Connection]] = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+        self.dead = 0
+        self.bus = None
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, user_id: int = None, role: str = None, topics: Iterable[str] = ()) -> Connection:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = Connection(websocket, user_id, role, self.queue_size)
+        self.connections[websocket] = connection
+        self.subscribe(connection, topics)
+        connection.sender = asyncio.create_task(self._send_loop(connection))
+        return connection
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        """Removes the connection from every topic. Safe to call more than once."""
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        self.unsubscribe(connection, list(connection.topics))
+        if connection.sender is not None and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
+
+    def subscribe(self, connection: Connection, topics: Iterable[str]):
+        for topic in topics:
+            connection.topics.add(topic)
+            self.subscribers[topic].add(connection)
+
+    def unsubscribe(self, connection: Connection, topics: Iterable[str]):
+        for topic in topics:
+            connection.topics.discard(topic)
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.subscribers[topic]
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
+    def watch_location(self, connection: Connection, latitude: float, longitude: float, radius_m: float = WS_TASK_RADIUS_M):
+        """
+        Narrows a worker's new-task alerts from every task to those in nearby
+        cells. Cells shrink towards the poles, so where the circle would need
+        more than WS_MAX_TOPICS cells the worker keeps the global `tasks`
+        topic instead. ValueError for coordinates off the globe.
+        """
+        if not (math.isfinite(radius_m) and -90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("Invalid location")
+        radius_m = min(max(radius_m, 0), WS_MAX_TASK_RADIUS_M)
+        ranges = geo.cell_ranges(latitude, longitude, radius_m)
+        other_topics = [t for t in connection.topics if not t.startswith("cell:") and t != TASKS]
+        self.unsubscribe(connection, [t for t in connection.topics if t.startswith("cell:")] + [TASKS])
+        if sum(high - low + 1 for low, high in ranges) + len(other_topics) > WS_MAX_TOPICS:
+            self.subscribe(connection, [TASKS])
+            return
+        self.subscribe(connection, [cell_topic(cell) for low, high in ranges for cell in range(low, high + 1)])
+
+    def handle_message(self, connection: Connection, text: str):
+        """
+        Client requests, e.g. {"action": "subscribe", "topics": ["cell:123"]},
+        {"action": "location", "latitude": .., "longitude": .., "radius_m": ..}
+        or {"action": "ping"} (answered with a "pong" event, in order with
+        other events). Malformed messages and topics the user may not see
+        are ignored.
+        """
+        try:
+            message = json.loads(text)
+            action = message.get("action")
+            if action == "ping":
+                self._send(connection, json.dumps(event("pong")))
+            elif action == "location":
+                self.watch_location(
+                    connection, float(message["latitude"]), float(message["longitude"]),
+                    float(message.get("radius_m", WS_TASK_RADIUS_M))
+                )
+            elif action in ("subscribe", "unsubscribe"):
+                topics = [t for t in message.get("topics", []) if isinstance(t, str) and connection.may_subscribe(t)]
+                if action == "unsubscribe":
+                    self.unsubscribe(connection, topics)
+                elif len(connection.topics) + len(topics) <= WS_MAX_TOPICS:
+                    self.subscribe(connection, topics)
+        except (ValueError, TypeError, KeyError, AttributeError, OverflowError):
+            pass
+
+    def publish(self, topics: Iterable[str], event: dict) -> int:
+        """
+        Queues the event for every subscriber of any of the topics (once per
+        connection) without waiting for sends, and hands it to the broadcast
+        bus for other processes. Must run on the event loop; returns the
+        number of local connections it was queued for.
+        """
+        topics = list(topics)
+        if self.bus is not None:
+            self.bus.forward(topics, event)
+        return self.deliver(topics, event)
+
+    def deliver(self, topics: Iterable[str], event: dict) -> int:
+        """Local subscribers only; also used for events from other processes."""
+        self.published += 1
+        targets = set()
+        for topic in topics:
+            targets.update(self.subscribers.get(topic, ()))
+        if not targets:
+            return 0
+
+        message = json.dumps(event)
+        return sum(self._send(connection, message) for connection in targets)
+
+    def _send(self, connection: Connection, message: str) -> bool:
+        try:
+            connection.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self._evict(connection, "slow consumer")
+            return False
+
+    def _evict(self, connection: Connection, reason: str):
+        self.evicted += 1
+        self.disconnect(connection.websocket)
+        asyncio.create_task(self._close(connection.websocket, SLOW_CONSUMER_CLOSE_CODE, reason))
+
+    async def _close(self, websocket: WebSocket, code: int, reason: str):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def _send_loop(self, connection: Connection):
+        while True:
+            message = await connection.queue.get()
             try:
-                await connection.send_text(message)
-            except:
-                pass
-    
-    def get_active_count(self):
-        return len(self.active_connections)
+                await asyncio.wait_for(connection.websocket.send_text(message), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(connection, "send timed out")
+                return
+            except Exception:
+                # Gone without a clean disconnect
+                self.dead += 1
+                self.disconnect(connection.websocket)
+                return
+            self.delivered += 1
+
+    def local_counts(self) -> dict:
+        return {topic: len(self.subscribers.get(topic, ())) for topic in PRESENCE_TOPICS}
+
+    def get_active_count(self, topic: str = WORKERS) -> int:
+        """Connections on this topic across all processes."""
+        count = len(self.subscribers.get(topic, ()))
+        if self.bus is not None:
+            count += self.bus.remote_count(topic)
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.connections),
+            "topics": len(self.subscribers),
+            "queued": sum(c.queue.qsize() for c in self.connections.values()),
+            "queue_capacity": self.queue_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+            "dead": self.dead,
+            "bus": self.bus.stats() if self.bus is not None else None,
+        }
 
 manager = ConnectionManager()
+
+def publish_from_thread(topics: Iterable[str], event: dict):
+    """`manager.publish` for sync handlers, which FastAPI runs in worker threads."""
+    try:
+        anyio.from_thread.run_sync(manager.publish, list(topics), event)
+    except RuntimeError:
+        # Not called from an AnyIO worker thread (scripts, tests)
+        pass
@@ -2,12 +2,39 @@ import React, { useState, useEffect } from 'react';
 import client from '../api/client';
 import { QRCodeCanvas } from 'qrcode.react';
 
+// Events look like {"type": "stats", "delta": {...}} or {"type": "task_created", "message": "..."}
+const parseEvent = (data) => {
+  try {
+    return JSON.parse(data);
+  } catch {
+    return null;
+  }
+};
+
+const applyStatsDelta = (stats, delta) => {
+  const next = {
+    ...stats,
+    active_complaints: (stats.active_complaints || 0) + (delta.active_complaints || 0),
+    online_workers: (stats.online_workers || 0) + (delta.online_workers || 0),
+    by_status: { ...(stats.by_status || {}) },
+  };
+  Object.entries(delta.by_status || {}).forEach(([status, change]) => {
+    next.by_status[status] = (next.by_status[status] || 0) + change;
+  });
+  return next;
+};
+
+// List endpoints return one page (100 rows by default); the next one is at ?cursor=<X-Next-Cursor>
+const nextCursor = (response) => response.headers['x-next-cursor'] || null;
+
 const AdminDashboard = () => {
   const [reports, setReports] = useState([]);
   const [workers, setWorkers] = useState([]);
   const [users, setUsers] = useState([]);
   const [allUsers, setAllUsers] = useState([]);
   const [activityLogs, setActivityLogs] = useState([]);
+  const [reportsCursor, setReportsCursor] = useState(null);
+  const [logsCursor, setLogsCursor] = useState(null);
   const [activeTab, setActiveTab] = useState('reports');
   const [notifications, setNotifications] = useState([]);
   const [newWorker, setNewWorker] = useState({ email: '', password: '', full_name: '', phone_number: '' });
@@ -17,19 +44,26 @@ const AdminDashboard = () => {
 
   useEffect(() => {
     fetchData();
+    fetchStats();
     
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws`;
+    const token = encodeURIComponent(localStorage.getItem('token') || '');
+    const wsUrl = `${protocol}//${window.location.host}/ws?token=${token}`;
     const ws = new WebSocket(wsUrl);
 
-    ws.onmessage = (event) => {
-      if (event.data !== "STATS_UPDATE") {
-        setNotifications(prev => [event.data, ...prev]);
-        setTimeout(() => {
-          setNotifications(prev => prev.slice(0, -1));
-        }, 5000);
+    ws.onmessage = (message) => {
+      const event = parseEvent(message.data);
+      if (!event) return;
+      if (event.type === 'stats') {
+        // Counters arrive as deltas; no refetch needed
+        setStats(prev => applyStatsDelta(prev, event.delta));
+        return;
       }
-      // Refresh data on new activity
+      setNotifications(prev => [event.message || event.type, ...prev]);
+      setTimeout(() => {
+        setNotifications(prev => prev.slice(0, -1));
+      }, 5000);
+      // Refresh lists on new activity
       fetchData();
     };
     
@@ -38,25 +72,44 @@ const AdminDashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [reportsRes, workersRes, usersRes, allUsersRes, logsRes, statsRes] = await Promise.all([
+      const [reportsRes, workersRes, usersRes, allUsersRes, logsRes] = await Promise.all([
         client.get('/admin/reports'),
         client.get('/admin/workers'),
         client.get('/admin/users'),
         client.get('/admin/all-users'),
-        client.get('/admin/activity-logs'),
-        client.get('/admin/stats')
+        client.get('/admin/activity-logs')
       ]);
       setReports(reportsRes.data);
+      setReportsCursor(nextCursor(reportsRes));
       setWorkers(workersRes.data);
       setUsers(usersRes.data);
       setAllUsers(allUsersRes.data);
       setActivityLogs(logsRes.data);
-      setStats(statsRes.data);
+      setLogsCursor(nextCursor(logsRes));
     } catch (error) {
       console.error("Failed to fetch admin data", error);
     }
   };
 
+  const loadMore = async (path, cursor, setRows, setCursor) => {
+    try {
+      const response = await client.get(path, { params: { cursor } });
+      setRows(prev => [...prev, ...response.data]);
+      setCursor(nextCursor(response));
+    } catch (error) {
+      console.error("Failed to load more", error);
+    }
+  };
+
+  const fetchStats = async () => {
+    try {
+      const statsRes = await client.get('/admin/stats');
+      setStats(statsRes.data);
+    } catch (error) {
+      console.error("Failed to fetch stats", error);
+    }
+  };
+
   const handleCreateWorker = async (e) => {
     e.preventDefault();
     try {
@@ -172,7 +225,7 @@ const AdminDashboard = () => {
                         {reports.map((report) => (
                           <tr key={report.id}>
                             <td className="px-6 py-4 whitespace-nowrap">
-                              <img className="h-10 w-10 rounded-full object-cover" src={`/${report.image_url}`} alt="" />
+                              <img className="h-10 w-10 rounded-full object-cover" src={`/${report.thumbnail_url || report.image_url}`} alt="" />
                             </td>
                             <td className="px-6 py-4 whitespace-nowrap">
                               <div className="text-sm text-gray-900">{report.description}</div>
@@ -206,6 +259,14 @@ const AdminDashboard = () => {
                 </div>
               </div>
             </div>
+            {reportsCursor && (
+              <button
+                onClick={() => loadMore('/admin/reports', reportsCursor, setReports, setReportsCursor)}
+                className="mt-4 bg-indigo-600 text-white px-4 py-2 rounded hover:bg-indigo-700"
+              >
+                Load more
+              </button>
+            )}
           </div>
         )}
 
@@ -435,6 +496,14 @@ const AdminDashboard = () => {
                 </div>
               </div>
             </div>
+            {logsCursor && (
+              <button
+                onClick={() => loadMore('/admin/activity-logs', logsCursor, setActivityLogs, setLogsCursor)}
+                className="mt-4 bg-indigo-600 text-white px-4 py-2 rounded hover:bg-indigo-700"
+              >
+                Load more
+              </button>
+            )}
           </div>
         )}
       </div>
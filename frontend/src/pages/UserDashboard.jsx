@@ -340,7 +340,7 @@ const UserDashboard = () => {
               ) : (
                 reports.map((report) => (
                   <div key={report.id} className="bg-white p-4 rounded-2xl shadow-sm border border-gray-100 flex space-x-4 hover:shadow-md transition-all">
-                    <img className="h-20 w-20 rounded-xl object-cover shadow-sm" src={`/${report.image_url}`} alt="" />
+                    <img className="h-20 w-20 rounded-xl object-cover shadow-sm" src={`/${report.thumbnail_url || report.image_url}`} alt="" />
                     <div className="flex-1 flex flex-col justify-between">
                       <div>
                         <div className="flex justify-between items-start">
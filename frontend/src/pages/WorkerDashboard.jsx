@@ -21,6 +21,8 @@ const CheckIcon = () => (
 const WorkerDashboard = () => {
   const [myTasks, setMyTasks] = useState([]);
   const [availableTasks, setAvailableTasks] = useState([]);
+  // /tasks/available returns one page; the next one is at ?cursor=<X-Next-Cursor>
+  const [availableCursor, setAvailableCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [message, setMessage] = useState('');
   
@@ -40,9 +42,32 @@ const WorkerDashboard = () => {
     fetchTasks();
     // WebSocket setup for real-time updates
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws`;
+    const token = encodeURIComponent(localStorage.getItem('token') || '');
+    const wsUrl = `${protocol}//${window.location.host}/ws?token=${token}`;
     const ws = new WebSocket(wsUrl);
-    ws.onmessage = () => fetchTasks();
+    ws.onopen = () => {
+      // Only hear about new tasks near us once we know where we are
+      navigator.geolocation?.getCurrentPosition((position) => {
+        if (ws.readyState !== WebSocket.OPEN) return;
+        ws.send(JSON.stringify({
+          action: 'location',
+          latitude: position.coords.latitude,
+          longitude: position.coords.longitude,
+        }));
+      }, () => {});
+    };
+    ws.onmessage = (message) => {
+      let event = null;
+      try {
+        event = JSON.parse(message.data);
+      } catch {
+        return;
+      }
+      // Task events for our area or our own tasks change the lists
+      if (event && event.type && event.type.startsWith('task_')) {
+        fetchTasks();
+      }
+    };
     return () => {
       ws.close();
       stopCamera();
@@ -64,11 +89,22 @@ const WorkerDashboard = () => {
       ]);
       setMyTasks(Array.isArray(myRes.data) ? myRes.data : []);
       setAvailableTasks(Array.isArray(availableRes.data) ? availableRes.data : []);
+      setAvailableCursor(availableRes.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error("Failed to fetch tasks", error);
     }
   };
 
+  const loadMoreTasks = async () => {
+    try {
+      const response = await client.get('/tasks/available', { params: { cursor: availableCursor } });
+      setAvailableTasks(prev => [...prev, ...response.data]);
+      setAvailableCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error("Failed to load more tasks", error);
+    }
+  };
+
   const getLocation = () => {
     return new Promise((resolve, reject) => {
       if (!navigator.geolocation) {
@@ -168,7 +204,7 @@ const WorkerDashboard = () => {
 
   // --- Render Helpers ---
 
-  const renderList = (tasks) => (
+  const renderList = (tasks, onLoadMore) => (
     <div className="space-y-4 pb-20">
       {tasks.length === 0 ? (
         <div className="text-center py-10 text-gray-500">No tasks found.</div>
@@ -181,7 +217,7 @@ const WorkerDashboard = () => {
           >
             {/* Thumbnail */}
             <div className="w-28 h-full bg-gray-200 flex-shrink-0 relative">
-               <img src={`/${task.image_url}`} alt="" className="w-full h-full object-cover" />
+               <img src={`/${task.thumbnail_url || task.image_url}`} alt="" className="w-full h-full object-cover" />
                {/* Video Indicator (Mock) */}
                <div className="absolute inset-0 flex items-center justify-center bg-black/20">
                  <div className="w-8 h-8 bg-white/30 rounded-full flex items-center justify-center backdrop-blur-sm">
@@ -211,6 +247,14 @@ const WorkerDashboard = () => {
           </div>
         ))
       )}
+      {onLoadMore && (
+        <button
+          onClick={onLoadMore}
+          className="w-full py-3 bg-blue-50 text-blue-600 rounded-xl font-semibold hover:bg-blue-100 transition"
+        >
+          Load more
+        </button>
+      )}
     </div>
   );
 
@@ -276,7 +320,7 @@ const WorkerDashboard = () => {
 
         {/* Large Media View */}
         <div className="w-full h-[50vh] bg-gray-900 relative flex-shrink-0">
-          <img src={`/${selectedTask.image_url}`} alt="Detail" className="w-full h-full object-cover" />
+          <img src={`/${selectedTask.medium_url || selectedTask.image_url}`} alt="Detail" className="w-full h-full object-cover" />
           {/* Mock Video Controls */}
           <div className="absolute inset-0 flex items-center justify-center">
             <button className="w-16 h-16 bg-white/20 backdrop-blur-sm rounded-full flex items-center justify-center hover:bg-white/30 transition">
@@ -377,7 +421,7 @@ const WorkerDashboard = () => {
           </div>
         )}
         
-        {activeTab === 'available' ? renderList(availableTasks) : renderList(myTasks)}
+        {activeTab === 'available' ? renderList(availableTasks, availableCursor && loadMoreTasks) : renderList(myTasks)}
       </div>
     </div>
   );
@@ -0,0 +1,48 @@
+from sqlalchemy import event
+from contextlib import contextmanager
+import asyncio
+
+# Test helper: counts the SQL statements an engine executes, to catch N+1
+# lazy loads in list endpoints.
+#
+#     with assert_max_queries(engine, 4):
+#         client.get("/admin/reports", headers=headers)
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+        # Statements that blocked an event loop instead of running in a worker thread
+        self.on_event_loop = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        if _on_event_loop():
+            self.on_event_loop.append(statement)
+
+@contextmanager
+def count_queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    with count_queries(engine) as counter:
+        yield counter
+    assert counter.count <= limit, (
+        f"Expected at most {limit} queries, got {counter.count}:\n" + "\n".join(counter.statements)
+    )
@@ -0,0 +1,85 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.database import Base
+from backend.models.activity import ActivityLog
+from backend.services.activity import ActivityLogger
+import threading
+import time
+import pytest
+
+@pytest.fixture
+def Session(tmp_path):
+    # A file, not StaticPool's single shared connection: the writer thread
+    # and the test each get their own connection, as with the real database
+    engine = create_engine(f"sqlite:///{tmp_path / 'activity.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def count(Session):
+    with Session() as db:
+        return db.query(ActivityLog).count()
+
+def test_events_are_written_in_bulk_batches(Session):
+    logger = ActivityLogger(session_factory=Session, batch_size=10, flush_interval_ms=1000)
+    for i in range(25):
+        assert logger.log("LOGIN", f"user {i} logged in", i)
+    assert logger.flush()
+    assert count(Session) == 25
+    stats = logger.stats()
+    assert stats["written"] == 25
+    # Two full batches plus the remainder, not one write per event
+    assert stats["flushes"] == 3
+    assert stats["max_flush_ms"] > 0
+    logger.close()
+
+def test_partial_batch_is_written_after_the_interval(Session):
+    logger = ActivityLogger(session_factory=Session, batch_size=100, flush_interval_ms=20)
+    logger.log("LOGOUT", "bye", 1)
+    deadline = time.monotonic() + 2
+    while count(Session) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert count(Session) == 1
+    with Session() as db:
+        log = db.query(ActivityLog).one()
+        assert (log.action, log.details, log.user_id) == ("LOGOUT", "bye", 1)
+    logger.close()
+
+def test_full_queue_drops_events_instead_of_blocking(Session):
+    release = threading.Event()
+
+    def slow_session():
+        release.wait(5)
+        return Session()
+
+    logger = ActivityLogger(session_factory=slow_session, max_queue=3, batch_size=1, flush_interval_ms=1)
+    results = [logger.log("CLAIM_TASK", str(i)) for i in range(10)]
+    # One event is held by the stalled writer, three wait in the queue
+    assert results.count(True) <= 4
+    assert logger.stats()["dropped"] == results.count(False)
+    assert logger.stats()["queue_depth"] <= 3
+
+    release.set()
+    logger.close()
+    assert count(Session) == results.count(True)
+
+def test_close_writes_queued_events(Session):
+    logger = ActivityLogger(session_factory=Session, batch_size=1000, flush_interval_ms=60_000)
+    for i in range(5):
+        logger.log("CREATE_REPORT", str(i))
+    logger.close()
+    assert count(Session) == 5
+
+def test_failed_flush_is_counted(Session):
+    def broken_session():
+        db = Session()
+        db.execute = lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("disk full"))
+        return db
+
+    logger = ActivityLogger(session_factory=broken_session, batch_size=2)
+    logger.log("LOGIN")
+    logger.log("LOGIN")
+    assert logger.flush()
+    assert logger.stats()["failed"] == 2
+    assert logger.stats()["written"] == 0
+    logger.close()
@@ -0,0 +1,92 @@
+from backend.services import ai as ai_module
+from backend.services.ai import AIService
+from backend.services.executor import InferenceExecutor
+import asyncio
+import threading
+import time
+import numpy as np
+
+def make_service(classifier_scores, object_counts=None):
+    # Each fake image decodes to pixels filled with its index in `paths`
+    paths = list(classifier_scores)
+    path_of = lambda pixels: paths[int(pixels[0, 0, 0])]
+
+    service = AIService()
+    service.decode_image = lambda image_path=None, image_bytes=None: np.full((2, 2, 3), paths.index(image_path), dtype=np.uint8)
+    service.classify_pixels = lambda pixels, content_hash=None: {
+        "is_garbage": classifier_scores[path_of(pixels)] > 0.85,
+        "score": classifier_scores[path_of(pixels)]
+    }
+    service.count_objects = lambda pixels, content_hash=None: (object_counts or {}).get(path_of(pixels), 0)
+    return service
+
+def test_classifier_positive_skips_object_detection(monkeypatch):
+    monkeypatch.setattr(ai_module, "detect_objects", lambda *args, **kwargs: [])
+    service = make_service({"a.jpg": 0.1, "b.jpg": 0.95}, object_counts={"a.jpg": 3})
+
+    results = asyncio.run(service.screen_images(["a.jpg", "b.jpg"]))
+
+    assert [r["file_url"] for r in results] == ["a.jpg", "b.jpg"]
+    assert results[1]["is_garbage"] is True
+    assert results[1]["score"] == 0.95
+    assert all(r["stage"] != "object_detection" for r in results)
+
+def test_object_detection_runs_only_for_rejected_images(monkeypatch):
+    monkeypatch.setattr(ai_module, "detect_objects", lambda *args, **kwargs: [])
+    service = make_service({"a.jpg": 0.1, "b.jpg": 0.2}, object_counts={"b.jpg": 2})
+
+    results = asyncio.run(service.screen_images(["a.jpg", "b.jpg"]))
+
+    assert any(r["is_garbage"] for r in results)
+    b = results[1]
+    assert b["stage"] == "object_detection"
+    assert b["detections"] == 2
+    assert b["score"] == 0.2
+
+def test_no_images_means_nothing_to_screen():
+    assert asyncio.run(make_service({}).screen_images([])) == []
+
+def test_images_are_decoded_once_from_uploaded_bytes(monkeypatch):
+    monkeypatch.setattr(ai_module, "detect_objects", lambda *args, **kwargs: [])
+    service = make_service({"a.jpg": 0.1}, object_counts={"a.jpg": 1})
+    decoded = []
+    decode = service.decode_image
+    service.decode_image = lambda image_path=None, image_bytes=None: decoded.append(image_bytes) or decode(image_path)
+
+    results = asyncio.run(service.screen_images(["a.jpg"], [b"jpeg bytes"]))
+
+    assert results[0]["stage"] == "object_detection"
+    assert decoded == [b"jpeg bytes"]
+
+def test_report_with_more_images_than_the_queue_limit(monkeypatch):
+    executor = InferenceExecutor(max_workers=2, max_pending=8)
+    monkeypatch.setattr(ai_module, "inference_executor", executor)
+    monkeypatch.setattr(ai_module, "detect_objects", lambda *args, **kwargs: [])
+    paths = [f"{i}.jpg" for i in range(10)]
+    service = make_service({path: 0.1 for path in paths}, object_counts={"9.jpg": 1})
+
+    running, peak, lock = 0, 0, threading.Lock()
+    classify = service.classify_pixels
+
+    def tracked(pixels, content_hash=None):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return classify(pixels, content_hash)
+    service.classify_pixels = tracked
+
+    async def screen():
+        async with executor.admit():
+            return await service.screen_images(paths)
+    results = asyncio.run(screen())
+    executor.shutdown()
+
+    assert results[9]["stage"] == "object_detection" and results[9]["is_garbage"]
+    # One slot for the report, at most max_workers images at a time
+    assert peak <= 2
+    assert executor.stats()["rejected"] == 0
+    assert executor.stats()["pending"] == 0
@@ -0,0 +1,72 @@
+from ai_service.boxes import box_iou, nms
+from ai_service.tiling import grid_tiles, plan_tiles
+import numpy as np
+
+def reference_nms(boxes, scores, class_ids, iou_threshold):
+    # Straightforward pairwise implementation used as the oracle
+    def iou(a, b):
+        w = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+        h = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = w * h
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return inter / union if union else 0
+
+    order = sorted(range(len(boxes)), key=lambda i: scores[i], reverse=True)
+    keep = []
+    while order:
+        current = order.pop(0)
+        keep.append(current)
+        order = [
+            i for i in order
+            if class_ids[i] != class_ids[current] or iou(boxes[current], boxes[i]) < iou_threshold
+        ]
+    return keep
+
+def test_box_iou():
+    iou = box_iou([0, 0, 10, 10], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30], [0, 0, 0, 0]])
+    np.testing.assert_allclose(iou, [1.0, 1 / 3, 0.0, 0.0], rtol=1e-6)
+
+def test_nms_empty():
+    assert len(nms([], [], [])) == 0
+
+def test_nms_is_class_aware():
+    boxes = [[0, 0, 10, 10], [1, 1, 10, 10], [0, 0, 10, 10]]
+    scores = [0.9, 0.8, 0.7]
+    class_ids = [1, 1, 2]
+    # Second box overlaps the first (same class); third is a different class
+    assert nms(boxes, scores, class_ids).tolist() == [0, 2]
+    assert nms(boxes, scores).tolist() == [0]
+
+def test_nms_matches_reference_on_crowded_scene():
+    rng = np.random.default_rng(42)
+    n = 400
+    xy = rng.uniform(0, 1000, size=(n, 2))
+    wh = rng.uniform(10, 120, size=(n, 2))
+    boxes = np.concatenate([xy, xy + wh], axis=1).astype(np.float32)
+    scores = rng.uniform(0.25, 1.0, size=n).astype(np.float32)
+    class_ids = rng.integers(1, 5, size=n)
+
+    keep = nms(boxes, scores, class_ids, iou_threshold=0.5)
+    expected = reference_nms(boxes.tolist(), scores.tolist(), class_ids.tolist(), 0.5)
+    assert keep.tolist() == expected
+
+def test_small_images_are_not_tiled():
+    assert plan_tiles(800, 600) == []
+
+def test_medium_images_get_overlapping_2x2_grid():
+    tiles = plan_tiles(2000, 1500)
+    assert len(tiles) == 4
+    (ax1, ay1, ax2, ay2), (bx1, by1, bx2, by2) = tiles[0], tiles[1]
+    assert bx1 < ax2  # Horizontal neighbours overlap
+    assert ay1 == by1 and ay2 == by2
+
+def test_12mp_images_get_3x3_grid_covering_the_image():
+    width, height = 4000, 3000
+    tiles = plan_tiles(width, height)
+    assert len(tiles) == 9
+    assert min(t[0] for t in tiles) == 0 and max(t[2] for t in tiles) == width
+    assert min(t[1] for t in tiles) == 0 and max(t[3] for t in tiles) == height
+
+def test_grid_tiles_without_overlap_partition_the_image():
+    tiles = grid_tiles(100, 50, rows=2, cols=2)
+    assert tiles == [(0, 0, 50, 25), (50, 0, 100, 25), (0, 25, 50, 50), (50, 25, 100, 50)]
@@ -0,0 +1,98 @@
+from backend.services.broadcast import BroadcastBus, LocalSocketBackend, RedisBackend, create_backend
+from backend.services.websocket import ConnectionManager, ADMINS, WORKERS, event
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import pytest
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.sent.append(json.loads(message))
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+async def start_process(directory, presence_seconds=0.05):
+    """One 'worker process': its own hub and bus on a shared socket directory."""
+    manager = ConnectionManager()
+    bus = BroadcastBus(LocalSocketBackend(str(directory)), presence_seconds=presence_seconds)
+    await bus.start(manager)
+    return manager, bus
+
+def test_events_fan_out_across_processes(tmp_path):
+    async def run():
+        (a, bus_a), (b, bus_b) = await start_process(tmp_path), await start_process(tmp_path)
+        admin_on_a, admin_on_b = FakeSocket(), FakeSocket()
+        await a.connect(admin_on_a, 1, "admin", [ADMINS])
+        await b.connect(admin_on_b, 2, "admin", [ADMINS])
+
+        b.publish([ADMINS], event("task_created", report_id=9))
+        await wait_for(lambda: admin_on_a.sent)
+        assert [e["report_id"] for e in admin_on_a.sent] == [9]
+        # Delivered once on each process, not echoed back
+        await asyncio.sleep(0.05)
+        assert len(admin_on_b.sent) == 1
+
+        await bus_a.stop()
+        await bus_b.stop()
+        assert not list(tmp_path.glob("*.sock"))
+    asyncio.run(run())
+
+def test_presence_is_aggregated_and_expires(tmp_path):
+    async def run():
+        (a, bus_a), (b, bus_b) = await start_process(tmp_path), await start_process(tmp_path)
+        await b.connect(FakeSocket(), 5, "worker", [WORKERS])
+        await a.connect(FakeSocket(), 6, "worker", [WORKERS])
+
+        await wait_for(lambda: a.get_active_count(WORKERS) == 2)
+        assert b.get_active_count(WORKERS) == 2
+
+        # A process that shuts down cleanly leaves immediately
+        await bus_b.stop()
+        await wait_for(lambda: a.get_active_count(WORKERS) == 1)
+
+        # One that vanishes is dropped after three missed rounds
+        bus_a.presence["crashed"] = (bus_a.clock() - 1, {WORKERS: 4})
+        assert a.get_active_count(WORKERS) == 1
+        await bus_a.stop()
+    asyncio.run(run())
+
+def test_sockets_of_dead_processes_are_removed(tmp_path):
+    async def run():
+        stale = str(tmp_path / "1-dead.sock")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(stale)
+        sock.close()
+
+        backend = LocalSocketBackend(str(tmp_path))
+        await backend.start(lambda payload: None)
+        await backend.send(b"{}")
+        assert not os.path.exists(stale)
+        await backend.stop()
+    asyncio.run(run())
+
+def test_create_backend():
+    assert create_backend("memory://") is None
+    assert isinstance(create_backend("unix:///tmp/bus"), LocalSocketBackend)
+    assert isinstance(create_backend("redis://localhost:6379/0"), RedisBackend)
+    with pytest.raises(ValueError):
+        create_backend("kafka://localhost")
+
+@pytest.mark.skipif(importlib.util.find_spec("redis") is not None, reason="redis is installed")
+def test_redis_backend_needs_the_package():
+    with pytest.raises(RuntimeError, match="redis"):
+        asyncio.run(RedisBackend("redis://localhost:6379/0").start(lambda payload: None))
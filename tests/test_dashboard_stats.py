@@ -0,0 +1,110 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.models.user import User, UserRole, Report, ReportStatus
+from backend.api.auth import create_access_token
+from backend.services import stats as stats_module
+from backend.services.stats import DashboardStats, dashboard_stats
+from tests.query_counter import count_queries
+import datetime
+import pytest
+
+client = TestClient(app)
+
+def make_report(db, status=ReportStatus.PENDING, worker_id=None, cleanup_time=None):
+    report = Report(description="pile", image_url="uploads/x.jpg", latitude=0.0, longitude=0.0,
+                    owner_id=1, status=status, worker_id=worker_id, cleanup_time=cleanup_time)
+    db.add(report)
+    db.commit()
+    db.refresh(report)
+    return report
+
+def test_hooks_keep_counters_equal_to_a_recount(db):
+    stats = DashboardStats()
+    make_report(db, ReportStatus.CLEANED, worker_id=7, cleanup_time=datetime.datetime.utcnow())
+    stats.load(db)
+
+    report = make_report(db)
+    assert stats.report_created(report) == {
+        "by_status": {"pending": 1},
+        "per_day": {report.created_at.date().isoformat(): {"created": 1}},
+        "active_complaints": 1
+    }
+
+    # Claim
+    report.status, report.worker_id = ReportStatus.ASSIGNED, 7
+    db.commit()
+    delta = stats.status_changed(report, ReportStatus.PENDING, None)
+    assert delta == {"by_status": {"pending": -1, "assigned": 1}, "per_worker": {"7": {"assigned": 1}}}
+
+    # Complete
+    report.status, report.cleanup_time = ReportStatus.CLEANED, datetime.datetime.utcnow()
+    db.commit()
+    delta = stats.status_changed(report, ReportStatus.ASSIGNED, 7, None)
+    assert delta["active_complaints"] == -1
+    assert delta["per_worker"] == {"7": {"assigned": -1, "cleaned": 1}}
+
+    # Review
+    report.status = ReportStatus.VERIFIED
+    db.commit()
+    stats.status_changed(report, ReportStatus.CLEANED, 7, report.cleanup_time)
+
+    other = make_report(db)
+    stats.report_created(other)
+    stats.report_deleted(other)
+    db.delete(other)
+    db.commit()
+
+    incremental = stats.snapshot()
+    stats.load(db)
+    assert incremental == stats.snapshot()
+    assert incremental["by_status"]["verified"] == 1
+    assert incremental["per_worker"] == {"7": {"cleaned": 1, "verified": 1}}
+
+def test_counters_resync_after_the_interval(db):
+    now = [0.0]
+    stats = DashboardStats(resync_seconds=60, clock=lambda: now[0])
+    stats.ensure_loaded(db)
+    make_report(db) # written without hooks, e.g. by another process
+    stats.ensure_loaded(db)
+    assert stats.snapshot()["active_complaints"] == 0
+    now[0] = 61
+    stats.ensure_loaded(db)
+    assert stats.snapshot()["active_complaints"] == 1
+
+@pytest.fixture
+def users(db):
+    admin = User(email="admin@example.com", hashed_password="x", role=UserRole.ADMIN)
+    worker = User(email="worker@example.com", hashed_password="x", full_name="Worker", role=UserRole.WORKER)
+    db.add_all([admin, worker])
+    db.commit()
+    headers = lambda user: {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+    return {"admin": headers(admin), "worker": headers(worker), "worker_id": worker.id}
+
+def test_stats_endpoint_serves_from_memory_and_pushes_deltas(db_engine, db, users, monkeypatch):
+    published = []
+
+    def capture(topics, event):
+        published.append(event)
+
+    monkeypatch.setattr(stats_module.websocket.manager, "publish", capture)
+    report = make_report(db)
+    dashboard_stats.load(db)
+
+    with count_queries(db_engine) as queries:
+        response = client.get("/admin/stats", headers=users["admin"])
+    assert response.json()["active_complaints"] == 1
+    assert response.json()["by_status"]["pending"] == 1
+    # Only the current-user lookup; no COUNT over reports
+    assert queries.count == 1
+
+    client.post(f"/tasks/{report.id}/claim", headers=users["worker"])
+    client.put(f"/reports/{report.id}/review", headers=users["admin"], params={"status": "rejected"})
+
+    deltas = [event["delta"] for event in published if event["type"] == "stats"]
+    assert deltas[0]["by_status"] == {"pending": -1, "assigned": 1}
+    assert deltas[1]["by_status"] == {"assigned": -1, "rejected": 1}
+    assert deltas[1]["active_complaints"] == -1
+
+    response = client.get("/admin/stats", headers=users["admin"])
+    assert response.json()["active_complaints"] == 0
+    assert response.json()["per_worker"] == {str(users["worker_id"]): {"rejected": 1}}
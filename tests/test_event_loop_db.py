@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.models.user import User, UserRole, Report, ReportStatus
+from backend.api.auth import create_access_token
+from backend.services import ai as ai_module, media_store
+from tests.query_counter import count_queries
+import io
+import os
+
+# Async handlers must hand every database call to the threadpool, so slow
+# queries never stall websocket broadcasts or other requests on the loop.
+
+client = TestClient(app)
+
+def auth(user):
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+
+def test_async_handlers_keep_db_io_off_the_event_loop(db_engine, db, monkeypatch, tmp_path):
+    monkeypatch.setattr(ai_module.ai_service, "verify_cleanup", lambda *args: True)
+    # Uploads go to a scratch store, not the repo's uploads/
+    upload_dir = str(tmp_path / "uploads")
+    monkeypatch.setattr(media_store, "UPLOAD_DIR", upload_dir)
+    monkeypatch.setattr(media_store, "INCOMING_DIR", os.path.join(upload_dir, ".incoming"))
+    os.makedirs(media_store.INCOMING_DIR)
+    user = User(email="user@example.com", hashed_password="x", full_name="User", role=UserRole.USER)
+    worker = User(email="worker@example.com", hashed_password="x", full_name="Worker",
+                  role=UserRole.WORKER, qr_login_token="qr-token")
+    db.add_all([user, worker])
+    db.commit()
+
+    with count_queries(db_engine) as queries:
+        # Video-only report: no AI screening involved
+        response = client.post(
+            "/reports/",
+            headers=auth(user),
+            data={"description": "Dump behind the market", "latitude": 12.0, "longitude": 77.0},
+            files={"files": ("clip.mp4", io.BytesIO(b"\x00" * 64), "video/mp4")}
+        )
+        assert response.status_code == 200, response.text
+        report_id = response.json()["id"]
+        assert response.json()["complaint_id"].startswith("DUM-")
+        assert len(response.json()["media"]) == 1
+
+        response = client.post("/auth/qr-login", json={"token": "qr-token"})
+        assert response.status_code == 200
+
+        response = client.post(f"/tasks/{report_id}/claim", headers=auth(worker))
+        assert response.status_code == 200
+        assert response.json()["status"] == "assigned"
+
+        response = client.post(
+            f"/tasks/{report_id}/complete",
+            headers=auth(worker),
+            data={"latitude": 12.0, "longitude": 77.0},
+            files={"file": ("after.mp4", io.BytesIO(b"\x01" * 64), "video/mp4")}
+        )
+        assert response.status_code == 200, response.text
+        assert response.json()["status"] == "cleaned"
+
+        response = client.post("/auth/logout", headers=auth(worker))
+        assert response.status_code == 200
+
+    assert queries.count > 0
+    assert queries.on_event_loop == []
+    db.expire_all()
+    assert db.get(Report, report_id).status == ReportStatus.CLEANED
@@ -0,0 +1,82 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.models.user import User, UserRole, Report, ReportStatus
+from backend.api.auth import create_access_token
+from backend.services import geo
+import numpy as np
+import pytest
+
+client = TestClient(app)
+
+def in_ranges(cell, ranges):
+    return any(low <= cell <= high for low, high in ranges)
+
+def test_haversine_matches_known_distance():
+    # Paris -> London
+    assert geo.haversine(48.8566, 2.3522, 51.5074, -0.1278) == pytest.approx(343_500, rel=0.01)
+    distances = geo.haversine(0.0, 0.0, np.array([0.0, 1.0]), np.array([1.0, 0.0]))
+    assert distances == pytest.approx([111_195, 111_195], rel=1e-3)
+
+@pytest.mark.parametrize("latitude, longitude", [
+    (12.97, 77.59), (-33.86, 151.21), (0.0, 179.999), (0.0, -179.999), (89.95, 10.0), (-89.99, 0.0)
+])
+def test_cell_ranges_cover_the_search_circle(latitude, longitude):
+    rng = np.random.default_rng(0)
+    radius = 5_000
+    ranges = geo.cell_ranges(latitude, longitude, radius)
+    # Random points inside the circle, including near its edge
+    bearings = rng.uniform(0, 2 * np.pi, 2000)
+    offsets = rng.uniform(0, radius * 0.999, 2000) / geo.EARTH_RADIUS_M
+    lat1, lng1 = np.radians(latitude), np.radians(longitude)
+    lats = np.arcsin(np.sin(lat1) * np.cos(offsets) + np.cos(lat1) * np.sin(offsets) * np.cos(bearings))
+    lngs = lng1 + np.arctan2(np.sin(bearings) * np.sin(offsets) * np.cos(lat1), np.cos(offsets) - np.sin(lat1) * np.sin(lats))
+    lngs = (np.degrees(lngs) + 540) % 360 - 180
+    for lat, lng in zip(np.degrees(lats), lngs):
+        assert in_ranges(geo.cell_for(lat, lng), ranges)
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(1)
+    points = [(i, 12.9 + rng.uniform(0, 0.2), 77.5 + rng.uniform(0, 0.2)) for i in range(500)]
+    cells = {id: geo.cell_for(lat, lng) for id, lat, lng in points}
+
+    def fetch(ranges):
+        return [p for p in points if in_ranges(cells[p[0]], ranges)]
+
+    expected = sorted(
+        (float(geo.haversine(13.0, 77.6, lat, lng)), id) for id, lat, lng in points
+    )
+    nearest = geo.nearest(fetch, 13.0, 77.6, limit=10)
+    assert [id for id, _ in nearest] == [id for _, id in expected[:10]]
+
+    within = geo.nearest(fetch, 13.0, 77.6, radius_m=2_000, limit=500)
+    assert [id for id, _ in within] == [id for d, id in expected if d <= 2_000]
+
+def test_nearby_tasks_endpoint(db):
+    worker = User(email="worker@example.com", hashed_password="x", role=UserRole.WORKER)
+    db.add(worker)
+    db.flush()
+    spots = [
+        (13.0000, 77.6000, ReportStatus.ASSIGNED), # closest, but not available
+        (13.0010, 77.6000, ReportStatus.PENDING), # ~111 m
+        (13.0000, 77.6100, ReportStatus.PENDING), # ~1.08 km
+        (13.0500, 77.6000, ReportStatus.PENDING), # ~5.6 km
+        (14.0000, 77.6000, ReportStatus.PENDING), # ~111 km, beyond the search limit
+    ]
+    for i, (lat, lng, status) in enumerate(spots):
+        db.add(Report(description=f"spot {i}", image_url="uploads/x.jpg", latitude=lat, longitude=lng,
+                      status=status, owner_id=worker.id))
+    db.commit()
+    assert db.query(Report).filter(Report.geo_cell.is_(None)).count() == 0
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': worker.email})}"}
+    response = client.get("/tasks/nearby", headers=headers, params={"latitude": 13.0, "longitude": 77.6})
+    assert response.status_code == 200
+    tasks = response.json()
+    assert [t["description"] for t in tasks] == ["spot 1", "spot 2", "spot 3"]
+    assert tasks[0]["distance_m"] == pytest.approx(111, abs=2)
+
+    response = client.get("/tasks/nearby", headers=headers, params={"latitude": 13.0, "longitude": 77.6, "limit": 1})
+    assert [t["description"] for t in response.json()] == ["spot 1"]
+
+    response = client.get("/tasks/nearby", headers=headers, params={"latitude": 13.0, "longitude": 77.6, "radius_m": 2000})
+    assert [t["description"] for t in response.json()] == ["spot 1", "spot 2"]
@@ -0,0 +1,78 @@
+import numpy as np
+import os
+import pytest
+from PIL import Image
+
+tf = pytest.importorskip("tensorflow")
+
+from ai_service.backends import KerasBackend, TFLiteBackend, load_backend, resolve_model_path
+from ai_service.export import PARITY_TOLERANCE, check_parity, export_model, load_images
+
+@pytest.fixture(scope="module")
+def keras_model_path(tmp_path_factory):
+    """Small stand-in for the MobileNetV2 classifier with the same input and output."""
+    tf.keras.utils.set_random_seed(0)
+    inputs = tf.keras.Input((224, 224, 3))
+    x = tf.keras.layers.Conv2D(8, 3, strides=4, activation="relu")(inputs)
+    x = tf.keras.layers.Conv2D(8, 3, strides=2, activation="relu")(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(1, activation="sigmoid")(x)
+    path = str(tmp_path_factory.mktemp("models") / "waste_model.h5")
+    tf.keras.Model(inputs, outputs).save(path)
+    return path
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("dataset")
+    rng = np.random.default_rng(1)
+    for label in ("clean", "garbage"):
+        os.makedirs(directory / label)
+        for i in range(10):
+            pixels = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(directory / label / f"{i}.jpg")
+    return str(directory)
+
+def test_float_tflite_export_matches_keras(keras_model_path, dataset):
+    reference = KerasBackend(keras_model_path)
+    images = load_images(dataset)
+    (path,) = export_model(reference.model, ["tflite"], model_path=keras_model_path)
+    assert path.endswith(".tflite")
+
+    candidate = load_backend(path)
+    assert isinstance(candidate, TFLiteBackend)
+    check_parity(reference, candidate, images, PARITY_TOLERANCE["float"])
+    # The interpreter is resized for each batch size the batcher sends
+    check_parity(reference, candidate, images[:3], PARITY_TOLERANCE["float"])
+
+def test_int8_tflite_export_stays_within_tolerance(keras_model_path, dataset, tmp_path):
+    reference = KerasBackend(keras_model_path)
+    images = load_images(dataset)
+    int8_path = str(tmp_path / "waste_model.h5")
+    (path,) = export_model(reference.model, ["tflite"], int8=True, model_path=int8_path, calibration_images=images)
+
+    float_size = len(open(export_model(reference.model, ["tflite"], model_path=str(tmp_path / "f.h5"))[0], "rb").read())
+    assert os.path.getsize(path) < float_size
+    check_parity(reference, load_backend(path), images, PARITY_TOLERANCE["int8"])
+
+def test_parity_check_reports_drift():
+    class Fixed:
+        def __init__(self, name, score):
+            self.name, self.score = name, score
+
+        def predict(self, batch):
+            return np.full(len(batch), self.score)
+
+    images = np.zeros((2, 224, 224, 3), dtype=np.float32)
+    assert check_parity(Fixed("keras", 0.5), Fixed("tflite", 0.5005), images, 1e-3) == pytest.approx(5e-4, abs=1e-6)
+    with pytest.raises(AssertionError, match="tflite"):
+        check_parity(Fixed("keras", 0.5), Fixed("tflite", 0.6), images, 1e-3)
+
+def test_backend_selection(tmp_path):
+    paths = {name: str(tmp_path / f"waste_model.{ext}") for name, ext in
+             (("keras", "h5"), ("tflite", "tflite"), ("onnx", "onnx"))}
+    assert resolve_model_path(paths) == paths["keras"]
+    open(paths["tflite"], "wb").close()
+    assert resolve_model_path(paths) == paths["tflite"]
+    assert resolve_model_path(paths, "keras") == paths["keras"]
+    with pytest.raises(ValueError):
+        load_backend(str(tmp_path / "model.pt"))
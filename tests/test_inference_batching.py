@@ -0,0 +1,66 @@
+from ai_service.batching import MicroBatcher, Histogram
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import numpy as np
+import pytest
+
+def test_histogram_buckets_and_quantiles():
+    hist = Histogram((1, 5, 10))
+    for value in [0.5, 3, 3, 7, 50]:
+        hist.observe(value)
+
+    snap = hist.snapshot()
+    assert snap["buckets"] == {"1": 1, "5": 2, "10": 1, "+Inf": 1}
+    assert snap["count"] == 5
+    assert snap["p50"] == 5
+    assert snap["p99"] is None  # Falls in the +Inf bucket
+
+def test_concurrent_requests_are_batched():
+    batch_sizes = []
+    release = threading.Event()
+
+    def predict_fn(batch):
+        # Hold the first batch so the rest queue up behind it
+        release.wait(timeout=5)
+        batch_sizes.append(len(batch))
+        return batch.sum(axis=1)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit(np.array([i, 1.0])) for i in range(20)]
+    release.set()
+
+    results = [f.result(timeout=5) for f in futures]
+    batcher.shutdown(timeout=5)
+
+    assert results == [i + 1.0 for i in range(20)]
+    assert sum(batch_sizes) == 20
+    assert max(batch_sizes) <= 8
+    assert len(batch_sizes) < 20
+
+    stats = batcher.stats()
+    assert stats["batch_size"]["count"] == len(batch_sizes)
+    assert stats["queue_latency_ms"]["count"] == 20
+
+def test_blocking_predict_from_threads():
+    batcher = MicroBatcher(lambda batch: batch * 2, max_batch_size=4, max_wait_ms=5)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: batcher.predict(np.float32(i), timeout=5), range(16)))
+    batcher.shutdown(timeout=5)
+    assert results == [i * 2 for i in range(16)]
+
+def test_errors_propagate_to_every_caller():
+    def predict_fn(batch):
+        raise ValueError("model exploded")
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit(np.zeros(2)) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    batcher.shutdown(timeout=5)
+
+def test_submit_after_shutdown_fails():
+    batcher = MicroBatcher(lambda batch: batch, max_batch_size=2)
+    batcher.shutdown()
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.zeros(1))
@@ -0,0 +1,56 @@
+from backend.services.executor import InferenceExecutor, InferenceBusyError
+import asyncio
+import threading
+import pytest
+
+def test_runs_blocking_work_off_the_event_loop():
+    executor = InferenceExecutor(max_workers=2, max_pending=4)
+    loop_thread = threading.get_ident()
+
+    async def main():
+        return await asyncio.gather(*(executor.run(lambda i=i: (i, threading.get_ident())) for i in range(4)))
+
+    results = asyncio.run(main())
+    executor.shutdown()
+
+    assert [i for i, _ in results] == [0, 1, 2, 3]
+    assert all(thread != loop_thread for _, thread in results)
+    assert executor.stats()["completed"] == 4
+
+def test_rejects_with_503_when_saturated():
+    executor = InferenceExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceBusyError) as exc_info:
+            await executor.run(lambda: None)
+        release.set()
+        await first
+        return exc_info.value
+
+    error = asyncio.run(main())
+    executor.shutdown()
+
+    assert error.status_code == 503
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["pending"] == 0
+
+def test_admitted_request_takes_one_slot_for_all_its_jobs():
+    executor = InferenceExecutor(max_workers=1, max_pending=1)
+
+    async def main():
+        async with executor.admit():
+            assert executor.stats()["pending"] == 1
+            results = await asyncio.gather(*(executor.submit(lambda i=i: i) for i in range(5)))
+            # A second request is turned away before it does any work
+            with pytest.raises(InferenceBusyError):
+                async with executor.admit():
+                    pass
+        return results
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+    executor.shutdown()
+    assert executor.stats()["pending"] == 0
+    assert executor.stats()["rejected"] == 1
@@ -0,0 +1,124 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.models.user import User, UserRole
+from backend.models.activity import ActivityLog, ActivityLogDaily
+from backend.api.auth import create_access_token
+from backend.services import log_retention
+from backend.services.locks import FileLock
+import asyncio
+import datetime
+import pytest
+
+client = TestClient(app)
+
+NOW = datetime.datetime(2024, 6, 1, 12, 0)
+
+def add_logs(db, day_offset, actions, user_ids=(1,)):
+    base = NOW - datetime.timedelta(days=day_offset)
+    for i, action in enumerate(actions):
+        db.add(ActivityLog(
+            action=action, details=f"{action} {i}", user_id=user_ids[i % len(user_ids)],
+            timestamp=base.replace(hour=0) + datetime.timedelta(minutes=i)
+        ))
+    db.commit()
+
+def test_retention_archives_whole_old_days(db, tmp_path):
+    add_logs(db, 100, ["LOGIN", "LOGIN", "CLAIM_TASK"], user_ids=(1, 2))
+    add_logs(db, 95, ["LOGIN"])
+    add_logs(db, 30, ["LOGOUT"] * 4)
+
+    result = log_retention.apply_retention(db, retention_days=90, now=NOW, archive_dir=str(tmp_path))
+    assert result == {"days": 2, "archived": 4}
+
+    # Only the recent day stays in the hot table
+    assert {log.action for log in db.query(ActivityLog)} == {"LOGOUT"}
+
+    old_day = (NOW - datetime.timedelta(days=100)).date()
+    archived = log_retention.read_archive(old_day, str(tmp_path))
+    assert [a["action"] for a in archived] == ["LOGIN", "LOGIN", "CLAIM_TASK"]
+    assert archived[0]["details"] == "LOGIN 0"
+
+    summary = {(s.day, s.action): (s.count, s.users) for s in db.query(ActivityLogDaily)}
+    assert summary == {
+        (old_day, "LOGIN"): (2, 2),
+        (old_day, "CLAIM_TASK"): (1, 1),
+        ((NOW - datetime.timedelta(days=95)).date(), "LOGIN"): (1, 1),
+    }
+
+    # Nothing left to do on the next run
+    assert log_retention.apply_retention(db, retention_days=90, now=NOW, archive_dir=str(tmp_path))["archived"] == 0
+
+def test_rerun_for_same_day_appends_and_adds_counts(db, tmp_path):
+    add_logs(db, 100, ["LOGIN"])
+    log_retention.apply_retention(db, retention_days=90, now=NOW, archive_dir=str(tmp_path))
+    add_logs(db, 100, ["LOGIN", "LOGIN"])
+    log_retention.apply_retention(db, retention_days=90, now=NOW, archive_dir=str(tmp_path))
+
+    day = (NOW - datetime.timedelta(days=100)).date()
+    assert len(log_retention.read_archive(day, str(tmp_path))) == 3
+    assert db.query(ActivityLogDaily).one().count == 3
+
+def test_only_one_process_archives_at_a_time(db, tmp_path):
+    add_logs(db, 100, ["LOGIN"])
+    # Another worker is archiving
+    other = FileLock(str(tmp_path / log_retention.LOCK_FILE))
+    assert other.acquire()
+    try:
+        assert log_retention.apply_retention(db, retention_days=90, now=NOW, archive_dir=str(tmp_path)) == {"days": 0, "archived": 0}
+        assert db.query(ActivityLog).count() == 1
+    finally:
+        other.release()
+    assert log_retention.apply_retention(db, retention_days=90, now=NOW, archive_dir=str(tmp_path))["archived"] == 1
+
+def test_retention_loop_runs_at_startup(monkeypatch):
+    runs = []
+    monkeypatch.setattr(log_retention, "_run", lambda: runs.append(1))
+
+    async def run():
+        job = asyncio.create_task(log_retention.run_retention_loop(interval=3600))
+        await asyncio.sleep(0.1)
+        job.cancel()
+    asyncio.run(run())
+    assert runs == [1]
+
+@pytest.fixture
+def admin_headers(db):
+    db.add(User(email="admin@example.com", hashed_password="x", role=UserRole.ADMIN))
+    db.commit()
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'admin@example.com'})}"}
+
+def test_activity_log_pagination_and_filters(db, admin_headers):
+    add_logs(db, 3, ["LOGIN", "LOGOUT"] * 10, user_ids=(1, 2))
+
+    seen, cursor = [], None
+    while True:
+        response = client.get("/admin/activity-logs", headers=admin_headers,
+                              params={"limit": 6, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.extend(log["id"] for log in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [log.id for log in db.query(ActivityLog).order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc())]
+
+    response = client.get("/admin/activity-logs", headers=admin_headers,
+                          params={"action": "LOGIN", "user_id": 1, "include_total": True})
+    assert response.headers["X-Total-Count"] == "10"
+    assert {(log["action"], log["user_id"]) for log in response.json()} == {("LOGIN", 1)}
+
+    start = (NOW - datetime.timedelta(days=3)).replace(hour=0)
+    response = client.get("/admin/activity-logs", headers=admin_headers, params={
+        "since": (start + datetime.timedelta(minutes=5)).isoformat(),
+        "until": (start + datetime.timedelta(minutes=8)).isoformat()
+    })
+    assert len(response.json()) == 3
+
+def test_daily_summaries_endpoint(db, admin_headers, tmp_path):
+    add_logs(db, 100, ["LOGIN", "LOGIN", "SIGNUP"])
+    log_retention.apply_retention(db, retention_days=90, now=NOW, archive_dir=str(tmp_path))
+
+    response = client.get("/admin/activity-logs/daily", headers=admin_headers, params={"action": "LOGIN"})
+    assert response.status_code == 200
+    assert response.json() == [{
+        "day": (NOW - datetime.timedelta(days=100)).date().isoformat(), "action": "LOGIN", "count": 2, "users": 1
+    }]
@@ -0,0 +1,128 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.database import Base
+from backend.models.user import Report, ReportMedia
+from backend.services import media_store, thumbnails
+from backend import schemas
+from PIL import Image
+import hashlib
+import io
+import os
+import time
+import pytest
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    upload_dir = str(tmp_path / "uploads")
+    monkeypatch.setattr(media_store, "UPLOAD_DIR", upload_dir)
+    monkeypatch.setattr(media_store, "INCOMING_DIR", os.path.join(upload_dir, ".incoming"))
+    monkeypatch.setattr(media_store, "MEDIA_GC_GRACE_SECONDS", 60)
+    os.makedirs(media_store.INCOMING_DIR)
+    return media_store
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def put(store, content, ext=".jpg"):
+    tmp = store.incoming_path(f"{time.time_ns()}{ext}")
+    with open(tmp, "wb") as f:
+        f.write(content)
+    return store.commit_blob(tmp, hashlib.sha256(content).hexdigest(), ext)
+
+def age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+def test_identical_content_is_stored_once(store):
+    first = put(store, b"same bytes")
+    second = put(store, b"same bytes", ext=".JPG")
+
+    assert first == {"url": second["url"], "deduplicated": False}
+    assert second["deduplicated"] is True
+    digest = hashlib.sha256(b"same bytes").hexdigest()
+    assert first["url"] == f"{store.UPLOAD_DIR}/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+    assert os.listdir(store.INCOMING_DIR) == []
+
+def test_sweep_removes_only_old_unreferenced_blobs(store, db):
+    kept = put(store, b"referenced")["url"]
+    orphan = put(store, b"orphan")["url"]
+    fresh = put(store, b"fresh orphan")["url"]
+    for url in (kept, orphan):
+        age(url, 120)
+
+    report = Report(description="pile", latitude=0, longitude=0, image_url=kept)
+    report.media.append(ReportMedia(file_url=kept, media_type="image"))
+    db.add(report)
+    db.commit()
+
+    assert store.collect_garbage(db) == 1
+    assert os.path.exists(kept)
+    assert not os.path.exists(orphan)
+    assert os.path.exists(fresh)
+
+def test_release_keeps_blobs_shared_with_other_reports(store, db):
+    url = put(store, b"shared")["url"]
+    age(url, 120)
+    for _ in range(2):
+        db.add(Report(description="pile", latitude=0, longitude=0, image_url=url))
+    db.commit()
+
+    first = db.query(Report).first()
+    db.delete(first)
+    db.commit()
+    assert store.release(db, url) is False
+    assert os.path.exists(url)
+
+    db.query(Report).delete()
+    db.commit()
+    assert store.release(db, url) is True
+    assert not os.path.exists(url)
+
+def test_variants_are_generated_and_kept_with_their_original(store, db):
+    buf = io.BytesIO()
+    Image.new("RGB", (2000, 1000), (200, 40, 40)).save(buf, "JPEG")
+    url = put(store, buf.getvalue())["url"]
+
+    created = thumbnails.generate_variants(url, buf.getvalue())
+    assert created == [thumbnails.variant_url(url, "medium"), thumbnails.variant_url(url, "thumb")]
+    assert Image.open(thumbnails.variant_url(url, "thumb")).size == (320, 160)
+    assert Image.open(thumbnails.variant_url(url, "medium")).size == (1024, 512)
+    assert thumbnails.generate_variants(url) == []  # Already there
+
+    db.add(Report(description="pile", latitude=0, longitude=0, image_url=url))
+    db.commit()
+    for path in [url] + created:
+        age(path, 120)
+    assert store.collect_garbage(db) == 0
+
+    db.query(Report).delete()
+    db.commit()
+    assert store.release(db, url) is True
+    assert not any(os.path.exists(path) for path in created)
+
+def test_rows_are_flagged_once_their_variants_exist(store, db, monkeypatch):
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 600), (200, 40, 40)).save(buf, "JPEG")
+    url = put(store, buf.getvalue())["url"]
+    report = Report(description="pile", latitude=0, longitude=0, image_url=url, owner_id=1)
+    report.media = [ReportMedia(file_url=url, media_type="image")]
+    db.add(report)
+    db.commit()
+    assert schemas.Report.model_validate(report).thumbnail_url is None
+
+    thumbnails.generate_and_record(url, buf.getvalue(), sessionmaker(bind=db.get_bind()))
+    db.expire_all()
+    assert (report.variants_ready, report.cleanup_variants_ready, report.media[0].variants_ready) == (True, False, True)
+
+    # Built from the flags, without checking the files
+    monkeypatch.setattr(os.path, "exists", lambda path: pytest.fail(f"checked {path}"))
+    response = schemas.Report.model_validate(report)
+    assert response.thumbnail_url == thumbnails.variant_url(url, "thumb")
+    assert response.media[0].medium_url == thumbnails.variant_url(url, "medium")
+    assert response.cleanup_thumbnail_url is None
+    assert "variants_ready" not in response.model_dump()
@@ -0,0 +1,157 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.models.user import User, UserRole
+from backend.api.auth import create_access_token
+from ai_service import inference as inference_module
+from ai_service.inference import InferenceService
+from ai_service.registry import ModelRegistry
+import numpy as np
+import threading
+import pytest
+
+client = TestClient(app)
+
+BRIGHT = np.full((32, 32, 3), 200, dtype=np.uint8)
+
+class FileScoreBackend:
+    """Returns the score written in the model file; `broken` files fail their warm-up."""
+    name = "keras"
+    gates = {}
+
+    def __init__(self, path):
+        self.content = open(path).read()
+
+    def predict(self, batch):
+        if self.content == "broken":
+            raise RuntimeError("bad weights")
+        gate = self.gates.get(self.content)
+        if gate is not None and batch.any():
+            started, release = gate
+            started.set()
+            release.wait(5)
+        return np.full(len(batch), float(self.content))
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(root=str(tmp_path / "registry"), keep=3)
+
+@pytest.fixture
+def register(registry, tmp_path):
+    def register(content, threshold=None):
+        path = tmp_path / "model.h5"
+        path.write_text(content)
+        return registry.register({"keras": str(path)}, metrics={"val_accuracy": 0.9}, threshold=threshold)["version"]
+    return register
+
+@pytest.fixture
+def service(registry, monkeypatch):
+    monkeypatch.setattr(inference_module, "load_backend", FileScoreBackend)
+    service = InferenceService(registry=registry)
+    yield service
+    service.batcher.shutdown()
+
+def test_registry_versions_activation_and_rollback(registry, register):
+    assert registry.active_version() is None
+    v1, v2 = register("0.9"), register("0.5", threshold=0.4)
+    assert (v1, v2) == ("v1", "v2")
+    assert [m["version"] for m in registry.versions()] == ["v2", "v1"]
+    assert registry.get("v2")["threshold"] == 0.4
+    assert registry.get("v1")["metrics"] == {"val_accuracy": 0.9}
+    with pytest.raises(KeyError):
+        registry.get("v9")
+
+    registry.activate(v1)
+    registry.activate(v2)
+    assert (registry.active_version(), registry.previous_version()) == ("v2", "v1")
+    assert registry.rollback() == "v1"
+    assert registry.previous_version() is None
+    with pytest.raises(ValueError):
+        registry.rollback()
+
+def test_old_versions_are_pruned_unless_they_can_be_rolled_back_to(registry, register):
+    registry.activate(register("0.1"))
+    for _ in range(4):
+        register("0.2")
+    registry.activate("v5")
+    # keep=3: v2 is gone, v1 stays as the rollback target
+    assert [m["version"] for m in registry.versions()] == ["v5", "v4", "v3", "v1"]
+
+def test_swap_uses_the_versions_threshold_and_counts_predictions(service, registry, register):
+    v1, v2 = register("0.9"), register("0.5", threshold=0.4)
+    service.activate(v1)
+    assert service.classify_array(BRIGHT) == {"is_garbage": True, "score": 0.9}
+
+    service.activate(v2)
+    assert registry.active_version() == v2
+    assert service.classify_array(BRIGHT) == {"is_garbage": True, "score": 0.5}
+    assert service.classify_array(BRIGHT)["is_garbage"]
+
+    assert service.rollback() == v1
+    assert service.model_version == v1
+    assert service.version_stats() == {
+        v1: {"predictions": 1, "garbage": 1},
+        v2: {"predictions": 2, "garbage": 2},
+    }
+
+def test_broken_version_is_never_swapped_in(service, registry, register):
+    v1, broken = register("0.9"), register("broken")
+    service.activate(v1)
+    with pytest.raises(RuntimeError):
+        service.activate(broken)
+    assert service.model_version == v1
+    assert registry.active_version() == v1
+    assert service.classify_array(BRIGHT)["score"] == 0.9
+
+def test_requests_in_flight_finish_on_the_old_version(service, register):
+    v1, v2 = register("0.9"), register("0.1")
+    service.activate(v1)
+    started, release = FileScoreBackend.gates["0.9"] = threading.Event(), threading.Event()
+    result = {}
+    try:
+        thread = threading.Thread(target=lambda: result.update(service.classify_array(BRIGHT)))
+        thread.start()
+        assert started.wait(5)
+        # Swapped while the old model is mid-batch
+        service.activate(v2)
+        release.set()
+        thread.join(5)
+    finally:
+        del FileScoreBackend.gates["0.9"]
+
+    assert result["score"] == 0.9
+    assert service.classify_array(BRIGHT)["score"] == 0.1
+
+def test_other_processes_pick_up_the_active_version(service, registry, register):
+    v1 = register("0.9")
+    other = InferenceService(registry=registry)
+    try:
+        service.activate(v1)
+        assert other.sync_with_registry()
+        assert other.model_version == v1
+        assert not other.sync_with_registry()
+    finally:
+        other.batcher.shutdown()
+
+@pytest.fixture
+def admin_headers(db):
+    db.add(User(email="admin@example.com", hashed_password="x", role=UserRole.ADMIN))
+    db.commit()
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'admin@example.com'})}"}
+
+def test_admin_model_endpoints(service, register, admin_headers, monkeypatch):
+    from backend.api import admin
+    monkeypatch.setattr(admin, "inference_service", service)
+    monkeypatch.setattr(admin, "model_registry", service.registry)
+    v1, v2 = register("0.9"), register("0.5")
+
+    assert client.post(f"/admin/models/{v1}/activate", headers=admin_headers).json() == {"active": v1}
+    assert client.post(f"/admin/models/{v2}/activate", headers=admin_headers).status_code == 200
+    assert client.post("/admin/models/v9/activate", headers=admin_headers).status_code == 404
+    service.classify_array(BRIGHT)
+
+    listing = client.get("/admin/models", headers=admin_headers).json()
+    assert (listing["active"], listing["serving"], listing["previous"]) == (v2, v2, v1)
+    assert [v["predictions"]["predictions"] for v in listing["versions"]] == [1, 0]
+
+    assert client.post("/admin/models/rollback", headers=admin_headers).json() == {"active": v1}
+    assert client.post("/admin/models/rollback", headers=admin_headers).status_code == 400
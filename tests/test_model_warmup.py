@@ -0,0 +1,118 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.services import ai as ai_module
+from backend.services.ai import AIService, ModelsWarmingUpError
+import asyncio
+import numpy as np
+import os
+import subprocess
+import sys
+import threading
+import pytest
+
+client = TestClient(app)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Cold import of the app; generous so slow CI machines don't flake
+STARTUP_IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET_SECONDS", "5"))
+HEAVY_MODULES = ("tensorflow", "keras", "ultralytics", "torch", "cv2")
+
+IMPORT_BENCHMARK = """
+import sys, time
+started = time.perf_counter()
+import backend.main
+print(time.perf_counter() - started)
+print(",".join(m for m in {modules!r} if m in sys.modules))
+"""
+
+def test_app_import_is_fast_and_loads_no_model_runtime(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'startup.db'}"}
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_BENCHMARK.format(modules=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    seconds, imported = float(output[-2]), output[-1]
+    print(f"import backend.main: {seconds:.2f}s")
+    assert imported == ""
+    assert seconds < STARTUP_IMPORT_BUDGET_SECONDS
+
+def test_ai_endpoints_answer_503_while_warming_up(monkeypatch):
+    monkeypatch.setattr(ai_module.ai_service, "state", "warming")
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["state"] == "warming"
+
+    response = client.post("/reports/predict", files={"file": ("a.jpg", b"data", "image/jpeg")})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "10"
+    assert "warming up" in response.json()["detail"]
+
+    # Login and other non-AI endpoints are served meanwhile
+    assert client.get("/health/live").status_code == 200
+
+def test_warm_up_loads_models_off_the_event_loop(monkeypatch):
+    service = AIService()
+    release = threading.Event()
+    calls = []
+
+    def load_models():
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        service._models_loaded = True
+
+    monkeypatch.setattr(service, "load_models", load_models)
+
+    async def run():
+        task = asyncio.create_task(service.warm_up())
+        await asyncio.sleep(0.05)
+        # The loop keeps running while the models load
+        assert service.state == "warming"
+        with pytest.raises(ModelsWarmingUpError):
+            service.require_ready()
+        release.set()
+        await task
+        assert service.readiness()["ready"]
+        service.require_ready()
+    asyncio.run(run())
+
+    assert calls and calls[0] != threading.main_thread().name
+    assert service.warmup_seconds is not None
+
+def test_models_load_on_first_use_without_warm_up(monkeypatch):
+    service = AIService()
+    loads = []
+    monkeypatch.setattr(ai_module.inference_service, "warm_up", lambda: loads.append(1))
+    monkeypatch.setattr(ai_module, "detect_objects", lambda *args, **kwargs: [])
+    service.require_ready() # cold: nothing to wait for
+
+    assert service.count_objects(np.zeros((8, 8, 3), dtype=np.uint8)) == 0
+    assert service.count_objects(np.ones((8, 8, 3), dtype=np.uint8)) == 0
+    assert loads == [1]
+
+def test_failed_object_detection_load_is_retried_later(monkeypatch):
+    from ai_service import object_detection
+    attempts = []
+
+    def flaky_detect_objects(image, **options):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("no network to download yolov8n.pt")
+        return []
+
+    monkeypatch.setattr(ai_module, "OBJECT_DETECTION_AVAILABLE", True)
+    monkeypatch.setattr(ai_module, "detect_objects", None)
+    monkeypatch.setattr(ai_module.inference_service, "warm_up", lambda: None)
+    monkeypatch.setattr(object_detection, "detect_objects", flaky_detect_objects)
+    service = AIService()
+
+    service.load_models()
+    assert ai_module.detect_objects is None
+    # Not on every request while it keeps failing
+    service.load_models()
+    assert len(attempts) == 1
+
+    monkeypatch.setattr(ai_module, "OBJECT_DETECTION_RETRY_SECONDS", 0)
+    service._detector_retry_at = 0.0
+    assert service.count_objects(np.zeros((8, 8, 3), dtype=np.uint8)) == 0
+    assert ai_module.detect_objects is flaky_detect_objects
+    assert service._models_loaded
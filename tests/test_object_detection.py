@@ -0,0 +1,107 @@
+from ai_service import object_detection
+from ai_service.object_detection import collect_detections, detect_objects
+import math
+import numpy as np
+import pytest
+
+PERSON, BOTTLE, CUP = 0, 39, 41
+
+class Tensor:
+    def __init__(self, values, dtype):
+        self.values = np.asarray(values, dtype=dtype)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+class Result:
+    """One crop's YOLO result; `detections` are (x1, y1, x2, y2, confidence, class) in crop coordinates."""
+    def __init__(self, detections):
+        self.boxes = None
+        if detections:
+            rows = np.array(detections, dtype=np.float32).reshape(-1, 6)
+            self.boxes = type("Boxes", (), {
+                "xyxy": Tensor(rows[:, :4], np.float32),
+                "conf": Tensor(rows[:, 4], np.float32),
+                "cls": Tensor(rows[:, 5], np.float32),
+                "__len__": lambda _: len(rows),
+            })()
+
+class FakeYOLO:
+    """Answers each forward pass with the next entry of `passes`: one detection list per crop."""
+    names = {PERSON: "person", BOTTLE: "bottle", CUP: "cup"}
+
+    def __init__(self, *passes):
+        self.passes = list(passes)
+        self.calls = []
+
+    def __call__(self, crops, verbose=False):
+        self.calls.append([crop.shape[:2] for crop in crops])
+        detections = self.passes.pop(0)
+        assert len(detections) == len(crops)
+        return [Result(d) for d in detections]
+
+# 200x100 image, split into four 100x50 quadrants without overlap
+IMAGE = np.zeros((100, 200, 3), dtype=np.uint8)
+QUADRANTS = [(math.inf, 2, 2, 0.0)]
+REGIONS = [(0, 0, 200, 100), (0, 0, 100, 50), (100, 0, 200, 50), (0, 50, 100, 100), (100, 50, 200, 100)]
+
+@pytest.fixture
+def use_model(monkeypatch):
+    def use_model(model):
+        monkeypatch.setattr(object_detection, "get_model", lambda: model)
+        return model
+    return use_model
+
+def test_tile_boxes_are_mapped_to_the_image_and_clamped():
+    results = [
+        Result([]),
+        Result([(5, 5, 20, 20, 0.9, PERSON), (5, 5, 20, 20, 0.1, BOTTLE)]),
+        Result([(10, 5, 30, 20, 0.8, BOTTLE)]),
+        Result([]),
+        Result([(90, 40, 120, 60, 0.7, CUP)]),
+    ]
+    boxes, scores, class_ids = collect_detections(results, REGIONS, 200, 100, conf_threshold=0.25)
+
+    # People and low-confidence boxes are dropped; the cup leaves the image and is clamped
+    np.testing.assert_allclose(boxes, [[110, 5, 130, 20], [190, 90, 200, 100]])
+    np.testing.assert_allclose(scores, [0.8, 0.7], rtol=1e-6)
+    assert class_ids.tolist() == [BOTTLE, CUP]
+
+def test_nothing_left_gives_empty_arrays():
+    boxes, scores, class_ids = collect_detections([Result([(0, 0, 5, 5, 0.9, PERSON)])], REGIONS[:1], 200, 100, 0.25)
+    assert (boxes.shape, scores.shape, class_ids.shape) == ((0, 4), (0,), (0,))
+
+def test_full_frame_and_tiles_run_as_one_batch_and_duplicates_merge(use_model):
+    model = use_model(FakeYOLO([
+        [(110, 5, 130, 20, 0.85, BOTTLE)],
+        [(5, 5, 20, 20, 0.95, PERSON)],
+        [(10, 5, 30, 20, 0.8, BOTTLE)],  # The full frame's bottle, seen by a tile
+        [],
+        [(10, 10, 40, 30, 0.6, CUP)],
+    ]))
+    detections = detect_objects(IMAGE, tiling=QUADRANTS)
+
+    assert model.calls == [[(100, 200), (50, 100), (50, 100), (50, 100), (50, 100)]]
+    assert [(d["label"], d["box"]) for d in detections] == [
+        ("bottle", [110, 5, 130, 20]),
+        ("cup", [110, 60, 140, 80]),
+    ]
+    assert detections[0]["confidence"] == pytest.approx(0.85)
+
+def test_early_exit_skips_the_tiles_when_the_full_frame_has_objects(use_model):
+    model = use_model(FakeYOLO([[(20, 20, 60, 60, 0.9, BOTTLE)]]))
+    detections = detect_objects(IMAGE, early_exit=True, tiling=QUADRANTS)
+    assert model.calls == [[(100, 200)]]
+    assert [d["label"] for d in detections] == ["bottle"]
+
+def test_early_exit_falls_back_to_the_tiles(use_model):
+    model = use_model(FakeYOLO(
+        [[(0, 0, 50, 50, 0.9, PERSON)]],  # Only a person: keep looking
+        [[], [], [(1, 2, 3, 4, 0.5, CUP)], []],
+    ))
+    detections = detect_objects(IMAGE, early_exit=True, tiling=QUADRANTS)
+    assert model.calls == [[(100, 200)], [(50, 100)] * 4]
+    assert [(d["label"], d["box"]) for d in detections] == [("cup", [1, 52, 3, 54])]
@@ -0,0 +1,85 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.models.user import User, UserRole, Report, ReportStatus
+from backend.api.auth import create_access_token
+import datetime
+import pytest
+
+client = TestClient(app)
+
+def make_user(db, email, role):
+    user = User(email=email, hashed_password="x", full_name=email, role=role)
+    db.add(user)
+    db.commit()
+    return user, {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+@pytest.fixture
+def seeded(db):
+    admin, admin_headers = make_user(db, "admin@example.com", UserRole.ADMIN)
+    worker, worker_headers = make_user(db, "worker@example.com", UserRole.WORKER)
+    base = datetime.datetime(2024, 1, 1)
+    for i in range(25):
+        db.add(Report(
+            description=f"report {i}",
+            image_url=f"uploads/{i}.jpg",
+            latitude=10.0 + i * 0.1,
+            longitude=20.0,
+            # Pairs share a timestamp so the id tie-breaker is exercised
+            created_at=base + datetime.timedelta(minutes=i // 2),
+            status=ReportStatus.ASSIGNED if i % 5 == 0 else ReportStatus.PENDING,
+            worker_id=worker.id if i % 5 == 0 else None,
+            owner_id=admin.id
+        ))
+    db.commit()
+    return {"admin": admin_headers, "worker": worker_headers, "worker_id": worker.id}
+
+def fetch_all(url, headers, params):
+    pages, seen = 0, []
+    cursor = None
+    while True:
+        response = client.get(url, headers=headers, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.extend(r["id"] for r in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen, pages
+
+def test_cursor_walks_every_report_once_newest_first(seeded, db):
+    ids, pages = fetch_all("/admin/reports", seeded["admin"], {"limit": 4})
+    expected = [r.id for r in db.query(Report).order_by(Report.created_at.desc(), Report.id.desc())]
+    assert ids == expected
+    assert pages == 7
+
+def test_total_count_only_when_requested(seeded):
+    response = client.get("/admin/reports", headers=seeded["admin"], params={"limit": 5})
+    assert "X-Total-Count" not in response.headers
+
+    response = client.get(
+        "/admin/reports", headers=seeded["admin"],
+        params={"limit": 5, "include_total": True, "status": "assigned"}
+    )
+    assert response.headers["X-Total-Count"] == "5"
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+def test_filters(seeded):
+    headers = seeded["admin"]
+    response = client.get("/reports/", headers=headers, params={"worker_id": seeded["worker_id"]})
+    assert {r["status"] for r in response.json()} == {"assigned"}
+
+    response = client.get("/reports/", headers=headers, params={"min_lat": 11.0, "max_lat": 11.45})
+    assert sorted(r["latitude"] for r in response.json()) == pytest.approx([11.0, 11.1, 11.2, 11.3, 11.4])
+
+    response = client.get("/reports/", headers=headers, params={
+        "created_after": "2024-01-01T00:03:00", "created_before": "2024-01-01T00:05:00"
+    })
+    assert len(response.json()) == 4
+
+def test_available_tasks_are_always_pending(seeded):
+    ids, _ = fetch_all("/tasks/available", seeded["worker"], {"limit": 7, "status": "assigned"})
+    assert len(ids) == 20
+
+def test_invalid_cursor_is_rejected(seeded):
+    response = client.get("/admin/reports", headers=seeded["admin"], params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from backend.main import app
+from backend.models.user import User, UserRole
+from backend.services.passwords import PasswordHasher, PasswordHasherBusyError, BCRYPT_ROUNDS, password_hasher
+import asyncio
+import time
+import pytest
+
+client = TestClient(app)
+
+class SlowContext:
+    """Stands in for bcrypt with a fixed cost."""
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def hash(self, password):
+        time.sleep(self.seconds)
+        return f"hashed:{password}"
+
+    def verify_and_update(self, password, hashed):
+        time.sleep(self.seconds)
+        return hashed == f"hashed:{password}", None
+
+def test_login_rehashes_outdated_hashes(db):
+    cheap = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    db.add(User(email="worker@example.com", hashed_password=cheap.hash("secret"), role=UserRole.WORKER))
+    db.commit()
+    rehashed = password_hasher.rehashed
+
+    response = client.post("/auth/login", data={"username": "worker@example.com", "password": "secret"})
+    assert response.status_code == 200
+    db.expire_all()
+    stored = db.query(User).one().hashed_password
+    assert stored.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+    assert password_hasher.rehashed == rehashed + 1
+
+    # Wrong passwords are still refused, and nothing is rewritten
+    response = client.post("/auth/login", data={"username": "worker@example.com", "password": "wrong"})
+    assert response.status_code == 401
+    db.expire_all()
+    assert db.query(User).one().hashed_password == stored
+
+def test_signup_hashes_on_the_pool(db):
+    completed = password_hasher.completed
+    response = client.post("/auth/signup", json={"email": "new@example.com", "password": "pw", "full_name": "New"})
+    assert response.status_code == 200
+    assert password_hasher.completed == completed + 1
+    assert client.post("/auth/login", data={"username": "new@example.com", "password": "pw"}).status_code == 200
+
+def test_hashing_does_not_block_the_event_loop():
+    async def run():
+        hasher = PasswordHasher(context=SlowContext(0.1), max_workers=2)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        hashes = await asyncio.gather(hasher.hash("a"), hasher.hash("b"))
+        elapsed = time.perf_counter() - started
+        task.cancel()
+        hasher.shutdown()
+
+        assert hashes == ["hashed:a", "hashed:b"]
+        assert elapsed < 0.19 # ran side by side
+        assert ticks >= 5
+    asyncio.run(run())
+
+def test_admission_rejects_jobs_that_would_wait_too_long():
+    async def run():
+        hasher = PasswordHasher(context=SlowContext(0.1), max_workers=1, max_wait_ms=50)
+        assert await hasher.verify("a", "hashed:a") == (True, None)
+        assert hasher.stats()["avg_ms"] >= 100
+
+        first = asyncio.ensure_future(hasher.hash("b"))
+        await asyncio.sleep(0) # let it take the only worker
+        with pytest.raises(PasswordHasherBusyError) as exc:
+            await hasher.hash("c")
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"] == "1"
+        assert await first == "hashed:b"
+
+        stats = hasher.stats()
+        assert (stats["rejected"], stats["completed"], stats["pending"]) == (1, 2, 0)
+        hasher.shutdown()
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+from ai_service.cache import PredictionCache, hash_pixels
+import numpy as np
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_hash_depends_on_pixels_and_shape():
+    a = np.zeros((4, 4, 3), dtype=np.uint8)
+    b = a.copy()
+    assert hash_pixels(a) == hash_pixels(b)
+    b[0, 0, 0] = 1
+    assert hash_pixels(a) != hash_pixels(b)
+    assert hash_pixels(a) != hash_pixels(a.reshape(8, 2, 3))
+
+def test_lru_eviction_and_counters():
+    cache = PredictionCache(max_entries=2, ttl_seconds=None)
+    cache.set("a", True)
+    cache.set("b", False)
+    assert cache.get("a") is True  # "a" is now most recently used
+    cache.set("c", True)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is True
+    assert cache.get("c") is True
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(ttl_seconds=60, clock=clock)
+    cache.set("a", True)
+    clock.now += 59
+    assert cache.get("a") is True
+    clock.now += 2
+    assert cache.get("a") is None
+
+def test_model_version_is_part_of_the_key():
+    cache = PredictionCache()
+    digest = hash_pixels(np.ones((2, 2, 3), dtype=np.uint8))
+    cache.set(PredictionCache.make_key("hybrid", "v1", digest), True)
+    assert cache.get(PredictionCache.make_key("hybrid", "v2", digest)) is None
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    clock = FakeClock()
+    PredictionCache(disk_dir=str(tmp_path), clock=clock).set("a", False)
+
+    cache = PredictionCache(disk_dir=str(tmp_path), clock=clock)
+    assert cache.get("a") is False
+    assert cache.stats()["disk_hits"] == 1
+
+    clock.now += 86400
+    assert PredictionCache(disk_dir=str(tmp_path), clock=clock).get("a") is None
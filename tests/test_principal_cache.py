@@ -0,0 +1,73 @@
+from fastapi.testclient import TestClient
+from jose import jwt
+from backend.main import app
+from backend.models.user import User, UserRole
+from backend.api.auth import create_access_token, token_claims, get_password_hash, SECRET_KEY, ALGORITHM
+from backend.services.principals import Principal, PrincipalCache, principal_cache
+from tests.query_counter import count_queries
+import pytest
+
+client = TestClient(app)
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def users(db):
+    admin = User(email="admin@example.com", hashed_password="x", role=UserRole.ADMIN)
+    worker = User(email="worker@example.com", hashed_password=get_password_hash("secret"),
+                  full_name="Worker", role=UserRole.WORKER, qr_login_token="qr-1")
+    db.add_all([admin, worker])
+    db.commit()
+    return {
+        "admin": bearer(create_access_token(token_claims(admin))),
+        "worker": bearer(create_access_token(token_claims(worker))),
+        "worker_id": worker.id
+    }
+
+def test_login_token_carries_id_and_role(db, users):
+    response = client.post("/auth/login", data={"username": "worker@example.com", "password": "secret"})
+    claims = jwt.decode(response.json()["access_token"], SECRET_KEY, algorithms=[ALGORITHM])
+    assert (claims["sub"], claims["uid"], claims["role"]) == ("worker@example.com", users["worker_id"], "worker")
+
+def test_repeat_requests_skip_the_user_lookup(db_engine, users):
+    with count_queries(db_engine) as first:
+        assert client.get("/auth/me", headers=users["worker"]).status_code == 200
+    with count_queries(db_engine) as second:
+        response = client.get("/auth/me", headers=users["worker"])
+    assert first.count == 1
+    assert second.count == 0
+    assert response.json()["qr_login_token"] == "qr-1"
+
+def test_admin_changes_invalidate_the_cache(db, users):
+    assert client.get("/auth/me", headers=users["worker"]).status_code == 200
+
+    response = client.post(f"/admin/workers/{users['worker_id']}/regenerate-qr", headers=users["admin"])
+    new_token = response.json()["qr_login_token"]
+    assert client.get("/auth/me", headers=users["worker"]).json()["qr_login_token"] == new_token
+
+    assert client.delete(f"/admin/workers/{users['worker_id']}", headers=users["admin"]).status_code == 200
+    assert client.get("/auth/me", headers=users["worker"]).status_code == 401
+
+def test_stale_role_claims_are_refused(db, users):
+    worker = db.get(User, users["worker_id"])
+    worker.role = UserRole.USER
+    db.commit()
+    principal_cache.clear()
+    assert client.get("/auth/me", headers=users["worker"]).status_code == 401
+
+    # Tokens without the claims are checked against the stored user only
+    legacy = bearer(create_access_token({"sub": "worker@example.com"}))
+    assert client.get("/auth/me", headers=legacy).json()["role"] == "user"
+
+def test_cache_expires_and_stays_bounded():
+    now = [0.0]
+    cache = PrincipalCache(max_entries=2, ttl_seconds=30, clock=lambda: now[0])
+    for i in range(3):
+        cache.set(f"user{i}@example.com", Principal(i, f"user{i}@example.com", None, None, "user", None))
+    assert cache.get("user0@example.com") is None
+    assert cache.get("user2@example.com").id == 2
+
+    now[0] = 31
+    assert cache.get("user2@example.com") is None
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models.user import User, UserRole, Report, ReportMedia, ReportStatus
+from backend.api.auth import create_access_token
+from tests.query_counter import assert_max_queries, count_queries
+import pytest
+
+client = TestClient(app)
+
+# current user + reports page + media for the page
+LIST_QUERIES = 3
+
+def seed(engine, reports):
+    db = sessionmaker(bind=engine)()
+    users = {}
+    for role in (UserRole.ADMIN, UserRole.WORKER, UserRole.USER):
+        users[role] = User(email=f"{role.value}@example.com", hashed_password="x", role=role)
+        db.add(users[role])
+    db.flush()
+    for i in range(reports):
+        report = Report(
+            description=f"report {i}", image_url=f"uploads/{i}.jpg", latitude=0.0, longitude=0.0,
+            owner_id=users[UserRole.USER].id,
+            worker_id=users[UserRole.WORKER].id if i % 2 else None,
+            status=ReportStatus.ASSIGNED if i % 2 else ReportStatus.PENDING
+        )
+        report.media = [ReportMedia(file_url=f"uploads/{i}_{j}.jpg", media_type="image") for j in range(2)]
+        db.add(report)
+    db.commit()
+    db.close()
+    return {role: {"Authorization": f"Bearer {create_access_token({'sub': f'{role.value}@example.com'})}"} for role in users}
+
+@pytest.mark.parametrize("url, role", [
+    ("/admin/reports", UserRole.ADMIN),
+    ("/reports/", UserRole.ADMIN),
+    ("/reports/my", UserRole.USER),
+    ("/tasks/available", UserRole.WORKER),
+    ("/tasks/my", UserRole.WORKER),
+])
+def test_report_lists_use_constant_queries(db_engine, url, role):
+    headers = seed(db_engine, reports=40)
+    with assert_max_queries(db_engine, LIST_QUERIES):
+        response = client.get(url, headers=headers[role])
+    assert response.status_code == 200
+    assert len(response.json()) >= 20
+    assert all(len(r["media"]) == 2 for r in response.json())
+
+def test_query_count_does_not_grow_with_rows(db_engine):
+    headers = seed(db_engine, reports=5)
+    # Both measurements with the admin already in the principal cache
+    client.get("/auth/me", headers=headers[UserRole.ADMIN])
+    with count_queries(db_engine) as small:
+        client.get("/admin/reports", headers=headers[UserRole.ADMIN])
+
+    seed_more = sessionmaker(bind=db_engine)()
+    owner_id = seed_more.query(User.id).filter(User.role == UserRole.USER).scalar()
+    for i in range(100):
+        seed_more.add(Report(description="more", image_url="uploads/x.jpg", latitude=0.0, longitude=0.0,
+                             owner_id=owner_id, media=[ReportMedia(file_url="uploads/x.jpg", media_type="image")]))
+    seed_more.commit()
+    seed_more.close()
+
+    with count_queries(db_engine) as large:
+        client.get("/admin/reports", headers=headers[UserRole.ADMIN])
+    assert large.count == small.count
@@ -0,0 +1,169 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.models.user import User, UserRole
+from backend.api.auth import create_access_token
+from backend.services import training as training_module
+from backend.services.training import TrainingJob, TrainingJobRunner, TrainingJobConflictError
+import asyncio
+import os
+import sys
+import pytest
+
+client = TestClient(app)
+
+# Stands in for `python -m ai_service.train --events`
+FAKE_TRAINING = """
+import json, os, sys, time
+def emit(event, **data):
+    print("TRAINING_EVENT " + json.dumps({"event": event, **data}), flush=True)
+emit("started", epochs=2)
+print(f"nice={os.nice(0)} threads={os.environ['OMP_NUM_THREADS']}", flush=True)
+for epoch in (1, 2):
+    time.sleep(float(sys.argv[1]))
+    emit("epoch", epoch=epoch, epochs=2, metrics={"accuracy": 0.5 + epoch / 10, "val_accuracy": 0.6})
+if sys.argv[2] == "fail":
+    print("Dataset directory not found!", flush=True)
+    sys.exit(1)
+emit("registered", version="v7", metadata={})
+"""
+
+@pytest.fixture
+def events(monkeypatch):
+    published = []
+    monkeypatch.setattr(training_module.websocket.manager, "publish", lambda topics, event: published.append((topics, event)))
+    return published
+
+@pytest.fixture
+def make_runner(tmp_path):
+    def make_runner(delay=0.0, outcome="ok", activated=None):
+        # Runners sharing tmp_path behave like uvicorn workers of one server
+        return TrainingJobRunner(
+            command=[sys.executable, "-c", FAKE_TRAINING, str(delay), outcome],
+            niceness=5, threads=2, job_dir=str(tmp_path / "training"),
+            activate=(activated.append if activated is not None else lambda version: None)
+        )
+    return make_runner
+
+def test_job_streams_epochs_and_activates_the_new_version(events, make_runner):
+    activated = []
+    runner = make_runner(activated=activated)
+
+    async def run():
+        job = runner.start(requested_by=1)
+        await job.task
+        return job
+    job = asyncio.run(run())
+
+    assert job.state == "succeeded"
+    assert (job.epoch, job.epochs, job.version) == (2, 2, "v7")
+    assert job.history[-1] == {"accuracy": 0.7, "val_accuracy": 0.6}
+    assert activated == ["v7"]
+    assert runner.current is None
+
+    # Ran with a lower priority and capped threads
+    expected_nice = min(19, os.nice(0) + 5)
+    assert f"nice={expected_nice} threads=2" in job.output
+
+    types = [event["type"] for _, event in events]
+    assert types == ["training_started", "training_progress", "training_progress", "training_succeeded"]
+    assert all(topics == [training_module.websocket.ADMINS] for topics, _ in events)
+    assert events[1][1]["message"] == f"Training job {job.id}: epoch 1/2 (accuracy 0.600, val_accuracy 0.600)"
+
+def test_failed_training_keeps_the_current_model(events, make_runner):
+    activated = []
+    runner = make_runner(outcome="fail", activated=activated)
+
+    async def run():
+        job = runner.start()
+        await job.task
+        return job
+    job = asyncio.run(run())
+
+    assert job.state == "failed"
+    assert job.error == "Training exited with code 1: Dataset directory not found!"
+    assert activated == []
+    assert events[-1][1]["type"] == "training_failed"
+
+def test_one_job_at_a_time_and_cancel(events, make_runner):
+    runner, other = make_runner(delay=30), make_runner(delay=30)
+
+    async def run():
+        job = runner.start()
+        with pytest.raises(TrainingJobConflictError) as exc:
+            runner.start()
+        assert exc.value.status_code == 409
+        # Also when the request lands on another worker
+        with pytest.raises(TrainingJobConflictError) as exc:
+            other.start()
+        assert job.id in exc.value.detail
+
+        while job.epochs is None:
+            await asyncio.sleep(0.01)
+        assert other.get(job.id)["state"] == "running"
+        # Cancelled through the other worker
+        assert other.cancel(job.id)["state"] == "running"
+        await asyncio.wait_for(job.task, 5)
+        assert other.get(job.id)["state"] == "cancelled"
+        # The slot is free again, for every worker
+        next_job = other.start()
+        other.cancel(next_job.id)
+        await asyncio.wait_for(next_job.task, 5)
+        return job
+    job = asyncio.run(run())
+
+    assert job.state == "cancelled"
+    assert events[-1][1]["type"] == "training_cancelled"
+
+@pytest.fixture
+def admin_headers(db):
+    db.add(User(email="admin@example.com", hashed_password="x", role=UserRole.ADMIN))
+    db.commit()
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'admin@example.com'})}"}
+
+def test_training_status_endpoints(events, admin_headers, monkeypatch, make_runner):
+    from backend.api import admin
+    runner = make_runner()
+    monkeypatch.setattr(admin, "training_runner", runner)
+
+    async def run():
+        job = runner.start()
+        await job.task
+        return job
+    job = asyncio.run(run())
+
+    response = client.get(f"/admin/training/{job.id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["state"] == "succeeded"
+    assert response.json()["history"][0]["accuracy"] == 0.6
+    assert [j["id"] for j in client.get("/admin/training", headers=admin_headers).json()] == [job.id]
+    assert client.get("/admin/training/missing", headers=admin_headers).status_code == 404
+    assert client.post(f"/admin/training/{job.id}/cancel", headers=admin_headers).status_code == 400
+
+def test_jobs_of_a_worker_that_died_are_marked_failed(make_runner):
+    runner = make_runner()
+    job = TrainingJob("0123456789ab")
+    job.state = "running"
+    os.makedirs(runner.job_dir)
+    runner._save(job)
+    # Nobody holds the lock, so no worker is running it
+    assert runner.get(job.id)["state"] == "failed"
+    assert runner.get("../../etc/passwd") is None
+
+def test_job_finishing_while_it_is_read_is_not_marked_failed(make_runner, monkeypatch):
+    runner = make_runner()
+    job = TrainingJob("0123456789ab")
+    job.state = "running"
+    os.makedirs(runner.job_dir)
+    runner._save(job)
+
+    class FinishingLock(training_module.FileLock):
+        def acquire(self, blocking=False):
+            # The owner saves its final state and releases the lock between the read and the probe
+            job.state, job.version = "succeeded", "v3"
+            runner._save(job)
+            return super().acquire(blocking)
+    monkeypatch.setattr(training_module, "FileLock", FinishingLock)
+
+    assert runner.get(job.id)["state"] == "succeeded"
+    monkeypatch.undo()
+    assert (runner.get(job.id)["state"], runner.get(job.id)["version"]) == ("succeeded", "v3")
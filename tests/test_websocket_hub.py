@@ -0,0 +1,168 @@
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from backend.main import app
+from backend.models.user import User, UserRole
+from backend.api.auth import create_access_token
+from backend.services import geo
+from backend.services.websocket import (
+    ConnectionManager, ADMINS, TASKS, SLOW_CONSUMER_CLOSE_CODE, WS_MAX_TOPICS, manager,
+    cell_topic, event, location_topics, worker_topic
+)
+import asyncio
+import json
+import pytest
+
+client = TestClient(app)
+
+class FakeSocket:
+    def __init__(self, stall=False, fail=False):
+        self.sent = []
+        self.closed = None
+        self.stall = stall
+        self.fail = fail
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        if self.stall:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(message))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_events_reach_each_subscriber_once():
+    async def run():
+        hub = ConnectionManager()
+        admin, worker, other = FakeSocket(), FakeSocket(), FakeSocket()
+        await hub.connect(admin, 1, "admin", [ADMINS])
+        await hub.connect(worker, 2, "worker", [TASKS, worker_topic(2)])
+        await hub.connect(other, 3, "worker", [worker_topic(3)])
+
+        assert hub.publish([ADMINS, TASKS, worker_topic(2)], event("task_claimed", report_id=5)) == 2
+        await settle()
+        assert [e["type"] for e in admin.sent] == ["task_claimed"]
+        assert [e["report_id"] for e in worker.sent] == [5]
+        assert other.sent == []
+    asyncio.run(run())
+
+def test_location_narrows_task_alerts_to_nearby_cells():
+    async def run():
+        hub = ConnectionManager()
+        socket = FakeSocket()
+        connection = await hub.connect(socket, 2, "worker", [TASKS])
+        hub.handle_message(connection, json.dumps({"action": "location", "latitude": 12.97, "longitude": 77.59, "radius_m": 2000}))
+        assert TASKS not in connection.topics
+
+        hub.publish(location_topics(12.98, 77.60), event("task_created", report_id=1))
+        hub.publish(location_topics(13.50, 77.60), event("task_created", report_id=2))
+        await settle()
+        assert [e["report_id"] for e in socket.sent] == [1]
+        assert cell_topic(geo.cell_for(12.97, 77.59)) in connection.topics
+    asyncio.run(run())
+
+def test_location_near_the_poles_keeps_the_topic_count_bounded():
+    async def run():
+        hub = ConnectionManager()
+        connection = await hub.connect(FakeSocket(), 2, "worker", [TASKS, worker_topic(2)])
+        hub.handle_message(connection, json.dumps({"action": "location", "latitude": 60, "longitude": 10, "radius_m": 10000}))
+        assert TASKS not in connection.topics
+        assert len(connection.topics) <= WS_MAX_TOPICS
+
+        # Too many cells (thousands at 60°, hundreds of thousands near the pole): all task alerts
+        for latitude in (60, 89.99):
+            hub.handle_message(connection, json.dumps({"action": "location", "latitude": latitude, "longitude": 10, "radius_m": 20000}))
+            assert connection.topics == {TASKS, worker_topic(2)}
+
+        # Off the globe or not finite: ignored, the subscription stays
+        hub.handle_message(connection, json.dumps({"action": "location", "latitude": 12.97, "longitude": 77.59}))
+        cells = set(connection.topics)
+        for latitude, longitude in ((91, 0), (0, 181), ("nan", 0), ("Infinity", 0)):
+            hub.handle_message(connection, json.dumps({"action": "location", "latitude": latitude, "longitude": longitude}))
+        hub.handle_message(connection, '{"action": "location", "latitude": 1e400, "longitude": 0}')
+        hub.handle_message(connection, json.dumps({"action": "location", "latitude": 0, "longitude": 0, "radius_m": "inf"}))
+        assert connection.topics == cells
+    asyncio.run(run())
+
+def test_clients_cannot_subscribe_to_other_topics():
+    async def run():
+        hub = ConnectionManager()
+        connection = await hub.connect(FakeSocket(), 2, "worker", [])
+        hub.handle_message(connection, json.dumps({"action": "subscribe", "topics": [ADMINS, worker_topic(3), worker_topic(2)]}))
+        hub.handle_message(connection, "not json")
+        hub.handle_message(connection, "[1, 2]")
+        assert connection.topics == {worker_topic(2)}
+    asyncio.run(run())
+
+def test_slow_consumer_is_evicted_without_delaying_others():
+    async def run():
+        hub = ConnectionManager(queue_size=2)
+        slow, fast = FakeSocket(stall=True), FakeSocket()
+        await hub.connect(slow, 1, "admin", [ADMINS])
+        await hub.connect(fast, 2, "admin", [ADMINS])
+
+        for i in range(5):
+            hub.publish([ADMINS], event("stats", delta={"n": i}))
+            await settle()
+
+        assert [e["delta"]["n"] for e in fast.sent] == [0, 1, 2, 3, 4]
+        assert slow.closed == SLOW_CONSUMER_CLOSE_CODE
+        assert slow not in hub.connections
+        assert hub.get_active_count(ADMINS) == 1
+        assert hub.stats()["evicted"] == 1
+    asyncio.run(run())
+
+def test_stalled_send_times_out():
+    async def run():
+        hub = ConnectionManager(send_timeout=0.01)
+        slow = FakeSocket(stall=True)
+        await hub.connect(slow, 1, "admin", [ADMINS])
+        hub.publish([ADMINS], event("stats", delta={}))
+        await asyncio.sleep(0.05)
+        assert slow.closed == SLOW_CONSUMER_CLOSE_CODE
+        assert hub.stats()["connections"] == 0
+    asyncio.run(run())
+
+def test_dead_connections_are_removed():
+    async def run():
+        hub = ConnectionManager()
+        dead = FakeSocket(fail=True)
+        await hub.connect(dead, 1, "admin", [ADMINS])
+        hub.publish([ADMINS], event("stats", delta={}))
+        await settle()
+        assert hub.subscribers.get(ADMINS) is None
+        assert hub.stats()["dead"] == 1
+        # Disconnecting again (e.g. from the endpoint) is harmless
+        hub.disconnect(dead)
+    asyncio.run(run())
+
+def test_websocket_requires_a_token(db):
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/ws") as ws:
+            ws.receive_text()
+    assert exc.value.code == 1008
+
+def test_worker_connection_topics(db):
+    worker = User(email="worker@example.com", hashed_password="x", full_name="Worker", role=UserRole.WORKER)
+    db.add(worker)
+    db.commit()
+    token = create_access_token({"sub": worker.email})
+
+    with client.websocket_connect(f"/ws?token={token}") as ws:
+        ws.send_text(json.dumps({"action": "location", "latitude": 12.97, "longitude": 77.59}))
+        ws.send_text(json.dumps({"action": "ping"}))
+        assert json.loads(ws.receive_text())["type"] == "pong"
+
+        assert manager.get_active_count() == 1
+        (connection,) = manager.connections.values()
+        assert worker_topic(worker.id) in connection.topics
+        assert cell_topic(geo.cell_for(12.97, 77.59)) in connection.topics
+        assert TASKS not in connection.topics
+    assert manager.get_active_count() == 0